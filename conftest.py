@@ -0,0 +1,5 @@
+def pytest_sessionfinish(session):
+    # Как core.test_runner: просмотры из тестов не пишутся в основную
+    # базу при выходе.
+    from core.counters import discard_all
+    discard_all()
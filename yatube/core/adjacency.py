@@ -0,0 +1,83 @@
+"""Индекс связей «источник → цели» модели-ребра, например подписок.
+
+Для каждого источника (подписчика) в общем кеше лежит отсортированный
+массив id целей (авторов) — 8 байт на связь, одна запись на
+пользователя. В процессе он держится как ``frozenset``, так что вопрос
+«на кого из этих авторов я подписан» стоит O(1) на автора без
+запросов к базе. Запись источника сбрасывается по ``post_save`` и
+``post_delete`` ребра, как у ``ObjectCache``, или явно через
+``forget()``.
+"""
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .object_cache import LocalLRU
+
+
+class AdjacencyIndex:
+    def __init__(self, model, source, target):
+        self.model = model
+        self.source = model._meta.get_field(source).attname
+        self.target = model._meta.get_field(target).attname
+        self.prefix = f'adjacency:{model._meta.label_lower}:{source}'
+        self.local = LocalLRU(
+            settings.ADJACENCY_CACHE_LOCAL_SIZE,
+            settings.ADJACENCY_CACHE_LOCAL_TTL)
+        uid = 'adjacency:' + self.prefix
+        post_save.connect(
+            self.invalidate, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(
+            self.invalidate, sender=model, weak=False, dispatch_uid=uid)
+
+    def key(self, source_id):
+        return f'{self.prefix}:{source_id}'
+
+    def targets(self, source_id):
+        """Все цели источника как ``frozenset`` id."""
+        if source_id is None:
+            return frozenset()
+        key = self.key(source_id)
+        targets = self.local.get(key)
+        if targets is not None:
+            return targets
+        packed = cache.get(key)
+        if packed is None:
+            ids = array('q', sorted(
+                self.model._default_manager.filter(
+                    **{self.source: source_id},
+                ).values_list(self.target, flat=True)))
+            cache.set(key, ids.tobytes(), settings.ADJACENCY_CACHE_TIMEOUT)
+        else:
+            ids = array('q')
+            ids.frombytes(packed)
+        targets = frozenset(ids)
+        self.local.set(key, targets)
+        return targets
+
+    def contains(self, source_id, target_id):
+        return target_id in self.targets(source_id)
+
+    def which(self, source_id, target_ids):
+        """Те из ``target_ids``, с которыми у источника есть связь."""
+        targets = self.targets(source_id)
+        return {target_id for target_id in target_ids if target_id in targets}
+
+    def invalidate(self, sender, instance, **kwargs):
+        self.forget(getattr(instance, self.source))
+
+    def forget(self, source_id):
+        """Сбрасывает запись источника; нужно после ``bulk_create()``
+        и ``update()``, которые сигналов не шлют."""
+        key = self.key(source_id)
+        self._delete(key)
+        # Как в ObjectCache: после commit ещё раз, чтобы не осталась
+        # версия, прочитанная до конца транзакции.
+        transaction.on_commit(lambda: self._delete(key))
+
+    def _delete(self, key):
+        cache.delete(key)
+        self.local.delete(key)
@@ -0,0 +1,30 @@
+from django.contrib import admin
+
+from .models import Job, OutgoingEmail
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'task', 'queue', 'priority', 'status', 'attempts', 'run_at',
+        'finished')
+    list_filter = ('status', 'queue', 'task')
+    search_fields = ('task', 'dedup_key')
+    readonly_fields = ('created', 'locked_by', 'locked_at', 'last_error')
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(Job, JobAdmin)
+
+
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'subject', 'recipients', 'status', 'attempts', 'send_after',
+        'sent')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients', 'dedup_key')
+    readonly_fields = (
+        'message', 'created', 'sent', 'locked_by', 'locked_at', 'last_error')
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
@@ -0,0 +1,153 @@
+"""Контроль допуска запросов под нагрузкой.
+
+Каждый запрос относится к классу (``ADMISSION_VIEW_CLASSES``), у класса
+есть предел одновременных запросов и приоритет (0 — самый важный).
+Помимо жёстких пределов контроллер следит за задержкой в очереди
+каждого класса: если её скользящее среднее выше
+``ADMISSION_TARGET_LATENCY``, класс с приоритетом 2 отклоняется, если
+выше вдвое — и с приоритетом 1. Анонимное чтение ленты (приоритет 0) по
+задержке не отклоняется.
+
+Задержка в очереди берётся из заголовка ``X-Request-Start``, который
+ставит фронтенд (nginx: ``proxy_set_header X-Request-Start "t=${msec}"``).
+Заголовок читается, только если запрос пришёл с адреса из
+``ADMISSION_TRUSTED_PROXIES``, и задержка по нему не больше
+``MAX_QUEUE_LATENCY`` секунд. Без заголовка замера нет: время обработки
+— не очередь, и один долгий запрос не должен отклонять весь сайт.
+Долгие опросы и потоки (``ADMISSION_EXEMPT_VIEWS``) контроль допуска
+обходят, а загрузки (``ADMISSION_UNMEASURED_CLASSES``) ограничены
+пределом, но задержку не замеряют: фронтенд ставит заголовок ещё до
+того, как дочитал тело запроса.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+CACHED_READ = 'cached_read'
+DEFAULT = 'default'
+# Задержка по X-Request-Start сверх этого — сбитые часы, а не очередь.
+MAX_QUEUE_LATENCY = 60.0
+
+
+class ClassStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.latency = 0.0
+
+    def as_dict(self):
+        return {
+            'in_flight': self.in_flight,
+            'admitted': self.admitted,
+            'shed': self.shed,
+            'latency': round(self.latency, 4),
+        }
+
+
+class AdmissionController:
+    def __init__(self, limits, target_latency, smoothing):
+        self.limits = limits
+        self.target_latency = target_latency
+        self.smoothing = smoothing
+        self.stats = {name: ClassStats() for name in limits}
+        self.lock = threading.Lock()
+
+    def shed_by_latency(self, request_class):
+        """Класс отклоняется из-за задержки в его очереди."""
+        priority = self.limits[request_class]['priority']
+        latency = self.stats[request_class].latency
+        if priority <= 0:
+            return False
+        if priority == 1:
+            return latency > 2 * self.target_latency
+        return latency > self.target_latency
+
+    def shed_classes(self):
+        with self.lock:
+            return sorted(
+                name for name in self.limits if self.shed_by_latency(name))
+
+    def admit(self, request_class):
+        limit = self.limits[request_class]
+        stats = self.stats[request_class]
+        with self.lock:
+            over_limit = stats.in_flight >= limit['max_in_flight']
+            shed_by_latency = self.shed_by_latency(request_class)
+            if over_limit or shed_by_latency:
+                stats.shed += 1
+                if shed_by_latency:
+                    # Отклонённый запрос не даёт нового замера задержки;
+                    # без затухания перегрузка «залипла» бы навсегда.
+                    stats.latency *= 1 - self.smoothing
+                return False
+            stats.in_flight += 1
+            stats.admitted += 1
+            return True
+
+    def release(self, request_class, queue_latency=None):
+        """Запрос закончен; ``queue_latency`` None, если не замерена."""
+        stats = self.stats[request_class]
+        with self.lock:
+            stats.in_flight -= 1
+            if queue_latency is not None:
+                stats.latency += self.smoothing * (
+                    queue_latency - stats.latency)
+
+    def snapshot(self):
+        shed = self.shed_classes()
+        with self.lock:
+            return {
+                'shed_classes': shed,
+                'classes': {
+                    name: stats.as_dict()
+                    for name, stats in self.stats.items()},
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def admission_controller():
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(
+                settings.ADMISSION_LIMITS,
+                settings.ADMISSION_TARGET_LATENCY,
+                settings.ADMISSION_LATENCY_SMOOTHING)
+        return _controller
+
+
+def reset_admission_controller():
+    global _controller
+    with _controller_lock:
+        _controller = None
+
+
+def request_start(request):
+    """Момент, когда запрос пришёл на фронтенд, по ``X-Request-Start``."""
+    if request.META.get('REMOTE_ADDR') not in (
+            settings.ADMISSION_TRUSTED_PROXIES):
+        return None
+    header = request.META.get('HTTP_X_REQUEST_START', '')
+    if header.startswith('t='):
+        header = header[2:]
+    try:
+        started = float(header)
+    except ValueError:
+        return None
+    # Фронтенды присылают секунды, миллисекунды или микросекунды.
+    while started > time.time() * 10:
+        started /= 1000
+    return started
+
+
+def queue_latency(request, arrived):
+    """Сколько запрос ждал до ``arrived``; ``None``, если неизвестно."""
+    started = request_start(request)
+    if started is None:
+        return None
+    return min(max(arrived - started, 0.0), MAX_QUEUE_LATENCY)
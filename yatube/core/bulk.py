@@ -0,0 +1,40 @@
+"""Пакетная вставка с подсчётом вставленных строк.
+
+``bulk_create(ignore_conflicts=True)`` не сообщает, сколько строк
+отсекли ограничения, а подсчёт до и после вставки — лишние запросы и
+гонка с параллельной вставкой. ``insert_ignoring_conflicts`` выполняет
+тот же ``INSERT ... ON CONFLICT DO NOTHING`` (``INSERT OR IGNORE`` в
+SQLite, ``INSERT IGNORE`` в MySQL) и берёт число новых строк из
+``rowcount`` этого же запроса.
+"""
+from django.db import connections, router, transaction
+from django.db.models import AutoField
+from django.db.models.sql import InsertQuery
+
+
+def insert_ignoring_conflicts(model, objs, batch_size=None):
+    """Вставляет ``objs`` без pk; возвращает число вставленных строк.
+
+    Как и ``bulk_create``, сигналы не отправляются, а pk у объектов не
+    проставляются.
+    """
+    objs = list(objs)
+    if not objs:
+        return 0
+    using = router.db_for_write(model)
+    connection = connections[using]
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, AutoField)]
+    batch_size = batch_size or max(
+        connection.ops.bulk_batch_size(fields, objs), 1)
+    inserted = 0
+    with transaction.atomic(using=using, savepoint=False), \
+            connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            query = InsertQuery(model, ignore_conflicts=True)
+            query.insert_values(fields, objs[start:start + batch_size])
+            for sql, params in query.get_compiler(using).as_sql():
+                cursor.execute(sql, params)
+                inserted += cursor.rowcount
+    return inserted
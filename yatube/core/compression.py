@@ -0,0 +1,137 @@
+import gzip
+import struct
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def compress_gzip(data):
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+def available_encodings():
+    """Доступные кодировки сжатия в порядке предпочтения.
+
+    Возвращает кортежи ``(кодировка, суффикс файла, функция сжатия)``;
+    brotli используется, только если установлен пакет ``brotli``.
+    """
+    encodings = []
+    if brotli is not None:
+        encodings.append(('br', '.br', compress_brotli))
+    encodings.append(('gzip', '.gz', compress_gzip))
+    return encodings
+
+
+def accepted_encodings(header, available=()):
+    """Разбирает заголовок Accept-Encoding в множество кодировок.
+
+    ``*`` означает любую из ``available``, кроме явно отклонённых
+    (``br;q=0``).
+    """
+    accepted = set()
+    refused = set()
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        params = params.replace(' ', '')
+        if params.startswith('q=') and not params[2:].strip('0.'):
+            refused.add(coding)
+            continue
+        accepted.add(coding)
+    if '*' in accepted:
+        accepted.update(set(available) - refused)
+    return accepted
+
+
+class CompressedFragment:
+    """Фрагмент HTML вместе с его заранее сжатым deflate-представлением.
+
+    Сжатые байты заканчиваются полным сбросом (``Z_FULL_FLUSH``) и не
+    ссылаются на данные вне фрагмента, поэтому их можно вклеить в
+    середину любого gzip-потока, собираемого ``GzipStream``.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.deflated = (
+            compressor.compress(raw) + compressor.flush(zlib.Z_FULL_FLUSH))
+        self.crc = zlib.crc32(raw)
+        self.size = len(raw)
+
+
+class GzipStream:
+    """Инкрементальный gzip-компрессор со вставкой готовых фрагментов."""
+
+    header = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+    def __init__(self, level=6):
+        self.compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.crc = 0
+        self.size = 0
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return b''
+        self.started = True
+        return self.header
+
+    def write(self, data, flush=True):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        compressed = self.start() + self.compressor.compress(data)
+        if flush:
+            compressed += self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        return compressed
+
+    def write_fragment(self, fragment):
+        # Полный сброс обнуляет словарь компрессора: дальнейшие данные не
+        # будут ссылаться на байты, которых декомпрессор не увидит.
+        head = self.start() + self.compressor.flush(zlib.Z_FULL_FLUSH)
+        self.crc = zlib.crc32(fragment.raw, self.crc)
+        self.size += fragment.size
+        return head + fragment.deflated
+
+    def close(self):
+        return self.start() + self.compressor.flush(zlib.Z_FINISH) + (
+            struct.pack('<LL', self.crc, self.size & 0xffffffff))
+
+
+def compress_with_fragments(content, fragments, chunk_size=16 * 1024):
+    """Сжимает ``content`` в gzip, не пережимая уже сжатые фрагменты.
+
+    Генератор отдаёт сжатые куски по мере готовности. Фрагменты
+    ищутся в ``content`` по порядку; не найденные сжимаются как обычные
+    данные.
+    """
+    stream = GzipStream()
+    position = 0
+    for fragment in fragments:
+        start = content.find(fragment.raw, position)
+        if start == -1 or not fragment.size:
+            continue
+        yield from _compress_chunks(
+            stream, content[position:start], chunk_size)
+        yield stream.write_fragment(fragment)
+        position = start + fragment.size
+    yield from _compress_chunks(stream, content[position:], chunk_size)
+    yield stream.close()
+
+
+def _compress_chunks(stream, data, chunk_size):
+    for offset in range(0, len(data), chunk_size):
+        compressed = stream.write(
+            data[offset:offset + chunk_size], flush=False)
+        if compressed:
+            yield compressed
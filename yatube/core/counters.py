@@ -0,0 +1,112 @@
+"""Счётчики, которые копят приращения в памяти и пишут их в базу пачкой.
+
+``UPDATE ... SET views = views + 1`` на каждый просмотр упирается в
+блокировку записи SQLite. ``BufferedCounter`` складывает приращения
+в словарь процесса и раз в ``COUNTER_FLUSH_INTERVAL`` секунд (или
+когда накопилось ``COUNTER_FLUSH_THRESHOLD`` приращений) записывает
+их одним ``UPDATE`` с ``CASE`` на пачку строк. Сброс выполняет тот
+запрос, который заметил, что пора; при остановке процесса остаток
+дописывается через ``atexit``. При падении процесса теряется не больше
+одного интервала или порога просмотров.
+
+``UPDATE`` не шлёт сигналов, поэтому после записи ``on_flush``
+получает pk обновлённых строк — например, чтобы сбросить их в кеше.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Все счётчики процесса, см. discard_all.
+counters = []
+
+
+class BufferedCounter:
+    def __init__(self, model, field, on_flush=None):
+        self.model = model
+        self.field = field
+        self.on_flush = on_flush
+        self.deltas = Counter()
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        counters.append(self)
+        atexit.register(self.flush)
+
+    def increment(self, pk, amount=1):
+        with self.lock:
+            self.deltas[pk] += amount
+            self.buffered += amount
+            due = (
+                self.buffered >= settings.COUNTER_FLUSH_THRESHOLD
+                or time.monotonic() - self.last_flush
+                >= settings.COUNTER_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def pending(self, pk):
+        """Ещё не записанные в базу приращения строки ``pk``."""
+        with self.lock:
+            return self.deltas.get(pk, 0)
+
+    def flush(self):
+        """Записывает накопленное; возвращает число обновлённых строк."""
+        # Один сброс за раз, остальные запросы не ждут его окончания.
+        if not self.flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self.lock:
+                deltas, self.deltas = self.deltas, Counter()
+                self.buffered = 0
+                self.last_flush = time.monotonic()
+            if not deltas:
+                return 0
+            try:
+                updated = self.write(deltas)
+            except DatabaseError:
+                logger.exception('Не удалось записать счётчики')
+                with self.lock:
+                    self.deltas.update(deltas)
+                    self.buffered += sum(deltas.values())
+                return 0
+            if self.on_flush is not None:
+                self.on_flush(list(deltas))
+            return updated
+        finally:
+            self.flush_lock.release()
+
+    def discard(self):
+        """Забывает незаписанные приращения."""
+        with self.lock:
+            self.deltas = Counter()
+            self.buffered = 0
+
+    def write(self, deltas):
+        items = sorted(deltas.items())
+        updated = 0
+        with transaction.atomic():
+            for start in range(0, len(items), BATCH_SIZE):
+                batch = items[start:start + BATCH_SIZE]
+                increment = Case(
+                    *(When(pk=pk, then=Value(delta)) for pk, delta in batch),
+                    output_field=IntegerField())
+                updated += self.model._base_manager.filter(
+                    pk__in=[pk for pk, _ in batch],
+                ).update(**{self.field: F(self.field) + increment})
+        return updated
+
+
+def discard_all():
+    """Забывает приращения всех счётчиков процесса."""
+    for counter in counters:
+        counter.discard()
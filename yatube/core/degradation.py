@@ -0,0 +1,144 @@
+"""Деградация при проблемах с базой: отдаём последнюю удачную версию.
+
+Автомат (circuit breaker) считает ошибки базы и слишком медленные
+запросы за последние ``DEGRADATION_WINDOW`` секунд. Набралось
+``DEGRADATION_FAILURE_THRESHOLD`` — автомат размыкается, и страницы
+из ``DEGRADATION_VIEWS`` отдаются из сохранённых снимков, не трогая
+базу. Через ``DEGRADATION_OPEN_TIMEOUT`` секунд один пробный запрос
+пропускается к базе: удача замыкает автомат, неудача снова размыкает.
+
+Состояние автомата своё у каждого процесса, снимки лежат в общем кеше.
+"""
+import hashlib
+import threading
+import time
+from collections import deque
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold, window, open_timeout):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.open_timeout = open_timeout
+        self.state = self.CLOSED
+        self.failures = deque()
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if (
+                self.state == self.OPEN
+                and time.monotonic() - self.opened_at >= self.open_timeout
+            ):
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        remaining = self.open_timeout - (time.monotonic() - self.opened_at)
+        return max(1, int(remaining + 0.5))
+
+    def record_success(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.failures.clear()
+                self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.state == self.HALF_OPEN:
+                self._open(now)
+                return
+            self.failures.append(now)
+            while self.failures and self.failures[0] < now - self.window:
+                self.failures.popleft()
+            if len(self.failures) >= self.failure_threshold:
+                self._open(now)
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.probe_in_flight = False
+        self.failures.clear()
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def database_breaker():
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                settings.DEGRADATION_FAILURE_THRESHOLD,
+                settings.DEGRADATION_WINDOW,
+                settings.DEGRADATION_OPEN_TIMEOUT)
+        return _breaker
+
+
+def reset_database_breaker():
+    global _breaker
+    with _breaker_lock:
+        _breaker = None
+
+
+class QueryTimer:
+    """``execute_wrapper``, суммирующий время запросов к базе."""
+
+    def __init__(self):
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.monotonic() - started
+
+
+def snapshot_key(request):
+    """Ключ снимка по пути и параметрам из ``DEGRADATION_SNAPSHOT_PARAMS``.
+
+    Остальные параметры в ключ не входят, иначе любой ``?utm=…`` заводил
+    бы в кеше новый снимок.
+    """
+    query = urlencode([
+        (name, request.GET[name])
+        for name in settings.DEGRADATION_SNAPSHOT_PARAMS
+        if name in request.GET])
+    path = f'{request.path}?{query}'.encode()
+    return 'stale-page:' + hashlib.md5(path).hexdigest()
+
+
+def save_snapshot(key, response):
+    # Снимок обновляется не чаще раза в DEGRADATION_SNAPSHOT_INTERVAL.
+    interval = settings.DEGRADATION_SNAPSHOT_INTERVAL
+    if not cache.add(key + ':fresh', 1, interval):
+        return
+    cache.set(
+        key, (response.content, response['Content-Type'], time.time()),
+        settings.DEGRADATION_SNAPSHOT_TIMEOUT)
+
+
+def load_snapshot(key):
+    return cache.get(key)
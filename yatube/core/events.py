@@ -0,0 +1,256 @@
+"""События в реальном времени для Server-Sent Events.
+
+``publish(channels, data)`` после commit отдаёт событие бэкенду
+рассылки (``EVENTS_BROADCAST``):
+
+* ``LocalBroadcast`` — сразу в ``Hub`` своего процесса;
+* ``CacheBroadcast`` — в общий кеш под сквозным номером; каждый
+  процесс забирает новые события фоновым потоком раз в
+  ``EVENTS_POLL_INTERVAL`` секунд. Нужен, когда процессов несколько,
+  а кеш у них общий (memcached, redis).
+
+``Hub`` хранит последние ``EVENTS_BACKLOG`` событий, а подписчики ждут
+новых на ``threading.Condition``. ``sse_response`` держит поток
+событий, пока не пройдёт ``EVENTS_STREAM_TIMEOUT`` (браузер сам
+переподключится с ``Last-Event-ID``), и шлёт комментарий-пинг раз в
+``EVENTS_HEARTBEAT`` секунд. Открытых потоков в процессе не больше
+``EVENTS_MAX_CONNECTIONS``: в Django 2.2 нет асинхронных view, каждый
+поток занимает поток сервера, и лимит не даёт им выесть весь пул.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+Event = namedtuple('Event', 'id channels data')
+
+
+class Hub:
+    def __init__(self, backlog):
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=backlog)
+        self.last_id = 0
+        self.connections = 0
+
+    def deliver(self, event):
+        with self.condition:
+            if event.id <= self.last_id:
+                return
+            self.last_id = event.id
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def since(self, last_id, channels):
+        """События после ``last_id`` хотя бы в одном из ``channels``."""
+        found = []
+        for event in reversed(self.events):
+            if event.id <= last_id:
+                break
+            if not channels.isdisjoint(event.channels):
+                found.append(event)
+        found.reverse()
+        return found
+
+    def wait(self, last_id, channels, timeout):
+        """Новые события; пустой список, если за ``timeout`` их не было."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                events = self.since(last_id, channels)
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self.condition.wait(remaining)
+
+    def acquire(self):
+        with self.condition:
+            if self.connections >= settings.EVENTS_MAX_CONNECTIONS:
+                return False
+            self.connections += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.connections -= 1
+
+
+class LocalBroadcast:
+    def __init__(self, hub):
+        self.hub = hub
+        self.lock = threading.Lock()
+        self.last_id = 0
+
+    def send(self, channels, data):
+        with self.lock:
+            self.last_id += 1
+            event_id = self.last_id
+        self.hub.deliver(Event(event_id, frozenset(channels), data))
+
+    def start(self):
+        pass
+
+
+class CacheBroadcast:
+    sequence_key = 'events:sequence'
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.seen = None
+        self.missing = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def key(self, event_id):
+        return f'events:{event_id}'
+
+    def send(self, channels, data):
+        cache.add(self.sequence_key, 0, None)
+        event_id = cache.incr(self.sequence_key)
+        cache.set(
+            self.key(event_id), (list(channels), data),
+            settings.EVENTS_CACHE_TIMEOUT)
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='events-poller', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Не удалось забрать события из кеша')
+            time.sleep(settings.EVENTS_POLL_INTERVAL)
+
+    def poll(self):
+        """Переносит в ``Hub`` события, появившиеся в кеше."""
+        last = cache.get(self.sequence_key) or 0
+        if self.seen is None:
+            # Старые события при старте процесса никому не нужны.
+            self.seen = last
+        ids = range(self.seen + 1, last + 1)
+        found = cache.get_many([self.key(event_id) for event_id in ids])
+        for event_id in ids:
+            item = found.get(self.key(event_id))
+            if item is None and self.missing != event_id:
+                # Номер уже взят, а событие ещё пишется — ждём один
+                # опрос, потом пропускаем.
+                self.missing = event_id
+                return
+            if item is not None:
+                channels, data = item
+                self.hub.deliver(Event(event_id, frozenset(channels), data))
+            self.seen = event_id
+
+
+_hub = None
+_broadcast = None
+_events_lock = threading.Lock()
+
+
+def hub():
+    global _hub
+    with _events_lock:
+        if _hub is None:
+            _hub = Hub(settings.EVENTS_BACKLOG)
+        return _hub
+
+
+def broadcast():
+    global _broadcast
+    current_hub = hub()
+    with _events_lock:
+        if _broadcast is None:
+            _broadcast = import_string(settings.EVENTS_BROADCAST)(current_hub)
+        return _broadcast
+
+
+def reset_events():
+    global _hub, _broadcast
+    with _events_lock:
+        _hub = None
+        _broadcast = None
+
+
+def publish(channels, data):
+    """Рассылает событие после commit текущей транзакции."""
+    channels = list(channels)
+    transaction.on_commit(lambda: broadcast().send(channels, data))
+
+
+def format_event(event_id, name, data):
+    return (
+        f'id: {event_id}\nevent: {name}\n'
+        f'data: {json.dumps(data)}\n\n').encode()
+
+
+class EventStream:
+    """Тело ответа SSE; освобождает место в ``Hub`` при закрытии."""
+
+    def __init__(self, hub, channels, last_id, name, summarize):
+        self.hub = hub
+        self.channels = frozenset(channels)
+        self.last_id = last_id
+        self.name = name
+        self.summarize = summarize
+        self.closed = False
+
+    def __iter__(self):
+        yield f'retry: {settings.EVENTS_RETRY * 1000}\n\n'.encode()
+        deadline = time.monotonic() + settings.EVENTS_STREAM_TIMEOUT
+        while time.monotonic() < deadline:
+            events = self.hub.wait(
+                self.last_id, self.channels, settings.EVENTS_HEARTBEAT)
+            if not events:
+                yield b': ping\n\n'
+                continue
+            self.last_id = events[-1].id
+            yield format_event(
+                self.last_id, self.name, self.summarize(events))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.hub.release()
+
+
+def sse_response(request, channels, name, summarize):
+    """Поток событий ``name`` из ``channels`` или 503 сверх лимита.
+
+    ``summarize(events)`` превращает пачку событий в данные одного
+    сообщения.
+    """
+    current_hub = hub()
+    broadcast().start()
+    if not current_hub.acquire():
+        response = HttpResponse(
+            'Слишком много открытых потоков событий', status=503)
+        response['Retry-After'] = str(settings.EVENTS_RETRY)
+        return response
+    try:
+        last_id = int(request.META.get('HTTP_LAST_EVENT_ID', ''))
+    except ValueError:
+        last_id = current_hub.last_id
+    # Событий старше переподключения в буфере может уже не быть,
+    # а номер из другого процесса может быть впереди этого.
+    last_id = min(last_id, current_hub.last_id)
+    # Пока поток открыт, база ему не нужна.
+    connection.close()
+    response = StreamingHttpResponse(
+        EventStream(current_hub, channels, last_id, name, summarize),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
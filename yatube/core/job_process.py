@@ -0,0 +1,19 @@
+"""Точки входа для процессов пула обработчика задач.
+
+Модуль нарочно не импортирует модели: при запуске через spawn он
+загружается в новом процессе раньше, чем поднят Django.
+"""
+import os
+
+
+def setup(settings_module):
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def execute_by_pk(pk):
+    from .jobs import execute_by_pk as execute
+
+    return execute(pk)
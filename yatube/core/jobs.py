@@ -0,0 +1,382 @@
+"""Фоновые задачи в очереди на базе данных.
+
+Задача — функция, помеченная ``@task`` в модуле ``tasks.py`` любого
+приложения::
+
+    @task(queue='media', priority=3)
+    def generate_thumbnail(post_id):
+        ...
+
+    generate_thumbnail.delay(post.pk)
+    generate_thumbnail.enqueue(
+        args=(post.pk,), dedup_key=f'thumbnail:{post.pk}', delay=60)
+
+Задачи выполняет ``manage.py run_jobs``. Обработчик забирает задачу
+условным ``UPDATE``, так что несколько обработчиков не возьмут одну
+задачу дважды на любой СУБД. Упавшая задача возвращается в очередь с
+экспоненциальной задержкой, пока не кончатся попытки. Задачи, взятые
+обработчиком, который умер, через ``JOBS_LOCK_TIMEOUT`` секунд снова
+попадают в очередь. При ``JOBS_EAGER = True`` задачи выполняются сразу
+при постановке — для тестов и разработки без обработчика.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, as_completed, wait)
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from . import job_process
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, name, queue, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.enqueue(args=args, kwargs=kwargs)
+
+    def enqueue(self, args=(), kwargs=None, priority=None, run_at=None,
+                delay=None, dedup_key=None, queue=None):
+        """Ставит задачу в очередь и возвращает её ``Job``.
+
+        Если незавершённая задача с тем же ``dedup_key`` уже есть,
+        новая не создаётся, возвращается существующая.
+        """
+        if run_at is None:
+            run_at = timezone.now()
+        if delay:
+            run_at += timedelta(seconds=delay)
+        job = Job(
+            task=self.name,
+            arguments=json.dumps(
+                {'args': list(args), 'kwargs': kwargs or {}},
+                cls=DjangoJSONEncoder),
+            queue=queue or self.queue,
+            priority=self.priority if priority is None else priority,
+            run_at=run_at,
+            dedup_key=dedup_key,
+            max_attempts=self.max_attempts,
+        )
+        if dedup_key is not None:
+            existing = active_job(dedup_key)
+            if existing is not None:
+                return existing
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            existing = active_job(dedup_key)
+            if dedup_key is None or existing is None:
+                raise
+            return existing
+        if settings.JOBS_EAGER:
+            if claim(job, 'eager'):
+                execute(job)
+            job.refresh_from_db()
+        return job
+
+
+def task(name=None, queue='default', priority=5, max_attempts=5):
+    """Декоратор, регистрирующий функцию как фоновую задачу."""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registered = Task(func, task_name, queue, priority, max_attempts)
+        _registry[task_name] = registered
+        return registered
+    return decorator
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def active_job(dedup_key):
+    return Job.objects.filter(
+        dedup_key=dedup_key, status__in=(Job.QUEUED, Job.RUNNING)).first()
+
+
+def schedule_periodic(task, interval, args=()):
+    """Ставит задачу на ближайшую границу интервала в ``interval`` секунд.
+
+    Ключ дедупликации — номер интервала, поэтому запуск не задвоится,
+    даже если его ставят несколько обработчиков. Периодическая задача
+    сама вызывает это в начале выполнения. При ``JOBS_EAGER`` ничего не
+    ставится: иначе задача запускала бы себя бесконечно.
+    """
+    if settings.JOBS_EAGER:
+        return None
+    slot = int(timezone.now().timestamp() // interval) + 1
+    return task.enqueue(
+        args=args,
+        run_at=datetime.fromtimestamp(slot * interval, tz=timezone.utc),
+        dedup_key=':'.join([task.name, *map(str, args), str(slot)]))
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором, со случайным разбросом."""
+    delay = min(
+        settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(job, worker):
+    """Забирает задачу себе; ``False``, если её уже взял другой."""
+    now = timezone.now()
+    claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=worker, locked_at=now,
+        attempts=F('attempts') + 1)
+    return bool(claimed)
+
+
+def next_jobs(queues, limit):
+    jobs = Job.objects.filter(status=Job.QUEUED, run_at__lte=timezone.now())
+    if queues:
+        jobs = jobs.filter(queue__in=queues)
+    return list(jobs.order_by('priority', 'run_at', 'pk')[:limit])
+
+
+def execute(job):
+    """Выполняет взятую задачу и записывает результат.
+
+    Возвращает (успех, задержка в очереди, время выполнения) в секундах.
+    """
+    job.refresh_from_db()
+    queue_latency = (timezone.now() - job.run_at).total_seconds()
+    started = time.monotonic()
+    try:
+        arguments = json.loads(job.arguments)
+        get_task(job.task)(*arguments['args'], **arguments['kwargs'])
+    except Exception:
+        duration = time.monotonic() - started
+        fail(job, traceback.format_exc())
+        return False, queue_latency, duration
+    duration = time.monotonic() - started
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, finished=timezone.now(), last_error='')
+    return True, queue_latency, duration
+
+
+def execute_by_pk(pk):
+    """То же для пула процессов: в другой процесс передаётся только pk."""
+    from django.db import connection
+
+    try:
+        return execute(Job.objects.get(pk=pk))
+    finally:
+        connection.close()
+
+
+def fail(job, error):
+    logger.warning('Задача %s не удалась:\n%s', job, error)
+    if job.attempts < job.max_attempts:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.QUEUED, last_error=error, locked_by='',
+            run_at=timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)))
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, last_error=error, finished=timezone.now())
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи обработчиков, которые пропали.
+
+    Пропавший запуск — израсходованная попытка (её засчитал ``claim``):
+    задача, которая роняет обработчик, после ``max_attempts`` запусков
+    помечается неудавшейся, а не возвращается в очередь бесконечно.
+    Возвращает число задач, вернувшихся в очередь.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=deadline)
+    error = 'Обработчик пропал, не закончив задачу'
+    with transaction.atomic():
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED, last_error=error, locked_by='',
+            finished=timezone.now())
+        requeued = stale.update(
+            status=Job.QUEUED, last_error=error, locked_by='')
+    if failed:
+        logger.warning(
+            'Задачи пропавших обработчиков исчерпали попытки: %d', failed)
+    return requeued
+
+
+def queue_stats():
+    """Сколько задач в каждом состоянии и возраст самой старой в очереди."""
+    counts = dict(
+        Job.objects.values_list('status').annotate(total=Count('pk')))
+    oldest = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=timezone.now(),
+    ).aggregate(oldest=Min('run_at'))['oldest']
+    return {
+        'counts': {
+            status: counts.get(status, 0) for status, _ in Job.STATUSES},
+        'oldest_queued_age': (
+            round((timezone.now() - oldest).total_seconds(), 3)
+            if oldest else 0),
+    }
+
+
+class WorkerMetrics:
+    """Пропускная способность и задержки обработчика по задачам."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.tasks = defaultdict(lambda: {
+            'done': 0, 'failed': 0, 'queue_latency': 0.0, 'duration': 0.0,
+            'max_duration': 0.0})
+
+    def record(self, name, ok, queue_latency, duration):
+        with self.lock:
+            stats = self.tasks[name]
+            stats['done' if ok else 'failed'] += 1
+            stats['queue_latency'] += queue_latency
+            stats['duration'] += duration
+            stats['max_duration'] = max(stats['max_duration'], duration)
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            result = {}
+            for name, stats in self.tasks.items():
+                total = stats['done'] + stats['failed']
+                result[name] = {
+                    'done': stats['done'],
+                    'failed': stats['failed'],
+                    'per_second': round(total / elapsed, 3),
+                    'avg_queue_latency': round(
+                        stats['queue_latency'] / total, 3),
+                    'avg_duration': round(stats['duration'] / total, 3),
+                    'max_duration': round(stats['max_duration'], 3),
+                }
+            return result
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Worker:
+    """Забирает задачи из базы и выполняет их в пуле потоков или процессов."""
+
+    def __init__(self, queues=(), concurrency=4, pool='thread',
+                 poll_interval=1.0, name=None):
+        self.queues = tuple(queues)
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.name = name or worker_name()
+        self.metrics = WorkerMetrics()
+        self.stopping = threading.Event()
+        self.in_flight = {}
+
+    def entry_point(self):
+        """Функция, которая выполняет задачу по pk внутри пула."""
+        if self.pool == 'process':
+            return job_process.execute_by_pk
+        return execute_by_pk
+
+    def make_executor(self):
+        if self.pool == 'process':
+            import multiprocessing
+
+            # spawn, а не fork: дочерние процессы не должны делить
+            # с родителем открытые соединения с базой.
+            return ProcessPoolExecutor(
+                self.concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=job_process.setup,
+                initargs=(os.environ['DJANGO_SETTINGS_MODULE'],))
+        return ThreadPoolExecutor(
+            self.concurrency, thread_name_prefix='job')
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self, burst=False, max_jobs=None, on_stats=None,
+            stats_interval=60):
+        """Главный цикл; ``burst`` — выйти, когда очередь опустеет."""
+        self.in_flight = {}
+        submitted = 0
+        last_stats = time.monotonic()
+        with self.make_executor() as executor:
+            while not self.stopping.is_set():
+                limit = self.concurrency - len(self.in_flight)
+                if max_jobs is not None:
+                    limit = min(limit, max_jobs - submitted)
+                claimed = self.fill(executor, limit)
+                submitted += claimed
+                # Место в пуле было, а готовых задач не нашлось.
+                idle = limit > 0 and not claimed
+                self.collect_done(timeout=0 if claimed else None)
+                finished = max_jobs is not None and submitted >= max_jobs
+                if not self.in_flight and (finished or burst and idle):
+                    break
+                if not claimed and not self.in_flight:
+                    self.stopping.wait(self.poll_interval)
+                if on_stats and time.monotonic() - last_stats > stats_interval:
+                    on_stats(self.metrics.snapshot())
+                    last_stats = time.monotonic()
+            # Остановка: новые задачи не берём, взятые доделываем.
+            for future in as_completed(list(self.in_flight)):
+                self.collect(self.in_flight.pop(future), future)
+        return self.metrics.snapshot()
+
+    def fill(self, executor, limit):
+        """Берёт до ``limit`` задач и отдаёт их пулу."""
+        requeue_stale()
+        if limit <= 0:
+            return 0
+        claimed = 0
+        for job in next_jobs(self.queues, limit):
+            if claim(job, self.name):
+                future = executor.submit(self.entry_point(), job.pk)
+                self.in_flight[future] = job.task
+                claimed += 1
+        return claimed
+
+    def collect_done(self, timeout=None):
+        if not self.in_flight:
+            return
+        if timeout is None:
+            timeout = self.poll_interval
+        done, _ = wait(
+            self.in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            self.collect(self.in_flight.pop(future), future)
+
+    def collect(self, name, future):
+        try:
+            ok, queue_latency, duration = future.result()
+        except Exception:
+            # Упал сам процесс пула; задачу вернёт requeue_stale().
+            logger.exception('Обработчик задачи %s завершился аварийно', name)
+            return
+        self.metrics.record(name, ok, queue_latency, duration)
@@ -0,0 +1,54 @@
+import json
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в базе данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues', default=[],
+            help='Очередь для обработки; можно указать несколько раз. '
+                 'По умолчанию — все.')
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Сколько задач выполнять одновременно.')
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default='thread',
+            help='process — для задач, нагружающих процессор.')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершиться, когда в очереди не останется готовых задач.')
+        parser.add_argument(
+            '--max-jobs', type=int,
+            help='Завершиться после стольких задач.')
+        parser.add_argument(
+            '--stats-interval', type=float, default=60,
+            help='Как часто печатать метрики, в секундах.')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            queues=options['queues'],
+            concurrency=options['concurrency'],
+            pool=options['pool'],
+            poll_interval=options['poll_interval'])
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: worker.stop())
+        self.stdout.write(
+            f'Обработчик {worker.name}: пул {options["pool"]} '
+            f'на {options["concurrency"]}')
+        metrics = worker.run(
+            burst=options['burst'],
+            max_jobs=options['max_jobs'],
+            on_stats=self.write_stats,
+            stats_interval=options['stats_interval'])
+        self.write_stats(metrics)
+        self.stdout.write(self.style.SUCCESS('Обработчик остановлен'))
+
+    def write_stats(self, metrics):
+        self.stdout.write(json.dumps(metrics, ensure_ascii=False, indent=2))
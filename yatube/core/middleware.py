@@ -0,0 +1,279 @@
+import datetime
+import mimetypes
+import os
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import DatabaseError, connection
+from django.http import FileResponse, HttpResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve
+from django.utils._os import safe_join
+from django.utils.cache import add_never_cache_headers, patch_vary_headers
+
+from .admission import (CACHED_READ, DEFAULT, admission_controller,
+                        queue_latency)
+from .compression import accepted_encodings, compress_with_fragments
+from .degradation import (QueryTimer, database_breaker, load_snapshot,
+                          save_snapshot, snapshot_key)
+from .loaders import batch_loading
+
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE_CONTENT_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+)
+
+
+class PrecompressedStaticMiddleware:
+    """Отдаёт собранную статику, выбирая предсжатый вариант файла.
+
+    Файлы с отпечатком в имени кешируются браузером «навсегда»
+    (``STATIC_FAR_FUTURE_MAX_AGE``), остальные — на
+    ``STATIC_MAX_AGE`` секунд. Если файла нет в ``STATIC_ROOT``,
+    запрос уходит дальше по цепочке.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_url = settings.STATIC_URL
+        self.static_root = getattr(settings, 'STATIC_ROOT', None)
+        self.hashed_names = None
+
+    def __call__(self, request):
+        if (
+            self.static_root
+            and request.method in ('GET', 'HEAD')
+            and request.path.startswith(self.static_url)
+        ):
+            response = self.serve(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request):
+        name = request.path[len(self.static_url):]
+        try:
+            path = safe_join(self.static_root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+            [coding for coding, _ in STATIC_ENCODINGS])
+        encoding = None
+        for coding, suffix in STATIC_ENCODINGS:
+            if coding in accepted and os.path.isfile(path + suffix):
+                encoding = coding
+                path += suffix
+                break
+        content_type, _ = mimetypes.guess_type(name)
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if self.is_hashed(name):
+            response['Cache-Control'] = 'public, max-age=%d, immutable' % (
+                settings.STATIC_FAR_FUTURE_MAX_AGE)
+        else:
+            response['Cache-Control'] = 'public, max-age=%d' % (
+                settings.STATIC_MAX_AGE)
+        return response
+
+    def is_hashed(self, name):
+        if self.hashed_names is None:
+            hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+            self.hashed_names = frozenset(hashed_files.values())
+        return name in self.hashed_names
+
+
+class FragmentGZipMiddleware:
+    """Сжимает ответы gzip, не пережимая закешированные фрагменты.
+
+    Фрагменты из ``{% compressed_cache %}`` уже лежат в кеше сжатыми:
+    их байты вклеиваются в выходной поток как есть, а сжимается только
+    остальная часть страницы. Потоковые ответы (события, долгие опросы,
+    файлы) не сжимаются: gzip копит байты до сброса, и клиент получал бы
+    события с задержкой.
+    """
+
+    min_length = 200
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.should_compress(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), ('gzip',))
+        if 'gzip' not in accepted:
+            return response
+        fragments = getattr(request, 'compressed_fragments', ())
+        compressed = b''.join(
+            compress_with_fragments(response.content, fragments))
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'gzip'
+        return response
+
+    def should_compress(self, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return False
+        content_type = response.get('Content-Type', '')
+        if (content_type.startswith('text/event-stream')
+                or not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)):
+            return False
+        return len(response.content) >= self.min_length
+
+
+class BatchLoaderMiddleware:
+    """Включает пакетную подгрузку связанных объектов на время запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with batch_loading():
+            return self.get_response(request)
+
+
+class DegradationMiddleware:
+    """Отдаёт сохранённые страницы, пока база недоступна или тормозит.
+
+    Снимки пишутся только с ответов посетителям без сессии: такую
+    страницу можно показать кому угодно, и для её выдачи не нужна
+    база. Подробности — в ``core.degradation``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = frozenset(settings.DEGRADATION_VIEWS)
+
+    def __call__(self, request):
+        if not self.is_degradable(request):
+            return self.get_response(request)
+        breaker = database_breaker()
+        key = snapshot_key(request)
+        if not breaker.allow_request():
+            return self.stale_response(key) or self.unavailable(breaker)
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        if getattr(request, 'database_failed', False):
+            breaker.record_failure()
+        elif timer.duration > settings.DEGRADATION_SLOW_DB_TIME:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            ):
+                save_snapshot(key, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, DatabaseError):
+            return None
+        request.database_failed = True
+        if not self.is_degradable(request):
+            return None
+        return self.stale_response(snapshot_key(request))
+
+    def is_degradable(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.view_name in self.views
+
+    def stale_response(self, key):
+        snapshot = load_snapshot(key)
+        if snapshot is None:
+            return None
+        content, content_type, saved_at = snapshot
+        banner = render_to_string('core/stale_banner.html', {
+            'saved_at': datetime.datetime.fromtimestamp(
+                saved_at, tz=datetime.timezone.utc)}).encode()
+        content = content.replace(b'<body>', b'<body>' + banner, 1)
+        response = HttpResponse(content, content_type=content_type)
+        response['Warning'] = '110 - "Response is Stale"'
+        response['X-Served-Stale'] = '1'
+        add_never_cache_headers(response)
+        return response
+
+    def unavailable(self, breaker):
+        response = HttpResponse(
+            render_to_string('core/503.html'), status=503)
+        response['Retry-After'] = str(breaker.retry_after())
+        return response
+
+
+class AdmissionControlMiddleware:
+    """Отклоняет низкоприоритетные запросы с 503, когда сайт перегружен.
+
+    Классы запросов, пределы и порог задержки настраиваются в
+    ``ADMISSION_*``; подробности — в ``core.admission``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.view_classes = settings.ADMISSION_VIEW_CLASSES
+        self.cached_read_views = frozenset(
+            settings.ADMISSION_CACHED_READ_VIEWS)
+        self.exempt_views = frozenset(settings.ADMISSION_EXEMPT_VIEWS)
+        self.unmeasured_classes = frozenset(
+            settings.ADMISSION_UNMEASURED_CLASSES)
+
+    def __call__(self, request):
+        arrived = time.time()
+        request_class = self.classify(request)
+        if request_class is None:
+            return self.get_response(request)
+        controller = admission_controller()
+        if not controller.admit(request_class):
+            return self.shed()
+        try:
+            return self.get_response(request)
+        finally:
+            latency = None
+            if request_class not in self.unmeasured_classes:
+                latency = queue_latency(request, arrived)
+            controller.release(request_class, latency)
+
+    def classify(self, request):
+        """Класс запроса или None для запросов мимо контроля допуска."""
+        try:
+            view_name = resolve(request.path_info).view_name
+        except Resolver404:
+            return DEFAULT
+        if view_name in self.exempt_views:
+            return None
+        if (
+            view_name in self.cached_read_views
+            and request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        ):
+            return CACHED_READ
+        return self.view_classes.get(view_name, DEFAULT)
+
+    def shed(self):
+        response = HttpResponse(
+            render_to_string('core/503.html'), status=503)
+        response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER)
+        return response
@@ -0,0 +1,43 @@
+import pickle
+
+from django.db import migrations, models
+
+
+def pickle_to_json(apps, schema_editor):
+    from core.outbox import dump_message
+
+    OutgoingEmail = apps.get_model('core', 'OutgoingEmail')
+    for email in OutgoingEmail.objects.iterator():
+        email.payload = dump_message(pickle.loads(email.message))
+        email.save(update_fields=['payload'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='payload',
+            field=models.TextField(default=''),
+            preserve_default=False,
+        ),
+        migrations.RunPython(pickle_to_json, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='outgoingemail',
+            name='message',
+        ),
+        migrations.RenameField(
+            model_name='outgoingemail',
+            old_name='payload',
+            new_name='message',
+        ),
+        migrations.AlterField(
+            model_name='outgoingemail',
+            name='message',
+            field=models.TextField(verbose_name='Письмо'),
+        ),
+    ]
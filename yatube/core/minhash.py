@@ -0,0 +1,200 @@
+"""Поиск почти одинаковых текстов: шинглы, MinHash и LSH.
+
+Текст приводится к нижнему регистру, цифры — к нулю, знаки препинания
+выбрасываются, и он режется на шинглы по ``SHINGLE`` символов. Сходство
+двух текстов — коэффициент Жаккара их множеств шинглов, а MinHash
+оценивает его по ``PERMUTATIONS`` минимумам.
+
+Минимумы считаются одним хешем на шингл (one permutation hashing):
+верхние биты хеша выбирают ячейку, в ячейке остаётся наименьшее
+значение, пустые ячейки берут значение соседней справа (densification,
+Shrivastava и Li). Так подпись стоит O(число шинглов), а не
+``PERMUTATIONS`` хешей на шингл: пост в пару сотен символов — около
+0.2 мс на чистом Python.
+
+Для сравнения хранится только младший байт каждого минимума (b-bit
+minwise hashing): 64 байта на текст. Случайное совпадение байта даёт
+поправку 1/256, её ``similarity`` вычитает.
+
+Кандидаты ищутся по LSH: подпись режется на ``BANDS`` полос по
+``ROWS`` минимумов, ключ полосы — хеш её значений. Тексты с общим
+ключом хотя бы одной полосы — кандидаты; при сходстве 0.8 текст
+попадает в кандидаты с вероятностью 1 - (1 - 0.8⁴)¹⁶ ≈ 0.9998, при 0.3
+— лишь в 12% случаев. Кандидаты проверяются по подписям.
+
+Параметры зашиты константами: подписи и ключи, посчитанные с другими,
+несовместимы.
+"""
+import re
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from hashlib import blake2b
+from operator import eq
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE = 5
+
+BIN_SHIFT = 64 - 6  # 2 ** 6 == PERMUTATIONS
+VALUE_MASK = (1 << BIN_SHIFT) - 1
+MASK64 = (1 << 64) - 1
+# Мультипликативное перемешивание: crc32 сам по себе плохо
+# распределяет верхние биты.
+MIX = 0x9E3779B97F4A7C15
+BAND_FORMAT = struct.Struct(f'<{ROWS}Q')
+# Вероятность случайного совпадения младшего байта минимумов.
+CHANCE = 1 / 256
+
+NON_WORD = re.compile(r'[\W_]+')
+DIGIT = re.compile(r'\d')
+
+Fingerprint = namedtuple('Fingerprint', 'sketch bands')
+
+
+def normalize(text):
+    text = DIGIT.sub('0', text.lower())
+    return ' '.join(NON_WORD.sub(' ', text).split())
+
+
+def shingles(text):
+    text = normalize(text)
+    return {
+        text[start:start + SHINGLE]
+        for start in range(len(text) - SHINGLE + 1)}
+
+
+def signature(shingle_set):
+    """``PERMUTATIONS`` минимумов множества шинглов."""
+    bins = [None] * PERMUTATIONS
+    for shingle in shingle_set:
+        hashed = (zlib.crc32(shingle.encode()) * MIX) & MASK64
+        index = hashed >> BIN_SHIFT
+        value = hashed & VALUE_MASK
+        current = bins[index]
+        if current is None or value < current:
+            bins[index] = value
+    if None not in bins:
+        return bins
+    filled = [index for index, value in enumerate(bins) if value is not None]
+    result = []
+    for index, value in enumerate(bins):
+        if value is None:
+            # Ближайшая заполненная ячейка справа, по кругу.
+            source = filled[bisect_left(filled, index) % len(filled)]
+            distance = (source - index) % PERMUTATIONS
+            value = bins[source] + (distance << BIN_SHIFT)
+        result.append(value)
+    return result
+
+
+def band_keys(values):
+    """Ключи полос подписи; номер полосы входит в ключ."""
+    keys = []
+    for band in range(BANDS):
+        data = BAND_FORMAT.pack(*values[band * ROWS:(band + 1) * ROWS])
+        digest = blake2b(data, digest_size=8, salt=bytes([band])).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def fingerprint(text, min_shingles=1):
+    """Отпечаток текста или ``None``, если шинглов меньше ``min_shingles``.
+    """
+    shingle_set = shingles(text)
+    if len(shingle_set) < max(min_shingles, 1):
+        return None
+    values = signature(shingle_set)
+    return Fingerprint(
+        bytes(value & 0xFF for value in values), band_keys(values))
+
+
+def similarity(sketch, other):
+    """Оценка коэффициента Жаккара по двум подписям из ``fingerprint``."""
+    matches = sum(map(eq, sketch, other)) / PERMUTATIONS
+    return max((matches - CHANCE) / (1 - CHANCE), 0.0)
+
+
+class MinHashIndex:
+    """LSH-индекс в памяти для пакетной обработки и замеров.
+
+    Тексты нумеруются с нуля в порядке добавления. Подписи лежат в
+    одном ``bytearray``, ключи полос — в отсортированных массивах
+    ``(ключ << 32) | номер``, по массиву на полосу, и ищутся бинарным
+    поиском: миллион текстов занимает около 200 МБ. ``extend``
+    добавляет тексты пачкой и пересобирает массивы, ``add`` — по
+    одному в словарь до следующей пересборки.
+    """
+
+    def __init__(self):
+        self.sketches = bytearray()
+        self.bands = [array('Q') for _ in range(BANDS)]
+        self.recent = defaultdict(list)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def short_key(key):
+        return key & 0xFFFFFFFF
+
+    def add(self, fp):
+        position = self.size
+        self.sketches += fp.sketch
+        for band, key in enumerate(fp.bands):
+            self.recent[band, self.short_key(key)].append(position)
+        self.size += 1
+        return position
+
+    def extend(self, fingerprints):
+        start = self.size
+        added = [[] for _ in range(BANDS)]
+        for position, fp in enumerate(fingerprints, start):
+            self.sketches += fp.sketch
+            for band, key in enumerate(fp.bands):
+                added[band].append(self.short_key(key) << 32 | position)
+            self.size = position + 1
+        for band, entries in enumerate(added):
+            entries.extend(self.bands[band])
+            entries.extend(
+                short_key << 32 | position
+                for (recent_band, short_key), positions in self.recent.items()
+                if recent_band == band for position in positions)
+            entries.sort()
+            self.bands[band] = array('Q', entries)
+        self.recent.clear()
+        return range(start, self.size)
+
+    def candidates(self, fp, limit):
+        found = set()
+        for band, key in enumerate(fp.bands):
+            short_key = self.short_key(key)
+            entries = self.bands[band]
+            index = bisect_left(entries, short_key << 32)
+            while index < len(entries) and entries[index] >> 32 == short_key:
+                found.add(entries[index] & 0xFFFFFFFF)
+                if len(found) >= limit:
+                    return found
+                index += 1
+            found.update(self.recent.get((band, short_key), ()))
+        return found
+
+    def sketch(self, position):
+        start = position * PERMUTATIONS
+        return bytes(self.sketches[start:start + PERMUTATIONS])
+
+    def nearest(self, fp, threshold, limit=100):
+        """Самый похожий текст не ниже ``threshold``: (номер, сходство)."""
+        best = None
+        best_similarity = threshold
+        for position in self.candidates(fp, limit):
+            score = similarity(fp.sketch, self.sketch(position))
+            if score >= best_similarity:
+                best, best_similarity = position, score
+        if best is None:
+            return None
+        return best, best_similarity
@@ -0,0 +1,100 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на базе данных (см. core.jobs)."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не удалась'),
+    )
+
+    task = models.CharField('Задача', max_length=200)
+    arguments = models.TextField('Аргументы (JSON)', default='{}')
+    queue = models.CharField('Очередь', max_length=50, default='default')
+    # 0 — самые важные задачи, как у контроля допуска.
+    priority = models.PositiveSmallIntegerField('Приоритет', default=5)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED)
+    run_at = models.DateTimeField('Выполнить не раньше', default=timezone.now)
+    dedup_key = models.CharField(
+        'Ключ дедупликации', max_length=200, blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Предел попыток', default=5)
+    locked_by = models.CharField('Обработчик', max_length=100, blank=True)
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=['status', 'queue', 'priority', 'run_at'],
+                name='core_job_pickup_idx'),
+        ]
+        constraints = [
+            # Одинаковый ключ может быть только у одной незавершённой
+            # задачи; выполненные и упавшие не мешают поставить новую.
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status__in=('queued', 'running')),
+                name='core_job_active_dedup_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в исходящей очереди (см. core.outbox)."""
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ждёт отправки'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Не отправлено'),
+    )
+
+    subject = models.CharField('Тема', max_length=255)
+    recipients = models.TextField('Получатели')
+    # EmailMessage в JSON, с вложениями и HTML-версией (core.outbox).
+    message = models.TextField('Письмо')
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING)
+    send_after = models.DateTimeField(
+        'Отправить не раньше', default=timezone.now)
+    dedup_key = models.CharField(
+        'Ключ дедупликации', max_length=200, unique=True, blank=True,
+        null=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    locked_by = models.CharField('Отправитель', max_length=100, blank=True)
+    locked_at = models.DateTimeField('Взято в работу', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создано', auto_now_add=True)
+    sent = models.DateTimeField('Отправлено', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = [
+            models.Index(
+                fields=['status', 'send_after'], name='core_email_pickup_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} → {self.recipients}'
@@ -0,0 +1,180 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+# Маркер «объекта нет в базе» для отрицательного кеширования.
+MISSING = '__missing__'
+
+
+class LocalLRU:
+    """Маленький потокобезопасный LRU-кеш внутри процесса.
+
+    Записи живут не дольше ``ttl`` секунд: сброс по сигналу виден
+    только в своём процессе, а в остальных устаревшая копия исчезнет
+    сама.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + self.ttl)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class ObjectCache:
+    """Кеш отдельных объектов модели по первичному ключу и ``lookups``.
+
+    Чтение идёт через три уровня: LRU процесса, общий кеш Django и
+    база. По ``lookups`` (например, ``username``) в общем кеше хранится
+    только pk, сам объект лежит в одной записи. Отсутствующие объекты
+    тоже запоминаются на ``OBJECT_CACHE_NEGATIVE_TIMEOUT`` секунд.
+
+    Записи сбрасываются по ``post_save``/``post_delete``; изменения через
+    ``QuerySet.update()`` и ``bulk_create()`` сигналов не шлют — их
+    сбрасывает ``invalidate_pks``, иначе они видны только после
+    истечения ``OBJECT_CACHE_TIMEOUT``.
+    """
+
+    def __init__(self, model, lookups=()):
+        self.model = model
+        self.lookups = tuple(lookups)
+        self.prefix = 'objcache:' + model._meta.label_lower
+        self.local = LocalLRU(
+            settings.OBJECT_CACHE_LOCAL_SIZE, settings.OBJECT_CACHE_LOCAL_TTL)
+        uid = 'object_cache:' + self.prefix
+        post_save.connect(
+            self.invalidate, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(
+            self.invalidate, sender=model, weak=False, dispatch_uid=uid)
+
+    def key(self, field, value):
+        # Слаги и имена бывают не ASCII и длинными, а memcached
+        # принимает только короткие ASCII-ключи.
+        digest = hashlib.md5(str(value).encode()).hexdigest()
+        return f'{self.prefix}:{field}:{digest}'
+
+    def get(self, **lookup):
+        """Как ``Model.objects.get()`` по одному полю, но через кеш."""
+        (field, value), = lookup.items()
+        if field in ('pk', self.model._meta.pk.name):
+            return self.get_by_pk(value)
+        if field not in self.lookups:
+            raise ValueError(f'Поле {field} не кешируется')
+        key = self.key(field, value)
+        pk = self._read(key)
+        if pk == MISSING:
+            raise self.model.DoesNotExist
+        if pk is not None:
+            obj = self.get_by_pk(pk)
+            if getattr(obj, field) == value:
+                return obj
+        try:
+            obj = self.model._default_manager.get(**{field: value})
+        except self.model.DoesNotExist:
+            self._write(key, MISSING, settings.OBJECT_CACHE_NEGATIVE_TIMEOUT)
+            raise
+        self.store(obj)
+        return obj
+
+    def get_by_pk(self, pk):
+        key = self.key('pk', pk)
+        data = self._read(key)
+        if data == MISSING:
+            raise self.model.DoesNotExist
+        if data is not None:
+            return pickle.loads(data)
+        try:
+            obj = self.model._default_manager.get(pk=pk)
+        except self.model.DoesNotExist:
+            self._write(key, MISSING, settings.OBJECT_CACHE_NEGATIVE_TIMEOUT)
+            raise
+        self.store(obj)
+        return obj
+
+    def store(self, obj):
+        self._write(
+            self.key('pk', obj.pk), pickle.dumps(obj),
+            settings.OBJECT_CACHE_TIMEOUT)
+        for field in self.lookups:
+            self._write(
+                self.key(field, getattr(obj, field)), obj.pk,
+                settings.OBJECT_CACHE_TIMEOUT)
+
+    def invalidate(self, sender, instance, **kwargs):
+        keys = [self.key('pk', instance.pk)] + [
+            self.key(field, getattr(instance, field))
+            for field in self.lookups]
+        self._delete_on_commit(keys)
+
+    def invalidate_pks(self, pks):
+        """Сброс объектов, изменённых в обход сигналов (``update()``).
+
+        Записи по ``lookups`` хранят только pk и остаются верными.
+        """
+        self._delete_on_commit([self.key('pk', pk) for pk in pks])
+
+    def _delete_on_commit(self, keys):
+        self._delete(keys)
+        # Пока транзакция не закрыта, другой запрос может успеть
+        # положить в кеш старую версию — сбрасываем ещё раз после commit.
+        transaction.on_commit(lambda: self._delete(keys))
+
+    def _read(self, key):
+        value = self.local.get(key)
+        if value is None:
+            value = cache.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def _write(self, key, value, timeout):
+        cache.set(key, value, timeout)
+        self.local.set(key, value)
+
+    def _delete(self, keys):
+        cache.delete_many(keys)
+        for key in keys:
+            self.local.delete(key)
+
+
+def get_cached_object_or_404(object_cache, **lookup):
+    try:
+        return object_cache.get(**lookup)
+    except object_cache.model.DoesNotExist:
+        raise Http404(
+            f'No {object_cache.model._meta.object_name} matches the query.')
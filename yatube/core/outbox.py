@@ -0,0 +1,190 @@
+"""Исходящая почта через таблицу-outbox.
+
+``OutboxEmailBackend`` — бэкенд почты Django, который не отправляет
+письма, а записывает их в ``OutgoingEmail`` в той же транзакции, что и
+изменения, ради которых письмо пишется: откат транзакции отменяет и
+письмо, а упавший SMTP не роняет запрос. Поэтому через outbox идут все
+письма сайта, включая письма ``django.contrib.auth``.
+
+Задача ``core.tasks.deliver_outbox`` забирает письма пачками по
+``EMAIL_OUTBOX_BATCH_SIZE`` условным ``UPDATE``, как очередь задач, и
+отправляет настоящим бэкендом (``EMAIL_OUTBOX_BACKEND``) не больше чем
+в ``EMAIL_OUTBOX_CONCURRENCY`` соединений сразу. Неотправленное
+письмо ждёт повтора с экспоненциальной задержкой, после
+``EMAIL_OUTBOX_MAX_ATTEMPTS`` попыток остаётся со статусом ``failed``.
+"""
+import base64
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .bulk import insert_ignoring_conflicts
+from .jobs import retry_delay
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def dump_message(message):
+    """Письмо в JSON: поля, HTML-версии и вложения-кортежи.
+
+    Вложения ``MIMEBase`` не поддерживаются — сайт их не шлёт.
+    """
+    attachments = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError('Outbox не принимает вложения MIMEBase')
+        filename, content, mimetype = attachment
+        if isinstance(content, bytes):
+            content = {'base64': base64.b64encode(content).decode()}
+        attachments.append([filename, content, mimetype])
+    return json.dumps({
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': attachments,
+    }, ensure_ascii=False)
+
+
+def load_message(data):
+    fields = json.loads(data)
+    attachments = []
+    for filename, content, mimetype in fields.pop('attachments'):
+        if isinstance(content, dict):
+            content = base64.b64decode(content['base64'])
+        attachments.append((filename, content, mimetype))
+    return EmailMultiAlternatives(
+        attachments=attachments,
+        alternatives=[tuple(item) for item in fields.pop('alternatives')],
+        **fields)
+
+
+def enqueue_messages(messages, dedup_keys=None):
+    """Записывает письма в outbox; возвращает, сколько записано.
+
+    Повторы ``dedup_keys`` пропускаются и в счёт не идут.
+    """
+    messages = list(messages)
+    if dedup_keys is None:
+        dedup_keys = [None] * len(messages)
+    rows = [
+        OutgoingEmail(
+            subject=message.subject[:255],
+            recipients=', '.join(message.recipients()),
+            message=dump_message(message),
+            dedup_key=dedup_key)
+        for message, dedup_key in zip(messages, dedup_keys)]
+    created = insert_ignoring_conflicts(
+        OutgoingEmail, rows, batch_size=BATCH_SIZE)
+    if created:
+        transaction.on_commit(schedule_delivery)
+    return created
+
+
+def schedule_delivery():
+    from .tasks import deliver_outbox
+
+    deliver_outbox.enqueue(dedup_key='outbox')
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        return enqueue_messages(email_messages)
+
+
+def requeue_stale():
+    deadline = timezone.now() - timedelta(
+        seconds=settings.EMAIL_OUTBOX_LOCK_TIMEOUT)
+    return OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING, locked_at__lt=deadline,
+    ).update(status=OutgoingEmail.PENDING, locked_by='')
+
+
+def claim_batch(limit):
+    """Забирает до ``limit`` писем, которые пора отправить."""
+    token = uuid.uuid4().hex
+    due = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.PENDING, send_after__lte=timezone.now(),
+    ).order_by('pk').values_list('pk', flat=True)[:limit]
+    OutgoingEmail.objects.filter(
+        pk__in=list(due), status=OutgoingEmail.PENDING,
+    ).update(
+        status=OutgoingEmail.SENDING, locked_by=token,
+        locked_at=timezone.now())
+    return list(OutgoingEmail.objects.filter(
+        locked_by=token, status=OutgoingEmail.SENDING))
+
+
+def send_rows(rows):
+    """Отправляет письма одним соединением; возвращает ошибки по pk.
+
+    Выполняется в пуле потоков и к базе не обращается.
+    """
+    errors = {}
+    with get_connection(settings.EMAIL_OUTBOX_BACKEND) as connection:
+        for row in rows:
+            try:
+                connection.send_messages([load_message(row.message)])
+            except Exception as error:
+                errors[row.pk] = repr(error)
+    return errors
+
+
+def record(rows, errors):
+    sent = [row.pk for row in rows if row.pk not in errors]
+    OutgoingEmail.objects.filter(pk__in=sent).update(
+        status=OutgoingEmail.SENT, sent=timezone.now(),
+        attempts=F('attempts') + 1, locked_by='')
+    for row in rows:
+        if row.pk not in errors:
+            continue
+        attempts = row.attempts + 1
+        logger.warning('Письмо %s не отправлено: %s', row.pk, errors[row.pk])
+        if attempts < settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            changes = {
+                'status': OutgoingEmail.PENDING,
+                'send_after': timezone.now() + timedelta(
+                    seconds=retry_delay(attempts))}
+        else:
+            changes = {'status': OutgoingEmail.FAILED}
+        OutgoingEmail.objects.filter(pk=row.pk).update(
+            attempts=attempts, last_error=errors[row.pk], locked_by='',
+            **changes)
+    return len(sent)
+
+
+def deliver(batch_size=None, concurrency=None):
+    """Отправляет всё, что пора; возвращает (отправлено, ошибок)."""
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    concurrency = concurrency or settings.EMAIL_OUTBOX_CONCURRENCY
+    requeue_stale()
+    sent = failed = 0
+    with ThreadPoolExecutor(concurrency, thread_name_prefix='mail') as pool:
+        while True:
+            rows = claim_batch(batch_size)
+            if not rows:
+                return sent, failed
+            chunks = [rows[start::concurrency] for start in range(
+                min(concurrency, len(rows)))]
+            errors = {}
+            for chunk_errors in pool.map(send_rows, chunks):
+                errors.update(chunk_errors)
+            sent += record(rows, errors)
+            failed += len(errors)
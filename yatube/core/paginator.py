@@ -0,0 +1,274 @@
+"""Пагинация больших лент без точного ``COUNT(*)``.
+
+``WindowedPaginator`` берёт число строк из «счётчика» — статистики
+таблицы или счётчика, который поддерживается сигналами. Если оценки
+нет или она меньше ``PAGINATOR_EXACT_COUNT_LIMIT``, считается точно.
+С оценкой хвост ленты может немного не совпасть с реальным, поэтому
+на последней по оценке странице и дальше пагинатор всё же считает
+точно: туда заходят редко.
+
+Номера страниц выводятся окном (``elided_page_range``), как в
+``Paginator.get_elided_page_range`` из Django 3.2.
+
+``KeysetPaginator`` листает по курсору — значениям ключей сортировки
+последней строки страницы — и вовсе не считает строки: каждая
+страница стоит одного запроса по индексу, как бы далеко ни листали.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils.functional import cached_property
+
+ELLIPSIS = '…'
+
+
+def elided_page_range(number, num_pages, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг ``number`` и по краям, пропуски — ``ELLIPSIS``.
+
+    По умолчанию — окно сайта (``includes/paginator.html``).
+    """
+    if num_pages <= (on_each_side + on_ends) * 2:
+        yield from range(1, num_pages + 1)
+        return
+    if number > (1 + on_each_side + on_ends) + 1:
+        yield from range(1, on_ends + 1)
+        yield ELLIPSIS
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if number < (num_pages - on_each_side - on_ends) - 1:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield ELLIPSIS
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(number + 1, num_pages + 1)
+
+
+class TableRowEstimate:
+    """Число строк таблицы по статистике СУБД.
+
+    В SQLite статистика появляется только после ``ANALYZE``.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def get(self):
+        using = router.db_for_read(self.model)
+        connection = connections[using]
+        table = self.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            sql = 'SELECT reltuples FROM pg_class WHERE oid = %s::regclass'
+        elif connection.vendor == 'mysql':
+            sql = ('SELECT table_rows FROM information_schema.tables '
+                   'WHERE table_schema = DATABASE() AND table_name = %s')
+        elif connection.vendor == 'sqlite':
+            sql = ('SELECT stat FROM sqlite_stat1 '
+                   'WHERE tbl = %s ORDER BY idx IS NOT NULL LIMIT 1')
+        else:
+            return None
+        try:
+            with transaction.atomic(using=using):
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, [table])
+                    row = cursor.fetchone()
+        except DatabaseError:
+            # Таблицы статистики может не быть (SQLite без ANALYZE).
+            return None
+        if row is None or row[0] is None:
+            return None
+        # В sqlite_stat1 первое число — оценка числа строк.
+        estimate = int(float(str(row[0]).split()[0]))
+        return estimate if estimate >= 0 else None
+
+    def set(self, count):
+        pass
+
+
+class MaintainedCount:
+    """Счётчик строк модели с заданным значением поля, хранится в кеше.
+
+    Точный подсчёт кладёт значение в кеш, дальше его двигают сигналы
+    создания и удаления. Перенос строки в другую группу сбрасывает
+    счётчик новой группы; счётчик старой выправится через
+    ``PAGINATOR_COUNTER_TIMEOUT``.
+    """
+
+    def __init__(self, model, field=None):
+        self.model = model
+        self.field = field
+        self.prefix = f'rowcount:{model._meta.label_lower}:{field or "all"}'
+        uid = 'maintained_count:' + self.prefix
+        post_save.connect(
+            self.saved, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(
+            self.deleted, sender=model, weak=False, dispatch_uid=uid)
+
+    def key(self, value=None):
+        return f'{self.prefix}:{value}'
+
+    def of(self, value=None):
+        return BoundCount(self, self.key(value))
+
+    def value_of(self, instance):
+        if self.field is None:
+            return None
+        return getattr(instance, self.model._meta.get_field(
+            self.field).attname)
+
+    def saved(self, sender, instance, created, **kwargs):
+        key = self.key(self.value_of(instance))
+        if created:
+            transaction.on_commit(lambda: self._add(key, 1))
+        else:
+            cache.delete(key)
+
+    def deleted(self, sender, instance, **kwargs):
+        key = self.key(self.value_of(instance))
+        transaction.on_commit(lambda: self._add(key, -1))
+
+    def _add(self, key, delta):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Счётчик ещё не заведён: его посчитает первый пагинатор.
+            pass
+
+
+class BoundCount:
+    def __init__(self, counter, key):
+        self.counter = counter
+        self.key = key
+
+    def get(self):
+        return cache.get(self.key)
+
+    def set(self, count):
+        cache.set(self.key, count, settings.PAGINATOR_COUNTER_TIMEOUT)
+
+
+class WindowedPaginator(Paginator):
+    """``Paginator``, которому хватает оценки числа строк."""
+
+    def __init__(self, object_list, per_page, counter=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.counter = counter
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        estimate = self.counter.get() if self.counter else None
+        if (
+            estimate is not None
+            and estimate >= settings.PAGINATOR_EXACT_COUNT_LIMIT
+        ):
+            self.approximate = True
+            return estimate
+        return self.exact_count()
+
+    def exact_count(self):
+        self.approximate = False
+        count = super().count
+        if self.counter:
+            self.counter.set(count)
+        return count
+
+    def validate_number(self, number):
+        if self.count and self.approximate:
+            try:
+                tail = int(number) * self.per_page >= self.count
+            except (TypeError, ValueError):
+                tail = False
+            if tail:
+                # Хвост по оценке может не совпадать с настоящим.
+                self.use_exact_count()
+        return super().validate_number(number)
+
+    def use_exact_count(self):
+        for name in ('num_pages', 'page_range'):
+            self.__dict__.pop(name, None)
+        self.__dict__['count'] = self.exact_count()
+
+    def get_elided_page_range(self, number=1):
+        return elided_page_range(self.validate_number(number), self.num_pages)
+
+
+class KeysetPaginator(Paginator):
+    """Страницы ``queryset`` по курсору вместо ``OFFSET``.
+
+    ``ordering`` должен однозначно упорядочивать строки, поэтому
+    последним ключом обычно идёт ``pk``. Назад можно вернуться только
+    к первой странице. ``get_page`` возвращает обычный ``Page`` с
+    атрибутами ``cursor`` и ``next_cursor``: страниц для него ровно
+    столько, чтобы работали ``has_next`` и ``has_previous``.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-pk',)):
+        super().__init__(queryset.order_by(*ordering), per_page)
+        self.queryset = self.object_list
+        self.keys = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def field(self, name):
+        meta = self.queryset.model._meta
+        return meta.pk if name == 'pk' else meta.get_field(name)
+
+    def encode(self, obj):
+        values = [getattr(obj, name) for name, _ in self.keys]
+        # Не DjangoJSONEncoder: он обрезает время до миллисекунд, и
+        # курсор перестал бы совпадать со строкой.
+        data = json.dumps(
+            values, default=lambda value: value.isoformat()).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode(self, cursor):
+        """Значения ключей из курсора; ``None``, если курсор испорчен."""
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(data)
+            if len(values) != len(self.keys):
+                return None
+            return [
+                self.field(name).to_python(value)
+                for (name, _), value in zip(self.keys, values)]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            return None
+
+    def after(self, values):
+        """Условие «строка идёт после строки со значениями ``values``»."""
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def get_page(self, cursor=None):
+        values = self.decode(cursor) if cursor else None
+        queryset = self.queryset
+        if values is None:
+            cursor = None
+        else:
+            queryset = queryset.filter(self.after(values))
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode(rows[-1])
+        # Первая страница — 1, любая дальше — 2; ещё одна, если есть
+        # продолжение. Ни номера, ни count курсору не нужны.
+        number = 1 if cursor is None else 2
+        self.__dict__['num_pages'] = number + (next_cursor is not None)
+        page = self._get_page(rows, number, self)
+        page.cursor = cursor
+        page.next_cursor = next_cursor
+        return page
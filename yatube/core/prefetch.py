@@ -0,0 +1,148 @@
+"""Упреждающий рендер следующей страницы ленты.
+
+Отдав страницу N, view просит отрисовать страницу N+1 в фоне, как её
+запросил бы анонимный читатель: так заполняются кеш фрагментов и снимки
+страниц, и переход по «Следующая» попадает в кеш. Бюджет ограничен:
+не больше ``PREFETCH_WORKERS`` потоков и ``PREFETCH_MAX_PENDING`` задач
+в очереди, одна страница — не чаще раза в ``PREFETCH_DEDUP_TIMEOUT``
+секунд на все процессы, а пока контроль допуска отклоняет запросы,
+упреждение не запускается вовсе. ``PREFETCH_WORKERS = 0`` его
+отключает.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.db import connection
+from django.test import RequestFactory
+
+from .admission import admission_controller
+
+logger = logging.getLogger(__name__)
+
+# Метка своих упреждающих запросов. Ключ без префикса HTTP_: заголовки
+# клиента попадают в environ только с ним, так что подделать её нельзя.
+PREFETCH_ENVIRON = 'yatube.prefetch'
+
+
+class LocalClient:
+    """GET-запросы через весь стек middleware внутри процесса."""
+
+    def __init__(self, host=None):
+        self.handler = BaseHandler()
+        self.handler.load_middleware()
+        self.factory = RequestFactory()
+        self.host = host or settings.ALLOWED_HOSTS[0]
+
+    def get(self, path, **extra):
+        request = self.factory.get(path, HTTP_HOST=self.host, **extra)
+        return self.handler.get_response(request)
+
+
+class Prefetcher:
+    """Пул фоновых задач, который отказывается от работы сверх бюджета."""
+
+    def __init__(self, workers, max_pending):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            workers, thread_name_prefix='prefetch')
+
+    def submit(self, func, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                return False
+            self.pending += 1
+        self.executor.submit(self._run, func, args)
+        return True
+
+    def _run(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Упреждающий рендер не удался')
+        finally:
+            with self.lock:
+                self.pending -= 1
+            connection.close()
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def prefetch_enabled():
+    # Базу SQLite в памяти (как в тестах) нельзя читать из другого потока
+    # посреди чужой транзакции.
+    in_memory = (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db())
+    return settings.PREFETCH_WORKERS > 0 and not in_memory
+
+
+def prefetcher():
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher(
+                settings.PREFETCH_WORKERS, settings.PREFETCH_MAX_PENDING)
+        return _prefetcher
+
+
+def reset_prefetcher():
+    global _prefetcher
+    with _prefetcher_lock:
+        _prefetcher = None
+
+
+def is_prefetch_request(request):
+    """Запрос сделан упреждающе: нами или браузером по rel=prefetch."""
+    purpose = request.META.get(
+        'HTTP_SEC_PURPOSE', request.META.get('HTTP_PURPOSE', ''))
+    return request.META.get(PREFETCH_ENVIRON) or 'prefetch' in purpose
+
+
+def hints_key(path):
+    return 'prefetch-hints:' + hashlib.md5(path.encode()).hexdigest()
+
+
+def save_hints(request, urls):
+    """Запоминает ресурсы страницы, которые стоит подгрузить заранее."""
+    cache.set(
+        hints_key(request.get_full_path()), list(urls),
+        settings.PREFETCH_HINTS_TIMEOUT)
+
+
+def load_hints(path):
+    return cache.get(hints_key(path), [])
+
+
+def schedule_prefetch(request, path):
+    """Ставит рендер ``path`` в фон, если это укладывается в бюджет."""
+    if not prefetch_enabled() or is_prefetch_request(request):
+        # Упреждённый запрос сам не упреждает, иначе рендер покатился бы
+        # по ленте до конца.
+        return False
+    if admission_controller().shed_classes():
+        return False
+    key = 'prefetch:' + hashlib.md5(path.encode()).hexdigest()
+    if not cache.add(key, 1, settings.PREFETCH_DEDUP_TIMEOUT):
+        return False
+    if not prefetcher().submit(render_page, request.get_host(), path):
+        cache.delete(key)
+        return False
+    return True
+
+
+@lru_cache(maxsize=16)
+def local_client(host):
+    return LocalClient(host)
+
+
+def render_page(host, path):
+    local_client(host).get(path, **{PREFETCH_ENVIRON: True})
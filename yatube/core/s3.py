@@ -0,0 +1,181 @@
+"""Минимальный клиент S3-совместимого хранилища (AWS, MinIO, Ceph).
+
+Подписывает запросы AWS Signature V4 и работает через ``requests``,
+чтобы не тащить в проект boto3 ради нескольких операций.
+"""
+import datetime
+import hashlib
+import hmac
+from urllib.parse import quote, urlencode, urlsplit
+from xml.etree import ElementTree
+
+import requests
+
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+S3_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+
+class S3Error(Exception):
+    def __init__(self, response):
+        self.status_code = response.status_code
+        super().__init__(
+            f'S3 вернул {response.status_code}: {response.text[:200]}')
+
+
+def _hmac(key, message):
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def _quote(value, safe='-_.~'):
+    return quote(value, safe=safe)
+
+
+class S3Client:
+    def __init__(self, endpoint_url, bucket, access_key, secret_key,
+                 region='us-east-1', timeout=30):
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.timeout = timeout
+        self.host = urlsplit(self.endpoint_url).netloc
+        self.session = requests.Session()
+
+    def object_path(self, key):
+        return '/' + _quote(f'{self.bucket}/{key}', safe='-_.~/')
+
+    def object_url(self, key):
+        return self.endpoint_url + self.object_path(key)
+
+    def signing_key(self, date_stamp):
+        key = _hmac(('AWS4' + self.secret_key).encode(), date_stamp)
+        key = _hmac(key, self.region)
+        key = _hmac(key, 's3')
+        return _hmac(key, 'aws4_request')
+
+    def signature(self, method, path, query, headers, payload_hash, now):
+        """Подпись SigV4 для запроса с уже собранными заголовками."""
+        signed_headers = ';'.join(sorted(headers))
+        canonical_headers = ''.join(
+            f'{name}:{headers[name].strip()}\n' for name in sorted(headers))
+        canonical_query = '&'.join(
+            f'{_quote(name)}={_quote(str(value))}'
+            for name, value in sorted(query.items()))
+        canonical_request = '\n'.join((
+            method, path, canonical_query, canonical_headers,
+            signed_headers, payload_hash))
+        date_stamp = now.strftime('%Y%m%d')
+        string_to_sign = '\n'.join((
+            'AWS4-HMAC-SHA256',
+            now.strftime('%Y%m%dT%H%M%SZ'),
+            self.scope(date_stamp),
+            hashlib.sha256(canonical_request.encode()).hexdigest()))
+        return hmac.new(
+            self.signing_key(date_stamp), string_to_sign.encode(),
+            hashlib.sha256).hexdigest()
+
+    def scope(self, date_stamp):
+        return f'{date_stamp}/{self.region}/s3/aws4_request'
+
+    def request(self, method, key, query=None, data=b'', headers=None):
+        query = query or {}
+        now = datetime.datetime.utcnow()
+        path = self.object_path(key)
+        signed = {name.lower(): value for name, value in (
+            headers or {}).items()}
+        signed.update({
+            'host': self.host,
+            'x-amz-content-sha256': UNSIGNED_PAYLOAD,
+            'x-amz-date': now.strftime('%Y%m%dT%H%M%SZ'),
+        })
+        signed_headers = ';'.join(sorted(signed))
+        signature = self.signature(
+            method, path, query, signed, UNSIGNED_PAYLOAD, now)
+        signed['authorization'] = (
+            f'AWS4-HMAC-SHA256 Credential={self.access_key}/'
+            f'{self.scope(now.strftime("%Y%m%d"))}, '
+            f'SignedHeaders={signed_headers}, Signature={signature}')
+        del signed['host']
+        url = self.endpoint_url + path
+        if query:
+            url += '?' + urlencode(sorted(query.items()), quote_via=quote)
+        response = self.session.request(
+            method, url, data=data, headers=signed, timeout=self.timeout)
+        if response.status_code >= 300 and not (
+                method == 'HEAD' and response.status_code == 404):
+            raise S3Error(response)
+        return response
+
+    def presigned_url(self, method, key, expires=3600, headers=None):
+        """URL, по которому клиент сам выполнит запрос без наших ключей.
+
+        Заголовки из ``headers`` входят в подпись, и клиент обязан
+        прислать их без изменений.
+        """
+        now = datetime.datetime.utcnow()
+        path = self.object_path(key)
+        signed = {name.lower(): value for name, value in (
+            headers or {}).items()}
+        signed['host'] = self.host
+        query = {
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential':
+                f'{self.access_key}/{self.scope(now.strftime("%Y%m%d"))}',
+            'X-Amz-Date': now.strftime('%Y%m%dT%H%M%SZ'),
+            'X-Amz-Expires': str(expires),
+            'X-Amz-SignedHeaders': ';'.join(sorted(signed)),
+        }
+        query['X-Amz-Signature'] = self.signature(
+            method, path, query, signed, UNSIGNED_PAYLOAD, now)
+        return (self.endpoint_url + path + '?'
+                + urlencode(sorted(query.items()), quote_via=quote))
+
+    def put_object(self, key, data, content_type=None):
+        headers = {'Content-Type': content_type} if content_type else None
+        return self.request('PUT', key, data=data, headers=headers)
+
+    def get_object(self, key):
+        return self.request('GET', key).content
+
+    def head_object(self, key):
+        """Заголовки объекта или None, если его нет."""
+        response = self.request('HEAD', key)
+        if response.status_code == 404:
+            return None
+        return response.headers
+
+    def delete_object(self, key):
+        self.request('DELETE', key)
+
+    def create_multipart_upload(self, key, content_type=None):
+        headers = {'Content-Type': content_type} if content_type else None
+        response = self.request(
+            'POST', key, query={'uploads': ''}, headers=headers)
+        return self._xml_text(response.content, 'UploadId')
+
+    def upload_part(self, key, upload_id, part_number, data):
+        response = self.request(
+            'PUT', key, data=data,
+            query={'partNumber': part_number, 'uploadId': upload_id})
+        return response.headers['ETag']
+
+    def complete_multipart_upload(self, key, upload_id, etags):
+        parts = ''.join(
+            f'<Part><PartNumber>{number}</PartNumber>'
+            f'<ETag>{etag}</ETag></Part>'
+            for number, etag in sorted(etags.items()))
+        body = (f'<CompleteMultipartUpload>{parts}'
+                '</CompleteMultipartUpload>').encode()
+        self.request('POST', key, query={'uploadId': upload_id}, data=body)
+
+    def abort_multipart_upload(self, key, upload_id):
+        self.request('DELETE', key, query={'uploadId': upload_id})
+
+    @staticmethod
+    def _xml_text(content, tag):
+        root = ElementTree.fromstring(content)
+        element = root.find(S3_NAMESPACE + tag)
+        if element is None:
+            element = root.find(tag)
+        return element.text
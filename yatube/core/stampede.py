@@ -0,0 +1,106 @@
+"""Защита кеша от «набега» при истечении популярной записи.
+
+Вместе со значением хранится момент его устаревания и время, которое
+ушло на вычисление. Дальше работают три механизма:
+
+* вероятностное досрочное обновление (XFetch): чем ближе срок и чем
+  дороже вычисление, тем вероятнее, что очередной запрос обновит
+  запись заранее, пока остальные ещё получают свежее значение;
+* single-flight: пересчитывает только тот, кто взял блокировку
+  (``cache.add``); блокировка сама снимается через ``lock_timeout``;
+* stale-while-revalidate: запись живёт в кеше ещё ``stale`` секунд
+  после срока, и пока один процесс её пересчитывает, остальные
+  отдают устаревшее значение вместо того, чтобы считать его заново.
+"""
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+
+
+class CacheLock:
+    def __init__(self, cache, key, timeout):
+        self.cache = cache
+        self.key = key + ':lock'
+        self.timeout = timeout
+        self.token = uuid.uuid4().hex
+
+    def acquire(self):
+        return self.cache.add(self.key, self.token, self.timeout)
+
+    def locked(self):
+        return self.cache.get(self.key) is not None
+
+    def release(self):
+        # Не снимаем чужую блокировку, если наша уже истекла.
+        if self.cache.get(self.key) == self.token:
+            self.cache.delete(self.key)
+
+
+def should_refresh(entry, beta, now=None):
+    """Решение XFetch: пора ли пересчитать запись досрочно."""
+    _, expires, delta = entry
+    now = time.time() if now is None else now
+    return now - delta * beta * math.log(1.0 - random.random()) >= expires
+
+
+def get_or_compute(key, compute, timeout, stale=None, lock_timeout=None,
+                   beta=None, cache=None):
+    """Значение из кеша или результат ``compute()`` без набега.
+
+    ``timeout`` — сколько секунд значение считается свежим (None —
+    бессрочно), ``stale`` — сколько ещё его можно отдавать, пока идёт
+    пересчёт.
+    """
+    cache = cache or default_cache
+    if stale is None:
+        stale = settings.STAMPEDE_STALE_TIMEOUT
+    if lock_timeout is None:
+        lock_timeout = settings.STAMPEDE_LOCK_TIMEOUT
+    if beta is None:
+        beta = settings.STAMPEDE_BETA
+    entry = cache.get(key)
+    if not isinstance(entry, tuple) or len(entry) != 3:
+        entry = None
+    if entry is not None and not should_refresh(entry, beta):
+        return entry[0]
+    lock = CacheLock(cache, key, lock_timeout)
+    if lock.acquire():
+        try:
+            return _compute_and_store(cache, key, compute, timeout, stale)
+        finally:
+            lock.release()
+    if entry is not None:
+        return entry[0]
+    entry = _wait_for_entry(cache, key, lock, lock_timeout)
+    if entry is not None:
+        return entry[0]
+    # Владелец блокировки не успел: считаем сами, чем ждать дальше.
+    return _compute_and_store(cache, key, compute, timeout, stale)
+
+
+def _compute_and_store(cache, key, compute, timeout, stale):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    if timeout is None:
+        cache.set(key, (value, math.inf, delta), None)
+    else:
+        cache.set(
+            key, (value, time.time() + timeout, delta), timeout + stale)
+    return value
+
+
+def _wait_for_entry(cache, key, lock, lock_timeout):
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(settings.STAMPEDE_POLL_INTERVAL)
+        entry = cache.get(key)
+        if isinstance(entry, tuple) and len(entry) == 3:
+            return entry
+        if not lock.locked():
+            return None
+    return None
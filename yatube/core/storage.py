@@ -0,0 +1,149 @@
+import mimetypes
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+from .compression import available_encodings
+from .s3 import S3Client
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.svg', '.txt', '.html', '.json', '.xml', '.map', '.ico',
+)
+# Маленькие файлы сжимать бессмысленно: заголовки съедят весь выигрыш.
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хранилище статики с хешем содержимого в имени и сжатыми копиями.
+
+    На этапе collectstatic каждый файл получает отпечаток в имени
+    (``css/main.3f2a9c1b7e4d.css``), а рядом с текстовыми файлами
+    кладутся ``.br`` и ``.gz`` варианты, которые отдаёт
+    ``core.middleware.PrecompressedStaticMiddleware``.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            self.write_compressed(name)
+
+    def write_compressed(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for _, suffix, compress in available_encodings():
+            compressed = compress(data)
+            if len(compressed) >= len(data):
+                continue
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+
+
+@deconstructible
+class S3Storage(Storage):
+    """Хранилище файлов в S3-совместимом объектном хранилище.
+
+    Крупные файлы (больше ``S3_MULTIPART_THRESHOLD``) загружаются
+    multipart-запросами, части уходят параллельно в
+    ``S3_MULTIPART_WORKERS`` потоков. Для загрузки прямо из браузера
+    есть ``presigned_upload``.
+    """
+
+    def __init__(self, endpoint_url=None, bucket=None, public_url=None):
+        self.endpoint_url = endpoint_url or settings.S3_ENDPOINT_URL
+        self.bucket = bucket or settings.S3_BUCKET
+        self.public_url = public_url or settings.S3_PUBLIC_URL
+
+    @cached_property
+    def client(self):
+        return S3Client(
+            self.endpoint_url, self.bucket,
+            settings.S3_ACCESS_KEY, settings.S3_SECRET_KEY,
+            region=settings.S3_REGION)
+
+    def _open(self, name, mode='rb'):
+        return ContentFile(self.client.get_object(name), name=name)
+
+    def _save(self, name, content):
+        content_type = (
+            getattr(content, 'content_type', None)
+            or mimetypes.guess_type(name)[0])
+        content.seek(0)
+        if content.size > settings.S3_MULTIPART_THRESHOLD:
+            self._save_multipart(name, content, content_type)
+        else:
+            self.client.put_object(name, content.read(), content_type)
+        return name
+
+    def _save_multipart(self, name, content, content_type):
+        upload_id = self.client.create_multipart_upload(name, content_type)
+        workers = settings.S3_MULTIPART_WORKERS
+        etags = {}
+        pending = {}
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                chunks = content.chunks(settings.S3_MULTIPART_CHUNK_SIZE)
+                for number, chunk in enumerate(chunks, start=1):
+                    # Держим в памяти не больше workers частей сразу.
+                    if len(pending) >= workers:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            etags[pending.pop(future)] = future.result()
+                    future = executor.submit(
+                        self.client.upload_part, name, upload_id, number,
+                        chunk)
+                    pending[future] = number
+                for future, number in pending.items():
+                    etags[number] = future.result()
+            self.client.complete_multipart_upload(name, upload_id, etags)
+        except Exception:
+            self.client.abort_multipart_upload(name, upload_id)
+            raise
+
+    def presigned_upload(self, name, checksum=None, expires=None):
+        """Подписанный PUT-запрос для загрузки файла из браузера.
+
+        ``checksum`` — sha256 содержимого в base64: хранилище отклонит
+        файл с другим содержимым. ``Content-Type`` по расширению тоже
+        входит в подпись, и объект нельзя отдать под чужим типом.
+        """
+        headers = {
+            'Content-Type':
+                mimetypes.guess_type(name)[0] or 'application/octet-stream',
+        }
+        if checksum:
+            headers['x-amz-checksum-sha256'] = checksum
+        url = self.client.presigned_url(
+            'PUT', name, expires or settings.S3_PRESIGNED_EXPIRES, headers)
+        return {'url': url, 'method': 'PUT', 'headers': headers}
+
+    def delete(self, name):
+        self.client.delete_object(name)
+
+    def exists(self, name):
+        return self.client.head_object(name) is not None
+
+    def size(self, name):
+        return int(self.client.head_object(name)['Content-Length'])
+
+    def url(self, name):
+        if self.public_url:
+            return self.public_url.rstrip('/') + '/' + name
+        return self.client.presigned_url(
+            'GET', name, settings.S3_PRESIGNED_EXPIRES)
+
+    def get_available_name(self, name, max_length=None):
+        return name
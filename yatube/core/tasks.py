@@ -0,0 +1,11 @@
+from django.conf import settings
+
+from .jobs import schedule_periodic, task
+from .outbox import deliver
+
+
+@task(queue='mail', priority=2, max_attempts=1)
+def deliver_outbox():
+    """Отправляет письма из outbox и ставит следующую проверку."""
+    schedule_periodic(deliver_outbox, settings.EMAIL_OUTBOX_INTERVAL)
+    return deliver()
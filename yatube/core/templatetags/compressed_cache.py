@@ -0,0 +1,106 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode
+
+from core.compression import CompressedFragment
+from core.stampede import get_or_compute
+
+register = template.Library()
+
+
+def remember_fragment(context, fragment):
+    """Сообщает сжимающему middleware о готовом сжатом фрагменте."""
+    request = context.get('request')
+    if request is None:
+        return
+    if not hasattr(request, 'compressed_fragments'):
+        request.compressed_fragments = []
+    request.compressed_fragments.append(fragment)
+
+
+class CompressedCacheNode(CacheNode):
+    def __init__(self, nodelist, expire_time_var, fragment_name, vary_on,
+                 cache_name, stale_var=None):
+        super().__init__(
+            nodelist, expire_time_var, fragment_name, vary_on, cache_name)
+        self.stale_var = stale_var
+
+    def get_cache(self, context):
+        if self.cache_name:
+            try:
+                return caches[self.cache_name.resolve(context)]
+            except (template.VariableDoesNotExist,
+                    InvalidCacheBackendError):
+                raise template.TemplateSyntaxError(
+                    'Invalid cache name specified for compressed_cache tag')
+        try:
+            return caches['template_fragments']
+        except InvalidCacheBackendError:
+            return caches['default']
+
+    def get_expire_time(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                '"compressed_cache" tag got an unknown variable: %r'
+                % self.expire_time_var.var)
+        if expire_time is None:
+            return None
+        try:
+            return int(expire_time)
+        except (ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                '"compressed_cache" tag got a non-integer timeout value: %r'
+                % expire_time)
+
+    def render(self, context):
+        expire_time = self.get_expire_time(context)
+        fragment_cache = self.get_cache(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        cache_key = make_template_fragment_key(self.fragment_name, vary_on)
+        stale = self.stale_var.resolve(context) if self.stale_var else None
+        fragment = get_or_compute(
+            cache_key,
+            lambda: CompressedFragment(self.nodelist.render(context).encode()),
+            expire_time,
+            stale=None if stale is None else int(stale),
+            cache=fragment_cache)
+        remember_fragment(context, fragment)
+        return fragment.raw.decode()
+
+
+@register.tag('compressed_cache')
+def do_compressed_cache(parser, token):
+    """Замена ``{% cache %}``: хранит рядом с HTML его gzip-представление
+    и защищает фрагмент от набега при истечении (см. ``core.stampede``).
+
+    Использование::
+
+        {% load compressed_cache %}
+        {% compressed_cache 20 index_page page_obj stale=60 %}
+            ...
+        {% endcompressed_cache %}
+
+    ``stale`` — сколько секунд после истечения можно отдавать старую
+    версию, пока один процесс её пересчитывает; по умолчанию
+    ``STAMPEDE_STALE_TIMEOUT``. Ключ в кеше тот же, что у ``{% cache %}``
+    с такими аргументами, поэтому сброс через
+    ``make_template_fragment_key`` продолжает работать.
+    """
+    nodelist = parser.parse(('endcompressed_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            "'%r' tag requires at least 2 arguments." % tokens[0])
+    options = {}
+    while len(tokens) > 3 and tokens[-1].startswith(('using=', 'stale=')):
+        name, _, value = tokens.pop().partition('=')
+        options[name] = parser.compile_filter(value)
+    return CompressedCacheNode(
+        nodelist, parser.compile_filter(tokens[1]), tokens[2],
+        [parser.compile_filter(t) for t in tokens[3:]],
+        options.get('using'), options.get('stale'),
+    )
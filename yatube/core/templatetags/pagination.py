@@ -0,0 +1,16 @@
+from django import template
+
+from core.paginator import ELLIPSIS, elided_page_range
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page_obj):
+    """Первая, последняя и две соседние страницы вокруг текущей."""
+    return elided_page_range(page_obj.number, page_obj.paginator.num_pages)
+
+
+@register.filter
+def is_ellipsis(value):
+    return value == ELLIPSIS
@@ -0,0 +1,18 @@
+from django import template
+from django.utils.html import format_html_join
+
+from core.prefetch import load_hints
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def next_page_hints(context, page_obj):
+    """``<link rel="prefetch">`` на следующую страницу и её миниатюры."""
+    if not page_obj.has_next():
+        return ''
+    url = f"{context['request'].path}?page={page_obj.next_page_number()}"
+    links = [(url, 'document')]
+    links += [(src, 'image') for src in load_hints(url)]
+    return format_html_join(
+        '\n', '<link rel="prefetch" href="{}" as="{}">', links)
@@ -0,0 +1,11 @@
+from django.test.runner import DiscoverRunner
+
+from .counters import discard_all
+
+
+class TestRunner(DiscoverRunner):
+    def teardown_databases(self, old_config, **kwargs):
+        # Приращения относятся к тестовой базе и не должны попасть
+        # в основную при выходе.
+        discard_all()
+        super().teardown_databases(old_config, **kwargs)
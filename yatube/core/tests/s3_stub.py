@@ -0,0 +1,166 @@
+"""Локальная замена S3 для тестов: хранит объекты в памяти процесса.
+
+Проверяет подписи SigV4 (и обычные, и presigned), срок действия ссылок
+и ``x-amz-checksum-sha256``, поддерживает multipart-загрузку.
+"""
+import base64
+import datetime
+import hashlib
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.etree import ElementTree
+
+from core.s3 import S3Client
+
+
+class S3StubServer:
+    def __init__(self, access_key='stub-access', secret_key='stub-secret',
+                 region='us-east-1'):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.objects = {}
+        self.uploads = {}
+        self.requests = []
+        self.server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), self.handler_class())
+        self.url = 'http://127.0.0.1:%d' % self.server.server_port
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def settings(self, bucket='yatube'):
+        return {
+            'S3_ENDPOINT_URL': self.url,
+            'S3_BUCKET': bucket,
+            'S3_ACCESS_KEY': self.access_key,
+            'S3_SECRET_KEY': self.secret_key,
+            'S3_REGION': self.region,
+            'S3_PUBLIC_URL': '',
+        }
+
+    def signer(self, bucket):
+        return S3Client(
+            self.url, bucket, self.access_key, self.secret_key, self.region)
+
+    def handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.handle(self, 'GET')
+
+            def do_HEAD(self):
+                stub.handle(self, 'HEAD')
+
+            def do_PUT(self):
+                stub.handle(self, 'PUT')
+
+            def do_POST(self):
+                stub.handle(self, 'POST')
+
+            def do_DELETE(self):
+                stub.handle(self, 'DELETE')
+
+        return Handler
+
+    def handle(self, handler, method):
+        parts = urlsplit(handler.path)
+        bucket, _, key = unquote(parts.path).lstrip('/').partition('/')
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        self.requests.append((method, key, query))
+        if not self.authorized(handler, method, parts.path, bucket, query):
+            return self.respond(handler, 403, b'SignatureDoesNotMatch')
+        checksum = handler.headers.get('x-amz-checksum-sha256')
+        if checksum and checksum != base64.b64encode(
+                hashlib.sha256(body).digest()).decode():
+            return self.respond(handler, 400, b'BadDigest')
+        name = (bucket, key)
+        if method == 'PUT' and 'uploadId' in query:
+            upload = self.uploads[query['uploadId']]
+            upload[int(query['partNumber'])] = body
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            return self.respond(handler, 200, headers={'ETag': etag})
+        if method == 'PUT':
+            self.objects[name] = body
+            return self.respond(handler, 200)
+        if method == 'POST' and 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {}
+            return self.respond(handler, 200, (
+                '<InitiateMultipartUploadResult xmlns='
+                '"http://s3.amazonaws.com/doc/2006-03-01/">'
+                f'<UploadId>{upload_id}</UploadId>'
+                '</InitiateMultipartUploadResult>').encode())
+        if method == 'POST' and 'uploadId' in query:
+            upload = self.uploads.pop(query['uploadId'])
+            numbers = [
+                int(part.find('PartNumber').text)
+                for part in ElementTree.fromstring(body)]
+            self.objects[name] = b''.join(upload[n] for n in numbers)
+            return self.respond(handler, 200, b'<CompleteMultipartUpload/>')
+        if method == 'DELETE' and 'uploadId' in query:
+            self.uploads.pop(query['uploadId'], None)
+            return self.respond(handler, 204)
+        if method == 'DELETE':
+            self.objects.pop(name, None)
+            return self.respond(handler, 204)
+        if name not in self.objects:
+            return self.respond(handler, 404)
+        data = self.objects[name]
+        self.respond(handler, 200, data if method == 'GET' else b'', {
+            'Content-Length': str(len(data))})
+
+    def authorized(self, handler, method, path, bucket, query):
+        headers = {
+            name.lower(): value for name, value in handler.headers.items()}
+        if 'X-Amz-Signature' in query:
+            query = dict(query)
+            signature = query.pop('X-Amz-Signature')
+            now = datetime.datetime.strptime(
+                query['X-Amz-Date'], '%Y%m%dT%H%M%SZ')
+            expires = now + datetime.timedelta(
+                seconds=int(query['X-Amz-Expires']))
+            if expires < datetime.datetime.utcnow():
+                return False
+            signed_names = query['X-Amz-SignedHeaders'].split(';')
+        else:
+            authorization = headers.get('authorization', '')
+            if not authorization.startswith('AWS4-HMAC-SHA256 '):
+                return False
+            fields = dict(
+                item.strip().split('=', 1)
+                for item in authorization[len('AWS4-HMAC-SHA256 '):]
+                .split(','))
+            signature = fields['Signature']
+            signed_names = fields['SignedHeaders'].split(';')
+            now = datetime.datetime.strptime(
+                headers['x-amz-date'], '%Y%m%dT%H%M%SZ')
+        signed = {name: headers.get(name, '') for name in signed_names}
+        expected = self.signer(bucket).signature(
+            method, path, query, signed, 'UNSIGNED-PAYLOAD', now)
+        return expected == signature
+
+    def respond(self, handler, status, body=b'', headers=None):
+        handler.send_response(status)
+        headers = dict(headers or {})
+        headers.setdefault('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        if body:
+            handler.wfile.write(body)
@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts.caches import followees
+from posts.models import Follow, User
+
+
+class AdjacencyIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)]
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+        Follow.objects.create(user=cls.reader, author=cls.authors[2])
+
+    def setUp(self):
+        cache.clear()
+        followees.local.clear()
+
+    def test_batch_check_without_queries(self):
+        author_ids = [author.pk for author in self.authors]
+        followees.targets(self.reader.pk)
+        followees.local.clear()
+        # Вторая проверка берёт упакованный массив из общего кеша.
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                followees.which(self.reader.pk, author_ids),
+                {self.authors[0].pk, self.authors[2].pk})
+            self.assertFalse(
+                followees.contains(self.reader.pk, self.authors[1].pk))
+
+    def test_follow_and_unfollow_invalidate(self):
+        self.assertFalse(
+            followees.contains(self.reader.pk, self.authors[1].pk))
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        self.assertTrue(
+            followees.contains(self.reader.pk, self.authors[1].pk))
+        Follow.objects.filter(
+            user=self.reader, author=self.authors[0]).delete()
+        self.assertFalse(
+            followees.contains(self.reader.pk, self.authors[0].pk))
+
+    def test_anonymous_follows_nobody(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(followees.targets(None), frozenset())
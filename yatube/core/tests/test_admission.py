@@ -0,0 +1,109 @@
+import time
+from unittest import mock
+
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..admission import (MAX_QUEUE_LATENCY, admission_controller,
+                         queue_latency, reset_admission_controller)
+
+LIMITS = {
+    'cached_read': {'max_in_flight': 10, 'priority': 0},
+    'default': {'max_in_flight': 10, 'priority': 1},
+    'write': {'max_in_flight': 10, 'priority': 1},
+    'expensive': {'max_in_flight': 1, 'priority': 2},
+    'upload': {'max_in_flight': 1, 'priority': 2},
+}
+
+
+@override_settings(ADMISSION_LIMITS=LIMITS, ADMISSION_TARGET_LATENCY=0.5)
+class AdmissionControlTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        reset_admission_controller()
+        self.addCleanup(reset_admission_controller)
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_class_over_limit_is_shed(self):
+        controller = admission_controller()
+        self.assertTrue(controller.admit('expensive'))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        controller.release('expensive', 0.0)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_high_latency_sheds_only_that_class(self):
+        started = 't=%d' % ((time.time() - 3) * 1000)
+        for _ in range(30):
+            self.guest_client.get(
+                reverse('posts:index'), HTTP_X_REQUEST_START=started)
+            self.authorized_client.get(
+                reverse('posts:index'), HTTP_X_REQUEST_START=started)
+        controller = admission_controller()
+        self.assertGreater(controller.stats['default'].latency, 1.0)
+        self.assertEqual(controller.shed_classes(), ['default'])
+        cheap = self.guest_client.get(reverse('posts:index'))
+        expensive = self.authorized_client.get(reverse('posts:follow_index'))
+        default = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(cheap.status_code, 200)
+        self.assertEqual(expensive.status_code, 200)
+        self.assertEqual(default.status_code, 503)
+
+    def test_service_time_is_not_queue_latency(self):
+        controller = admission_controller()
+        with mock.patch.object(
+                controller, 'release', wraps=controller.release) as release:
+            self.authorized_client.get(reverse('posts:index'))
+        release.assert_called_once_with('default', None)
+
+    def test_long_poll_bypasses_controller(self):
+        post = Post.objects.create(author=self.user, text='Пост')
+        self.authorized_client.get(
+            reverse('posts:comment_list', args=(post.pk,)))
+        stats = admission_controller().snapshot()['classes']
+        self.assertEqual(
+            sum(item['admitted'] for item in stats.values()), 0)
+
+    def test_counters_exposed_to_staff(self):
+        self.guest_client.get(reverse('posts:index'))
+        url = reverse('core:admission_stats')
+        self.assertEqual(self.guest_client.get(url).status_code, 302)
+        admin_client = Client()
+        admin_client.force_login(self.admin)
+        stats = admin_client.get(url).json()
+        self.assertEqual(stats['classes']['cached_read']['admitted'], 1)
+        self.assertIn('shed', stats['classes']['expensive'])
+
+
+class QueueLatencyTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def latency(self, seconds_ago, **extra):
+        arrived = time.time()
+        request = self.factory.get(
+            '/', HTTP_X_REQUEST_START='t=%d' % (
+                (arrived - seconds_ago) * 1000), **extra)
+        return queue_latency(request, arrived)
+
+    def test_header_from_trusted_proxy(self):
+        self.assertAlmostEqual(self.latency(3), 3, delta=0.01)
+
+    def test_header_from_untrusted_address_ignored(self):
+        self.assertIsNone(self.latency(3, REMOTE_ADDR='203.0.113.5'))
+
+    def test_latency_is_capped(self):
+        self.assertEqual(self.latency(3600), MAX_QUEUE_LATENCY)
+        self.assertEqual(self.latency(-3600), 0.0)
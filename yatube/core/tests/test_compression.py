@@ -0,0 +1,75 @@
+import gzip
+
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..compression import (CompressedFragment, accepted_encodings,
+                           compress_with_fragments)
+from ..middleware import FragmentGZipMiddleware
+
+
+class GzipStreamTests(TestCase):
+    def test_fragment_is_spliced_into_valid_gzip(self):
+        fragment = CompressedFragment(b'<article>' + b'post ' * 500)
+        content = b'<header>' * 50 + fragment.raw + b'<footer>' * 2000
+        compressed = b''.join(compress_with_fragments(
+            content, [fragment], chunk_size=1024))
+        self.assertIn(fragment.deflated, compressed)
+        self.assertEqual(gzip.decompress(compressed), content)
+
+
+class AcceptEncodingTests(TestCase):
+    def test_wildcard_skips_refused_encodings(self):
+        self.assertEqual(
+            accepted_encodings('br;q=0, *', ('br', 'gzip')), {'*', 'gzip'})
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, *;q=0', ('br', 'gzip')),
+            {'gzip'})
+
+
+class FragmentGZipMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text='Тестовый пост %d' % i)
+            for i in range(10))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_index_is_compressed_on_miss_and_hit(self):
+        plain = self.client.get(reverse('posts:index')).content
+        for attempt in ('miss', 'hit'):
+            with self.subTest(attempt=attempt):
+                if attempt == 'miss':
+                    cache.clear()
+                response = self.client.get(
+                    reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(gzip.decompress(response.content), plain)
+
+    def test_not_compressed_without_accept_encoding(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_streams_and_events_not_compressed(self):
+        body = b'data: {}\n\n' * 100
+        responses = {
+            'stream': StreamingHttpResponse(
+                iter([body]), content_type='text/plain'),
+            'events': HttpResponse(body, content_type='text/event-stream'),
+        }
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        for name, response in responses.items():
+            with self.subTest(response=name):
+                middleware = FragmentGZipMiddleware(lambda request: response)
+                self.assertFalse(
+                    middleware(request).has_header('Content-Encoding'))
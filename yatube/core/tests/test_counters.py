@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.caches import post_cache, post_views
+from posts.models import Post, User
+
+from ..counters import BufferedCounter
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=3600, COUNTER_FLUSH_THRESHOLD=100)
+class BufferedCounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.first = Post.objects.create(author=cls.user, text='Первый')
+        cls.second = Post.objects.create(author=cls.user, text='Второй')
+
+    def setUp(self):
+        cache.clear()
+        post_cache.local.clear()
+        post_views.discard()
+
+    def views(self, post):
+        return Post.objects.values_list('views', flat=True).get(pk=post.pk)
+
+    def test_increments_are_combined_in_memory(self):
+        counter = BufferedCounter(Post, 'views')
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                counter.increment(self.first.pk)
+            counter.increment(self.second.pk, 2)
+        self.assertEqual(counter.pending(self.first.pk), 5)
+        self.assertEqual(counter.flush(), 2)
+        self.assertEqual(self.views(self.first), 5)
+        self.assertEqual(self.views(self.second), 2)
+        self.assertEqual(counter.pending(self.first.pk), 0)
+
+    @override_settings(COUNTER_FLUSH_THRESHOLD=3)
+    def test_threshold_bounds_buffered_views(self):
+        counter = BufferedCounter(Post, 'views')
+        counter.increment(self.first.pk)
+        counter.increment(self.first.pk)
+        self.assertEqual(self.views(self.first), 0)
+        counter.increment(self.first.pk)
+        self.assertEqual(self.views(self.first), 3)
+
+    def test_failed_flush_keeps_deltas(self):
+        counter = BufferedCounter(Post, 'views')
+        counter.increment(self.first.pk, 4)
+        with mock.patch.object(
+                counter, 'write', side_effect=OperationalError('locked')):
+            with self.assertLogs('core.counters', 'ERROR'):
+                counter.flush()
+        self.assertEqual(counter.pending(self.first.pk), 4)
+        counter.flush()
+        self.assertEqual(self.views(self.first), 4)
+
+    def test_post_detail_shows_buffered_views(self):
+        url = reverse('posts:post_detail', args=(self.first.pk,))
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.context['views'], 2)
+
+    def test_flush_invalidates_cached_post(self):
+        url = reverse('posts:post_detail', args=(self.first.pk,))
+        self.client.get(url)
+        post_views.flush()
+        response = self.client.get(url)
+        self.assertEqual(response.context['views'], 2)
+
+    def test_post_edit_keeps_views(self):
+        client = Client()
+        client.force_login(self.user)
+        post_cache.get(pk=self.first.pk)
+        Post.objects.filter(pk=self.first.pk).update(views=7)
+        client.post(
+            reverse('posts:post_edit', args=(self.first.pk,)),
+            {'text': 'Исправленный'})
+        self.assertEqual(self.views(self.first), 7)
+        self.assertEqual(
+            Post.objects.get(pk=self.first.pk).text, 'Исправленный')
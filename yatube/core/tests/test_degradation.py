@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..degradation import (database_breaker, reset_database_breaker,
+                           snapshot_key)
+
+
+def broken_database(execute, sql, params, many, context):
+    raise OperationalError('database is locked')
+
+
+@override_settings(
+    DEGRADATION_FAILURE_THRESHOLD=2, DEGRADATION_OPEN_TIMEOUT=60)
+class DegradationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        reset_database_breaker()
+        self.addCleanup(reset_database_breaker)
+        self.guest_client = Client()
+        self.url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def test_last_good_page_served_when_database_fails(self):
+        fresh = self.guest_client.get(self.url)
+        with connection.execute_wrapper(broken_database):
+            response = self.guest_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Served-Stale'], '1')
+        self.assertIn('Показана сохранённая версия', response.content.decode())
+        self.assertIn(self.post.text, fresh.content.decode())
+        self.assertIn(self.post.text, response.content.decode())
+
+    def test_snapshot_key_ignores_unlisted_params(self):
+        factory = RequestFactory()
+        key = snapshot_key(factory.get('/?page=2'))
+        self.assertEqual(
+            snapshot_key(factory.get('/?utm_source=x&page=2&q=1')), key)
+        self.assertNotEqual(snapshot_key(factory.get('/?page=3')), key)
+        self.assertNotEqual(snapshot_key(factory.get('/group/?page=2')), key)
+
+    def test_open_breaker_skips_database_and_recovers(self):
+        self.guest_client.get(self.url)
+        breaker = database_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.OPEN)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.url)
+        self.assertEqual(response['X-Served-Stale'], '1')
+        other = self.guest_client.get(reverse('posts:index') + '?page=5')
+        self.assertEqual(other.status_code, 503)
+        self.assertIn('Retry-After', other)
+        breaker.opened_at -= 60
+        probe = self.guest_client.get(self.url)
+        self.assertFalse(probe.has_header('X-Served-Stale'))
+        self.assertEqual(breaker.state, breaker.CLOSED)
+
+    def test_failed_probe_reopens_breaker(self):
+        breaker = database_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.opened_at -= 60
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.OPEN)
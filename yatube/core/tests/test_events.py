@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..events import (CacheBroadcast, Event, Hub, broadcast, hub,
+                      reset_events, sse_response)
+
+
+class HubTests(SimpleTestCase):
+    def test_waits_for_own_channels(self):
+        events = Hub(backlog=10)
+        events.deliver(Event(1, frozenset({'a'}), 1))
+        events.deliver(Event(2, frozenset({'b', 'c'}), 2))
+        events.deliver(Event(3, frozenset({'a'}), 3))
+        self.assertEqual(
+            [event.data for event in events.wait(0, {'c', 'a'}, 0)],
+            [1, 2, 3])
+        self.assertEqual(
+            [event.data for event in events.wait(1, {'a'}, 0)], [3])
+        self.assertEqual(events.wait(3, {'a'}, 0.01), [])
+
+    def test_cache_broadcast_delivers_in_order(self):
+        cache.clear()
+        events = Hub(backlog=10)
+        sender, receiver = CacheBroadcast(Hub(10)), CacheBroadcast(events)
+        receiver.poll()
+        sender.send(['a'], 'first')
+        sender.send(['a'], 'second')
+        cache.delete(receiver.key(1))
+        receiver.poll()
+        # Первое событие ещё «пишется»: ждём следующего опроса.
+        self.assertEqual(events.last_id, 0)
+        receiver.poll()
+        self.assertEqual(
+            [event.data for event in events.since(0, {'a'})], ['second'])
+
+
+@override_settings(
+    EVENTS_BROADCAST='core.events.LocalBroadcast',
+    EVENTS_HEARTBEAT=0.01, EVENTS_STREAM_TIMEOUT=0.05)
+class StreamTests(SimpleTestCase):
+    def setUp(self):
+        reset_events()
+        self.addCleanup(reset_events)
+
+    def request(self, last_id=None):
+        headers = {} if last_id is None else {'HTTP_LAST_EVENT_ID': last_id}
+        return RequestFactory().get('/events/', **headers)
+
+    def test_streams_summaries_after_last_event_id(self):
+        broadcast().send(['a'], 1)
+        broadcast().send(['b'], 2)
+        broadcast().send(['a'], 3)
+        response = sse_response(
+            self.request('1'), ['a'], 'news',
+            lambda events: [event.data for event in events])
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        response.close()
+        self.assertIn('id: 3\nevent: news\ndata: [3]\n\n', body)
+        self.assertIn(': ping', body)
+        self.assertEqual(hub().connections, 0)
+
+    @override_settings(EVENTS_MAX_CONNECTIONS=1)
+    def test_connection_limit(self):
+        first = sse_response(self.request(), ['a'], 'news', len)
+        self.assertEqual(
+            sse_response(self.request(), ['a'], 'news', len).status_code,
+            503)
+        first.close()
+        self.assertEqual(
+            sse_response(self.request(), ['a'], 'news', len).status_code,
+            200)
@@ -0,0 +1,110 @@
+from concurrent.futures import Executor, Future
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..jobs import Worker, execute, requeue_stale, task
+from ..models import Job
+
+calls = []
+
+
+class InlineExecutor(Executor):
+    # Потоки не видели бы данных из транзакции теста.
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def execute_in_test(pk):
+    return execute(Job.objects.get(pk=pk))
+
+
+class InlineWorker(Worker):
+    def entry_point(self):
+        return execute_in_test
+
+    def make_executor(self):
+        return InlineExecutor()
+
+
+@task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('Сломалось')
+
+
+class EnqueueTests(TestCase):
+    def test_dedup_key_reuses_active_job(self):
+        first = record.enqueue(args=('a',), dedup_key='record:a')
+        second = record.enqueue(args=('b',), dedup_key='record:a')
+        self.assertEqual(first.pk, second.pk)
+        Job.objects.filter(pk=first.pk).update(status=Job.DONE)
+        third = record.enqueue(args=('c',), dedup_key='record:a')
+        self.assertNotEqual(third.pk, first.pk)
+
+    def test_stale_running_jobs_requeued(self):
+        job = record.delay('a')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+    def test_stale_job_fails_after_max_attempts(self):
+        job = record.delay('a')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, attempts=job.max_attempts,
+            locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('Обработчик пропал', job.last_error)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        calls.clear()
+        job = record.delay('сразу')
+        self.assertEqual(calls, ['сразу'])
+        self.assertEqual(job.status, Job.DONE)
+
+
+class WorkerTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_by_priority_and_skips_scheduled(self):
+        record.enqueue(args=('поздно',), delay=60)
+        record.enqueue(args=('обычно',))
+        record.enqueue(args=('срочно',), priority=0)
+        worker = InlineWorker(concurrency=1, poll_interval=0.01)
+        metrics = worker.run(burst=True)
+        self.assertEqual(calls, ['срочно', 'обычно'])
+        self.assertEqual(metrics['tests.record']['done'], 2)
+        self.assertEqual(
+            Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    @override_settings(JOBS_RETRY_BACKOFF=30)
+    def test_failed_job_retried_with_backoff(self):
+        job = explode.delay()
+        worker = InlineWorker(concurrency=2, poll_interval=0.01)
+        with self.assertLogs('core.jobs', 'WARNING'):
+            worker.run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=10))
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'WARNING'):
+            metrics = worker.run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('Сломалось', job.last_error)
+        self.assertEqual(metrics['tests.explode']['failed'], 2)
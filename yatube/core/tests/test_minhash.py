@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+
+from ..minhash import MinHashIndex, fingerprint, shingles, similarity
+
+TEXT = ('Только сегодня скидка 90 процентов на все товары нашего магазина, '
+        'переходите по ссылке и забирайте подарок')
+
+
+class MinHashTests(SimpleTestCase):
+    def test_similarity_estimates_jaccard(self):
+        copy = TEXT.replace('90', '75').replace('подарок', 'приз')
+        first, second = shingles(TEXT), shingles(copy)
+        jaccard = len(first & second) / len(first | second)
+        estimate = similarity(
+            fingerprint(TEXT).sketch, fingerprint(copy).sketch)
+        self.assertAlmostEqual(estimate, jaccard, delta=0.15)
+        other = fingerprint('Сегодня гулял в парке, видел белку и уток')
+        self.assertLess(similarity(fingerprint(TEXT).sketch, other.sketch),
+                        0.2)
+
+    def test_normalization_and_short_texts(self):
+        self.assertEqual(
+            fingerprint(TEXT), fingerprint(TEXT.upper().replace('90', '15')))
+        self.assertIsNone(fingerprint('Спасибо!', min_shingles=20))
+
+    def test_index_finds_near_duplicates(self):
+        index = MinHashIndex()
+        index.extend(fingerprint(text) for text in (
+            'Сегодня гулял в парке, видел белку и уток',
+            TEXT,
+            'Пишу про Django: как устроены сигналы моделей'))
+        copy = index.add(fingerprint(TEXT + '!!!'))
+        position, score = index.nearest(fingerprint(TEXT), 0.7)
+        self.assertIn(position, (1, copy))
+        self.assertGreater(score, 0.9)
+        self.assertIsNone(index.nearest(
+            fingerprint('Совсем другой текст про погоду и дождь'), 0.7))
@@ -0,0 +1,92 @@
+import json
+
+from django.core import mail
+from django.core.mail import (EmailMessage, EmailMultiAlternatives,
+                              send_mail)
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from ..models import OutgoingEmail
+from ..outbox import deliver, enqueue_messages
+
+OUTBOX = 'core.outbox.OutboxEmailBackend'
+LOCMEM = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+class BrokenBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP недоступен')
+
+
+@override_settings(EMAIL_BACKEND=OUTBOX, EMAIL_OUTBOX_BACKEND=LOCMEM)
+class OutboxTests(TestCase):
+    def test_mail_is_stored_and_sent_later(self):
+        send_mail('Тема', 'Текст', 'site@example.com', ['reader@example.com'])
+        self.assertEqual(mail.outbox, [])
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertEqual(deliver(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.SENT)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(deliver(), (0, 0))
+
+    def test_rolled_back_mail_is_not_sent(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                send_mail('Тема', 'Текст', None, ['reader@example.com'])
+                raise RuntimeError
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_dedup_key_skips_repeat(self):
+        created = [
+            enqueue_messages(
+                [EmailMessage('Тема', 'Текст', to=['reader@example.com'])],
+                ['digest:1'])
+            for _ in range(2)]
+        self.assertEqual(created, [1, 0])
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_message_stored_as_json(self):
+        message = EmailMultiAlternatives(
+            'Тема', 'Текст', 'site@example.com', ['reader@example.com'],
+            reply_to=['help@example.com'])
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.attach('data.bin', b'\x00\xff', 'application/octet-stream')
+        enqueue_messages([message])
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(json.loads(email.message)['subject'], 'Тема')
+        deliver()
+        sent, = mail.outbox
+        self.assertEqual(sent.from_email, 'site@example.com')
+        self.assertEqual(sent.reply_to, ['help@example.com'])
+        self.assertEqual(sent.alternatives, [('<p>Текст</p>', 'text/html')])
+        self.assertEqual(sent.attachments, [
+            ('data.bin', b'\x00\xff', 'application/octet-stream')])
+
+    def test_many_messages_sent_concurrently(self):
+        enqueue_messages([
+            EmailMessage('Тема', 'Текст', to=[f'reader{number}@example.com'])
+            for number in range(10)])
+        self.assertEqual(deliver(batch_size=4, concurrency=3), (10, 0))
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted(f'reader{number}@example.com' for number in range(10)))
+
+    @override_settings(
+        EMAIL_OUTBOX_BACKEND='core.tests.test_outbox.BrokenBackend',
+        EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_mail_is_retried_then_given_up(self):
+        enqueue_messages([EmailMessage('Тема', 'Текст', to=['r@example.com'])])
+        self.assertEqual(deliver(), (0, 1))
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertIn('SMTP недоступен', email.last_error)
+        OutgoingEmail.objects.update(send_after=email.created)
+        self.assertEqual(deliver(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+        self.assertEqual(email.attempts, 2)
@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts.caches import group_post_counts
+from posts.models import Group, Post, User
+
+from ..paginator import (ELLIPSIS, KeysetPaginator, TableRowEstimate,
+                         WindowedPaginator, elided_page_range)
+
+
+class FixedCounter:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, count):
+        self.value = count
+
+
+class ElidedPageRangeTests(TestCase):
+    def test_window_around_current_page(self):
+        self.assertEqual(
+            list(elided_page_range(1000, 50000, on_each_side=2, on_ends=1)),
+            [1, ELLIPSIS, 998, 999, 1000, 1001, 1002, ELLIPSIS, 50000])
+        self.assertEqual(
+            list(elided_page_range(2, 4, on_each_side=2, on_ends=1)),
+            [1, 2, 3, 4])
+
+    def test_template_renders_window_only(self):
+        user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=user, text=f'Пост {number}') for number in range(200))
+        response = self.client.get('/?page=10')
+        self.assertContains(response, '<span class="page-link">10</span>')
+        self.assertContains(response, '?page=12"')
+        self.assertNotContains(response, '?page=13"')
+        self.assertContains(response, ELLIPSIS, count=2)
+
+
+@override_settings(PAGINATOR_EXACT_COUNT_LIMIT=1000)
+class WindowedPaginatorTests(TestCase):
+    def test_small_estimate_counts_exactly(self):
+        counter = FixedCounter(999)
+        paginator = WindowedPaginator(list(range(25)), 10, counter=counter)
+        self.assertEqual(paginator.count, 25)
+        self.assertFalse(paginator.approximate)
+        self.assertEqual(counter.value, 25)
+
+    def test_large_estimate_used_until_tail(self):
+        counter = FixedCounter(100000)
+        paginator = WindowedPaginator(list(range(25)), 10, counter=counter)
+        self.assertEqual(paginator.get_page(2).number, 2)
+        self.assertEqual(paginator.num_pages, 10000)
+        self.assertTrue(paginator.approximate)
+        # Последняя по оценке страница уже считается точно.
+        page = paginator.get_page(10000)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(list(page), [20, 21, 22, 23, 24])
+        self.assertFalse(paginator.approximate)
+
+    def test_table_statistics_estimate(self):
+        user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=user, text=f'Пост {number}') for number in range(30))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(TableRowEstimate(Post).get(), 30)
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=user, text=f'Пост {number}') for number in range(25))
+        # Одинаковое время у части постов: порядок решает pk.
+        first_ten = Post.objects.order_by('pk')[:10].values('pk')
+        Post.objects.filter(pk__in=first_ten).update(
+            pub_date=Post.objects.order_by('pk').first().pub_date)
+
+    def test_walks_all_rows_once(self):
+        paginator = KeysetPaginator(
+            Post.objects.all(), 10, ordering=('-pub_date', '-pk'))
+        seen, cursor = [], None
+        for _ in range(3):
+            with self.assertNumQueries(1):
+                page = paginator.get_page(cursor)
+                seen.extend(post.pk for post in page)
+            cursor = page.next_cursor
+        self.assertIsNone(cursor)
+        self.assertEqual(seen, list(Post.objects.order_by(
+            '-pub_date', '-pk').values_list('pk', flat=True)))
+
+    def test_broken_cursor_starts_over(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        page = paginator.get_page('не-курсор')
+        self.assertFalse(page.has_previous())
+        self.assertEqual(
+            page.object_list[0], Post.objects.order_by('-pk').first())
+
+
+class MaintainedCountTests(TransactionTestCase):
+    def test_signals_move_seeded_counter(self):
+        cache.clear()
+        user = User.objects.create_user(username='auth')
+        group = Group.objects.create(
+            title='Тестовая группа', slug='group-slug', description='')
+        Post.objects.create(author=user, group=group, text='Первый')
+        counter = group_post_counts.of(group.pk)
+        self.assertIsNone(counter.get())
+        WindowedPaginator(group.posts.all(), 10, counter=counter).count
+        self.assertEqual(counter.get(), 1)
+        post = Post.objects.create(author=user, group=group, text='Второй')
+        self.assertEqual(counter.get(), 2)
+        post.delete()
+        self.assertEqual(counter.get(), 1)
@@ -0,0 +1,72 @@
+import base64
+import hashlib
+
+import requests
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+
+from ..s3 import S3Error
+from ..storage import S3Storage
+from .s3_stub import S3StubServer
+
+
+class S3StorageTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = S3StubServer().__enter__()
+        cls.settings_override = override_settings(
+            S3_MULTIPART_THRESHOLD=1024,
+            S3_MULTIPART_CHUNK_SIZE=256,
+            S3_MULTIPART_WORKERS=3,
+            **cls.stub.settings())
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.stub.__exit__(None, None, None)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.storage = S3Storage()
+
+    def test_save_open_delete(self):
+        name = self.storage.save('posts/a b.txt', ContentFile(b'hello'))
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.storage.size(name), 5)
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'hello')
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+
+    def test_large_file_uploaded_in_parallel_parts(self):
+        data = bytes(range(256)) * 10
+        name = self.storage.save('posts/big.bin', ContentFile(data))
+        self.assertEqual(self.stub.objects[('yatube', name)], data)
+        parts = [r for r in self.stub.requests if 'partNumber' in r[2]]
+        self.assertEqual(len(parts), 10)
+
+    def test_presigned_upload_checks_checksum(self):
+        data = b'direct upload'
+        checksum = base64.b64encode(hashlib.sha256(data).digest()).decode()
+        ticket = self.storage.presigned_upload('posts/d.gif', checksum)
+        bad = requests.put(
+            ticket['url'], data=b'other', headers=ticket['headers'])
+        self.assertEqual(bad.status_code, 400)
+        good = requests.put(
+            ticket['url'], data=data, headers=ticket['headers'])
+        self.assertEqual(good.status_code, 200)
+        self.assertEqual(self.stub.objects[('yatube', 'posts/d.gif')], data)
+
+    def test_presigned_upload_signs_content_type(self):
+        ticket = self.storage.presigned_upload('posts/e.gif')
+        self.assertEqual(ticket['headers']['Content-Type'], 'image/gif')
+        headers = dict(ticket['headers'], **{'Content-Type': 'text/html'})
+        bad = requests.put(ticket['url'], data=b'<html>', headers=headers)
+        self.assertEqual(bad.status_code, 403)
+
+    def test_wrong_secret_is_rejected(self):
+        with override_settings(S3_SECRET_KEY='wrong'):
+            with self.assertRaises(S3Error):
+                S3Storage().save('posts/x.txt', ContentFile(b'x'))
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from ..stampede import CacheLock, get_or_compute
+
+
+@override_settings(STAMPEDE_POLL_INTERVAL=0.01)
+class StampedeProtectionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def slow_compute(self, value='fresh', delay=0.2):
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def run_concurrently(self, function, count=10):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(function()))
+            for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_single_flight_on_miss(self):
+        results = self.run_concurrently(
+            lambda: get_or_compute('key', self.slow_compute(), 60, beta=0))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['fresh'] * 10)
+
+    def test_stale_value_served_while_refreshing(self):
+        cache.set('key', ('stale', time.time() - 1, 0.0), 60)
+        results = self.run_concurrently(
+            lambda: get_or_compute('key', self.slow_compute(), 60, beta=0))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results.count('fresh'), 1)
+        self.assertEqual(results.count('stale'), 9)
+
+    def test_early_refresh_before_expiry(self):
+        cache.set('key', ('old', time.time() + 5, 100.0), 60)
+        value = get_or_compute(
+            'key', self.slow_compute(delay=0), 60, beta=1000)
+        self.assertEqual(value, 'fresh')
+        value = get_or_compute('key', self.slow_compute(delay=0), 60, beta=0)
+        self.assertEqual((value, self.calls), ('fresh', 1))
+
+    def test_expired_lock_does_not_block_forever(self):
+        CacheLock(cache, 'key', 60).acquire()
+        value = get_or_compute(
+            'key', self.slow_compute(delay=0), 60, lock_timeout=0.05)
+        self.assertEqual(value, 'fresh')
+
+    def test_template_tag_renders_once_under_concurrency(self):
+        template = Template(
+            '{% load compressed_cache %}'
+            '{% compressed_cache 30 fragment stale=10 %}'
+            '{{ compute }}{% endcompressed_cache %}')
+
+        compute = self.slow_compute('rendered')
+
+        class Slow:
+            def __str__(self):
+                return compute()
+
+        results = self.run_concurrently(
+            lambda: template.render(Context({'compute': Slow()})), count=5)
+        self.assertEqual(results, ['rendered'] * 5)
+        self.assertEqual(self.calls, 1)
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+
+STATIC_SOURCE = tempfile.mkdtemp(dir=settings.BASE_DIR)
+STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CSS = 'body { color: red; }\n' * 100
+
+
+@override_settings(
+    STATICFILES_DIRS=[STATIC_SOURCE],
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE='core.storage.CompressedManifestStaticFilesStorage',
+)
+class PrecompressedStaticTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(STATIC_SOURCE, 'css'))
+        with open(os.path.join(STATIC_SOURCE, 'css', 'main.css'), 'w') as f:
+            f.write(CSS)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.hashed_name = staticfiles_storage.stored_name('css/main.css')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(STATIC_SOURCE, ignore_errors=True)
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_collectstatic_writes_fingerprinted_compressed_files(self):
+        self.assertNotEqual(self.hashed_name, 'css/main.css')
+        for suffix in ('', '.gz', '.br'):
+            with self.subTest(suffix=suffix):
+                self.assertTrue(os.path.isfile(
+                    os.path.join(STATIC_ROOT, self.hashed_name + suffix)))
+
+    def test_middleware_serves_variant_by_accept_encoding(self):
+        url = settings.STATIC_URL + self.hashed_name
+        encodings = {'gzip, br': 'br', 'gzip': 'gzip', '': None}
+        for accept, expected in encodings.items():
+            with self.subTest(accept=accept):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual(response.get('Content-Encoding'), expected)
+                self.assertIn('immutable', response['Cache-Control'])
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_unhashed_name_gets_short_cache_lifetime(self):
+        response = self.client.get(settings.STATIC_URL + 'css/main.css')
+        self.assertEqual(
+            response['Cache-Control'],
+            'public, max-age=%d' % settings.STATIC_MAX_AGE)
+        self.assertEqual(b''.join(response.streaming_content), CSS.encode())
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('admission/', views.admission_stats, name='admission_stats'),
+    path('jobs/', views.job_stats, name='job_stats'),
+]
@@ -1,5 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .admission import admission_controller
+from .jobs import queue_stats
+
 
 def page_not_found(request, exception):
 
@@ -16,3 +21,13 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def admission_stats(request):
+    return JsonResponse(admission_controller().snapshot())
+
+
+@staff_member_required
+def job_stats(request):
+    return JsonResponse(queue_stats())
@@ -1,12 +1,16 @@
 from django.contrib import admin
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.html import format_html
 
-from .models import Comment, Follow, Group, Post
+from .models import (Comment, DuplicateCluster, Fingerprint, Follow, Group,
+                     Post)
 
 
 class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     # Перечисляем поля, которые должны отображаться в админке
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'views')
     # Добавляем интерфейс для поиска по тексту постов
     search_fields = ('text',)
     # Добавляем возможность фильтрации по дате
@@ -42,9 +46,72 @@ class FollowAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class FingerprintAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'kind', 'object_id', 'author', 'excerpt', 'cluster',
+        'similarity', 'created')
+    list_filter = ('kind',)
+    search_fields = ('excerpt',)
+    exclude = ('sketch',)
+    readonly_fields = (
+        'kind', 'object_id', 'author', 'excerpt', 'cluster', 'similarity',
+        'created')
+    raw_id_fields = ('author', 'cluster')
+    empty_value_display = '-пусто-'
+
+    def has_add_permission(self, request):
+        return False
+
+
+class DuplicateClusterAdmin(admin.ModelAdmin):
+    # Кластер — первый текст и все похожие на него, крупные сверху.
+    list_display = ('excerpt', 'kind', 'author', 'size', 'members', 'created')
+    list_filter = ('kind',)
+    search_fields = ('excerpt',)
+    actions = ('delete_texts',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(cluster=None).annotate(
+            copies=Count('members')).filter(copies__gt=0).select_related(
+                'author').order_by('-copies')
+
+    def size(self, obj):
+        return obj.copies + 1
+    size.short_description = 'Текстов'
+    size.admin_order_field = 'copies'
+
+    def members(self, obj):
+        url = reverse('admin:posts_fingerprint_changelist')
+        return format_html(
+            '<a href="{}?cluster__id__exact={}">Копии</a>', url, obj.pk)
+    members.short_description = 'Копии'
+
+    def delete_texts(self, request, queryset):
+        """Удаляет посты и комментарии выбранных кластеров."""
+        fingerprints = Fingerprint.objects.filter(
+            pk__in=queryset.values('pk')) | Fingerprint.objects.filter(
+                cluster__in=queryset.values('pk'))
+        ids = {Fingerprint.POST: [], Fingerprint.COMMENT: []}
+        for kind, object_id in fingerprints.values_list(
+                'kind', 'object_id'):
+            ids[kind].append(object_id)
+        Post.objects.filter(pk__in=ids[Fingerprint.POST]).delete()
+        Comment.objects.filter(pk__in=ids[Fingerprint.COMMENT]).delete()
+        self.message_user(
+            request,
+            f'Удалено постов: {len(ids[Fingerprint.POST])}, '
+            f'комментариев: {len(ids[Fingerprint.COMMENT])}')
+    delete_texts.short_description = 'Удалить тексты кластеров'
+
+    def has_add_permission(self, request):
+        return False
+
+
 # При регистрации модели Post источником конфигурации для неё назначаем
 # класс PostAdmin
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Fingerprint, FingerprintAdmin)
+admin.site.register(DuplicateCluster, DuplicateClusterAdmin)
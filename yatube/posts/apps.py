@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        # Подключает к сигналам моделей сброс кеша объектов, пересчёт
+        # рекомендаций, оповещения о новых постах, разбор хештегов и
+        # отпечатки для поиска дублей.
+        from . import (caches, duplicates, hashtags, live,  # noqa: F401
+                       recommendations)
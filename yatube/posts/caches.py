@@ -0,0 +1,22 @@
+from core.adjacency import AdjacencyIndex
+from core.counters import BufferedCounter
+from core.object_cache import ObjectCache
+from core.paginator import MaintainedCount
+
+from .models import Follow, Group, GroupSubscription, Post, User
+
+post_cache = ObjectCache(Post)
+user_cache = ObjectCache(User, lookups=('username',))
+group_cache = ObjectCache(Group, lookups=('slug',))
+
+# Число постов в группах для пагинатора больших лент.
+group_post_counts = MaintainedCount(Post, 'group')
+
+# Просмотры постов копятся в памяти и пишутся в базу пачками;
+# записанные посты сбрасываются в кеше, чтобы не показать старое число.
+post_views = BufferedCounter(Post, 'views', on_flush=post_cache.invalidate_pks)
+
+# На кого подписан пользователь: проверка кнопок «Подписаться» без базы.
+followees = AdjacencyIndex(Follow, 'user', 'author')
+# На какие группы подписан пользователь.
+subscribed_groups = AdjacencyIndex(GroupSubscription, 'user', 'group')
@@ -0,0 +1,35 @@
+"""Комментарии поста порциями по id вместо всего списка."""
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from .models import Comment
+
+
+def latest_comments(post_id):
+    """Последние ``COMMENTS_ON_PAGE`` комментариев по порядку и есть ли
+    более ранние."""
+    comments = list(Comment.objects.filter(post_id=post_id).order_by(
+        '-pk')[:settings.COMMENTS_ON_PAGE + 1])
+    has_earlier = len(comments) > settings.COMMENTS_ON_PAGE
+    return comments[:settings.COMMENTS_ON_PAGE][::-1], has_earlier
+
+
+def comments_after(post_id, after):
+    return list(Comment.objects.filter(
+        post_id=post_id, pk__gt=after,
+    ).order_by('pk')[:settings.COMMENTS_BATCH])
+
+
+def comments_before(post_id, before):
+    comments = list(Comment.objects.filter(
+        post_id=post_id, pk__lt=before,
+    ).order_by('-pk')[:settings.COMMENTS_BATCH])
+    return comments[::-1]
+
+
+def render_comments(comments):
+    return [
+        {'id': comment.pk,
+         'html': render_to_string(
+             'posts/includes/comment.html', {'comment': comment})}
+        for comment in comments]
@@ -0,0 +1,104 @@
+"""Рассылки подписчикам: новые посты авторов за час или за день.
+
+Окно рассылки выровнено по границе периода из ``DIGEST_PERIODS``, так
+что повторный запуск за тот же период собирает те же письма, а ключ
+``digest:<период>:<конец окна>:<пользователь>`` в outbox не даёт
+отправить их дважды.
+
+Подписки читаются из базы потоком по ``DIGEST_CHUNK_SIZE`` строк,
+отсортированными по подписчику, и собираются в письмо, как только
+строки подписчика кончились — в памяти нет всего графа подписок.
+Текст письма зависит только от набора авторов, поэтому шаблоны
+рендерятся один раз на каждый набор, а не на каждого подписчика.
+Письма пишутся в outbox пачками, каждая в своей транзакции.
+"""
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.outbox import enqueue_messages
+
+from .models import Follow, Post
+
+RENDER_CACHE_SIZE = 1024
+
+
+def digest_window(period, now=None):
+    """Начало и конец последнего завершившегося периода."""
+    length = settings.DIGEST_PERIODS[period]
+    now = now or timezone.now()
+    end = int(now.timestamp() // length) * length
+    return (
+        datetime.fromtimestamp(end - length, tz=timezone.utc),
+        datetime.fromtimestamp(end, tz=timezone.utc))
+
+
+def subscriptions(posts, chunk_size):
+    """Подписчики авторов ``posts``: пары (получатель, авторы)."""
+    rows = Follow.objects.filter(
+        author_id__in=posts.values('author_id'), user__is_active=True,
+    ).exclude(user__email='').order_by('user_id').values_list(
+        'user_id', 'user__email', 'author_id').iterator(chunk_size=chunk_size)
+    for (user_id, email), group in groupby(rows, key=itemgetter(0, 1)):
+        yield (user_id, email), frozenset(row[2] for row in group)
+
+
+def build_renderer(posts_by_author, period):
+    @lru_cache(maxsize=RENDER_CACHE_SIZE)
+    def render(authors):
+        posts = sorted(
+            (post for author_id in authors
+             for post in posts_by_author.get(author_id, ())),
+            key=lambda post: (post.pub_date, post.pk), reverse=True)
+        context = {
+            'posts': posts[:settings.DIGEST_MAX_POSTS],
+            'more': max(len(posts) - settings.DIGEST_MAX_POSTS, 0),
+            'period': period,
+            'site_url': settings.SITE_URL,
+        }
+        return (
+            render_to_string('posts/email/digest_subject.txt', context)
+            .strip(),
+            render_to_string('posts/email/digest.txt', context),
+            render_to_string('posts/email/digest.html', context))
+    return render
+
+
+def write_batch(batch):
+    messages, keys = zip(*batch)
+    with transaction.atomic():
+        return enqueue_messages(messages, keys)
+
+
+def send_digests(period, now=None, chunk_size=None):
+    """Пишет в outbox рассылку за период; возвращает (писем, шаблонов)."""
+    chunk_size = chunk_size or settings.DIGEST_CHUNK_SIZE
+    start, end = digest_window(period, now)
+    posts = Post.objects.filter(pub_date__gte=start, pub_date__lt=end)
+    posts_by_author = {}
+    for post in posts.select_related('author', 'group').order_by():
+        posts_by_author.setdefault(post.author_id, []).append(post)
+    if not posts_by_author:
+        return 0, 0
+    render = build_renderer(posts_by_author, period)
+    written = 0
+    batch = []
+    for (user_id, email), authors in subscriptions(posts, chunk_size):
+        subject, text, html = render(authors)
+        message = EmailMultiAlternatives(subject, text, to=[email])
+        message.attach_alternative(html, 'text/html')
+        batch.append((
+            message, f'digest:{period}:{int(end.timestamp())}:{user_id}'))
+        if len(batch) >= chunk_size:
+            written += write_batch(batch)
+            batch = []
+    if batch:
+        written += write_batch(batch)
+    return written, render.cache_info().misses
@@ -0,0 +1,144 @@
+"""Почти одинаковые посты и комментарии (см. core.minhash).
+
+При каждом сохранении поста или комментария его отпечаток и ключи
+полос LSH пишутся в ``Fingerprint`` и ``FingerprintBand``. Кандидаты в
+дубли находятся одним запросом по индексу ключей, сходство с ними
+считается по подписям. Текст со сходством не ниже ``SPAM_SIMILARITY``
+попадает в кластер первого такого текста — кластеры видны в админке
+(«Кластеры дублей»).
+
+Форма ищет похожий текст один раз (``match_text``) и оставляет
+результат в ``instance.text_match``; ``index_text`` при сохранении берёт
+его, а не считает отпечаток и кандидатов заново.
+
+Формы постов и комментариев отклоняют текст, если в его кластере уже
+``SPAM_REJECT_CLUSTER_SIZE`` текстов: повтор-другой бывает и у людей,
+а сотни копий — это рассылка. ``None`` — только помечать. Тексты
+короче ``SPAM_MIN_SHINGLES`` шинглов («Спасибо!») не проверяются.
+"""
+import logging
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.minhash import fingerprint, similarity
+
+from .models import Comment, Fingerprint, FingerprintBand, Post
+
+logger = logging.getLogger(__name__)
+
+# Отпечаток текста и ближайший к нему сохранённый (см. ``nearest``).
+TextMatch = namedtuple('TextMatch', 'text fp match score')
+
+
+def text_fingerprint(text):
+    return fingerprint(text, settings.SPAM_MIN_SHINGLES)
+
+
+def nearest(fp, exclude=None):
+    """Самый похожий сохранённый текст не ниже ``SPAM_SIMILARITY``.
+
+    Возвращает (``Fingerprint``, сходство) или (``None``, 0).
+    """
+    candidates = Fingerprint.objects.filter(bands__key__in=fp.bands)
+    if exclude is not None:
+        candidates = candidates.exclude(exclude)
+    candidates = candidates.distinct().order_by('-pk').only(
+        'pk', 'sketch', 'cluster_id')[:settings.SPAM_MAX_CANDIDATES]
+    best = None
+    best_similarity = settings.SPAM_SIMILARITY
+    for candidate in candidates:
+        score = similarity(fp.sketch, bytes(candidate.sketch))
+        if score >= best_similarity:
+            best, best_similarity = candidate, score
+    if best is None:
+        return None, 0
+    return best, best_similarity
+
+
+def cluster_root(candidate):
+    return candidate.cluster_id or candidate.pk
+
+
+def cluster_size(root_id):
+    return 1 + Fingerprint.objects.filter(cluster_id=root_id).count()
+
+
+def match_text(text, kind=None, object_id=None):
+    """Отпечаток ``text`` и похожий на него текст, кроме самого объекта."""
+    fp = text_fingerprint(text)
+    if fp is None:
+        return TextMatch(text, None, None, 0)
+    exclude = None
+    if object_id is not None:
+        exclude = Q(kind=kind, object_id=object_id)
+    return TextMatch(text, fp, *nearest(fp, exclude))
+
+
+def is_spam_burst(found):
+    """Текст из ``match_text`` — очередная копия рассылки, пора отклонять."""
+    limit = settings.SPAM_REJECT_CLUSTER_SIZE
+    if not limit or found.match is None:
+        return False
+    return cluster_size(cluster_root(found.match)) >= limit
+
+
+def index_text(kind, object_id, author_id, text, found=None):
+    """Пишет отпечаток текста и относит его к кластеру дублей.
+
+    ``found`` — результат ``match_text`` из формы для того же текста.
+    """
+    with transaction.atomic():
+        existing = Fingerprint.objects.filter(
+            kind=kind, object_id=object_id).first()
+        if found is None or found.text != text:
+            found = match_text(
+                text, kind, None if existing is None else object_id)
+        fp, match, score = found.fp, found.match, found.score
+        if fp is None:
+            if existing is not None:
+                existing.delete()
+            return None
+        row = existing or Fingerprint(kind=kind, object_id=object_id)
+        row.author_id = author_id
+        row.excerpt = text[:200]
+        row.sketch = fp.sketch
+        row.cluster_id = None if match is None else cluster_root(match)
+        row.similarity = score or None
+        row.save()
+        if existing is not None:
+            FingerprintBand.objects.filter(fingerprint=row).delete()
+        FingerprintBand.objects.bulk_create([
+            FingerprintBand(fingerprint=row, key=key) for key in fp.bands])
+    if match is not None:
+        logger.info(
+            '%s %s похож на %s (%.2f)', kind, object_id, match.pk, score)
+    return row
+
+
+@receiver(post_save, sender=Post, dispatch_uid='duplicates_post')
+def post_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_text(
+            Fingerprint.POST, instance.pk, instance.author_id, instance.text,
+            instance.__dict__.pop('text_match', None))
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='duplicates_comment')
+def comment_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_text(
+            Fingerprint.COMMENT, instance.pk, instance.author_id,
+            instance.text, instance.__dict__.pop('text_match', None))
+
+
+@receiver(post_delete, sender=Post, dispatch_uid='duplicates_post_delete')
+@receiver(
+    post_delete, sender=Comment, dispatch_uid='duplicates_comment_delete')
+def text_deleted(sender, instance, **kwargs):
+    kind = Fingerprint.POST if sender is Post else Fingerprint.COMMENT
+    Fingerprint.objects.filter(kind=kind, object_id=instance.pk).delete()
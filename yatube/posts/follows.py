@@ -0,0 +1,66 @@
+"""Подписки на авторов и группы и лента по ним.
+
+Подписка — один ``INSERT`` на всех авторов с ``ignore_conflicts``:
+повтор отсекает ограничение ``posts_follow_unique``, а не проверка
+перед вставкой, поэтому два одновременных запроса не создадут дубль.
+Отписка — один ``DELETE ... WHERE author_id IN (...)``.
+
+Лента подписок — один запрос ``author_id IN (подписки) OR group_id IN
+(группы)``: пост, подходящий по обоим условиям, попадает в выборку
+один раз, а каждая ветка читается по индексу (источник, pub_date).
+"""
+from django.db.models import Q
+
+from core.bulk import insert_ignoring_conflicts
+
+from .caches import followees, subscribed_groups
+from .models import Follow, GroupSubscription, Post, User
+from .recommendations import schedule_refresh
+
+
+def resolve_authors(usernames):
+    """``{username: pk}`` для существующих пользователей."""
+    return dict(User.objects.filter(
+        username__in=set(usernames)).values_list('username', 'pk'))
+
+
+def follow_authors(user, author_ids):
+    """Подписывает ``user`` на авторов; возвращает число новых подписок."""
+    author_ids = set(author_ids) - {user.pk}
+    if not author_ids:
+        return 0
+    # Кеш подписок может отставать от базы, поэтому вставляются все
+    # авторы, а число новых подписок сообщает сам INSERT.
+    created = insert_ignoring_conflicts(
+        Follow, [Follow(user=user, author_id=author_id)
+                 for author_id in author_ids])
+    # Вставка в обход save() не шлёт post_save.
+    followees.forget(user.pk)
+    if created:
+        schedule_refresh(user.pk)
+    return created
+
+
+def unfollow_authors(user, author_ids):
+    """Отписывает ``user`` от авторов; возвращает число удалённых."""
+    deleted, _ = Follow.objects.filter(
+        user=user, author_id__in=set(author_ids)).delete()
+    return deleted
+
+
+def subscribe_group(user, group):
+    GroupSubscription.objects.bulk_create(
+        [GroupSubscription(user=user, group=group)], ignore_conflicts=True)
+    subscribed_groups.forget(user.pk)
+
+
+def unsubscribe_group(user, group):
+    GroupSubscription.objects.filter(user=user, group=group).delete()
+
+
+def subscription_feed(user):
+    """Посты авторов и групп, на которые подписан ``user``."""
+    authors = Follow.objects.filter(user=user).values('author_id')
+    groups = GroupSubscription.objects.filter(user=user).values('group_id')
+    return Post.objects.filter(
+        Q(author_id__in=authors) | Q(group_id__in=groups))
@@ -1,6 +1,11 @@
 from django import forms
+from django.conf import settings
 
-from .models import Comment, Post
+from .duplicates import is_spam_burst, match_text
+from .models import Comment, Fingerprint, Post
+from .storage import is_uploaded_image_key, supports_direct_upload
+
+SPAM_MESSAGE = 'Такой текст уже опубликован много раз'
 
 
 class PostForm(forms.ModelForm):
@@ -8,8 +13,62 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.direct_upload:
+            # Ключ уже загруженного в хранилище объекта вместо файла.
+            self.fields['image_key'] = forms.CharField(
+                required=False, widget=forms.HiddenInput)
+
+    @property
+    def image_storage(self):
+        return Post._meta.get_field('image').storage
+
+    @property
+    def direct_upload(self):
+        """Картинку можно загрузить из браузера прямо в хранилище."""
+        return supports_direct_upload(self.image_storage)
+
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        found = match_text(text, Fingerprint.POST, self.instance.pk)
+        if is_spam_burst(found):
+            raise forms.ValidationError(SPAM_MESSAGE)
+        # Отпечаток и кандидаты снова понадобятся при сохранении.
+        self.instance.text_match = found
+        return text
+
+    def clean_image_key(self):
+        key = self.cleaned_data['image_key']
+        if not key:
+            return key
+        storage = self.image_storage
+        if not is_uploaded_image_key(storage, key):
+            raise forms.ValidationError('Загруженная картинка не найдена')
+        # Размер узнаём по HEAD, прежде чем скачивать объект.
+        if storage.size(key) > settings.POST_IMAGE_MAX_SIZE:
+            raise forms.ValidationError('Картинка слишком большая')
+        # Содержимое проверяет Pillow, как у файла, пришедшего с формой.
+        with storage.open(key) as content:
+            forms.ImageField().clean(content)
+        return key
+
+    def save(self, commit=True):
+        if self.cleaned_data.get('image_key'):
+            self.instance.image = self.cleaned_data['image_key']
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        found = match_text(text, Fingerprint.COMMENT, self.instance.pk)
+        if is_spam_burst(found):
+            raise forms.ValidationError(SPAM_MESSAGE)
+        # Отпечаток и кандидаты снова понадобятся при сохранении.
+        self.instance.text_match = found
+        return text
@@ -0,0 +1,127 @@
+"""Хештеги и упоминания в постах и комментариях.
+
+Из текста при сохранении извлекаются ``#хештеги`` и ``@имена`` и
+пишутся в таблицы связей ``TagLink`` и ``Mention`` с копией времени
+публикации: лента хештега и список упоминаний пользователя читаются по
+индексу, без поиска по текстам. Новые посты и комментарии разбираются
+по ``post_save``; при правке поста ``post_edit`` передаёт старый текст,
+и меняются только связи с хештегами и именами, которых раньше не было
+или больше нет. Уже существующие тексты разбирает
+``manage.py backfill_tags``.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .markup import MENTION_PATTERN, TAG_PATTERN
+from .models import Comment, Mention, Post, Tag, TagLink, User
+
+BATCH_SIZE = 500
+
+
+def extract_tags(text):
+    return {name.lower() for name in TAG_PATTERN.findall(text)}
+
+
+def extract_mentions(text):
+    return set(MENTION_PATTERN.findall(text))
+
+
+def tag_ids(names):
+    """id хештегов по именам; недостающие создаются."""
+    if not names:
+        return {}
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names], batch_size=BATCH_SIZE,
+        ignore_conflicts=True)
+    return dict(
+        Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+
+
+def user_ids(usernames):
+    if not usernames:
+        return {}
+    return dict(User.objects.filter(
+        username__in=usernames).values_list('username', 'pk'))
+
+
+class Source:
+    """Текст, из которого берутся связи: пост или комментарий к нему."""
+
+    def __init__(self, post_id, comment_id, author_id, date, text):
+        self.post_id = post_id
+        self.comment_id = comment_id
+        self.author_id = author_id
+        self.date = date
+        self.tags = extract_tags(text)
+        self.mentions = extract_mentions(text)
+
+    @classmethod
+    def of_post(cls, post, text=None):
+        return cls(
+            post.pk, None, post.author_id, post.pub_date,
+            post.text if text is None else text)
+
+    @classmethod
+    def of_comment(cls, comment):
+        return cls(
+            comment.post_id, comment.pk, comment.author_id, comment.created,
+            comment.text)
+
+
+def add_links(sources):
+    """Пишет связи всех ``sources`` двумя запросами на разрешение имён.
+
+    Уже существующие связи пропускаются.
+    """
+    sources = list(sources)
+    tags = tag_ids(set().union(*(source.tags for source in sources)))
+    users = user_ids(set().union(*(source.mentions for source in sources)))
+    tag_links = []
+    mentions = []
+    for source in sources:
+        for name in source.tags:
+            tag_links.append(TagLink(
+                tag_id=tags[name], post_id=source.post_id,
+                comment_id=source.comment_id, pub_date=source.date))
+        for username in source.mentions:
+            user_id = users.get(username)
+            if user_id is not None and user_id != source.author_id:
+                mentions.append(Mention(
+                    user_id=user_id, post_id=source.post_id,
+                    comment_id=source.comment_id, created=source.date))
+    TagLink.objects.bulk_create(
+        tag_links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    Mention.objects.bulk_create(
+        mentions, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(tag_links), len(mentions)
+
+
+def update_post_links(post, old_text):
+    """Правит связи поста по разнице старого и нового текста."""
+    old = Source.of_post(post, old_text)
+    new = Source.of_post(post)
+    removed_tags = old.tags - new.tags
+    if removed_tags:
+        TagLink.objects.filter(
+            post=post, comment=None, tag__name__in=removed_tags).delete()
+    removed_mentions = old.mentions - new.mentions
+    if removed_mentions:
+        Mention.objects.filter(
+            post=post, comment=None,
+            user__username__in=removed_mentions).delete()
+    new.tags -= old.tags
+    new.mentions -= old.mentions
+    if new.tags or new.mentions:
+        add_links([new])
+
+
+@receiver(post_save, sender=Post, dispatch_uid='hashtags_post')
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_links([Source.of_post(instance)])
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='hashtags_comment')
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_links([Source.of_comment(instance)])
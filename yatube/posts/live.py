@@ -0,0 +1,62 @@
+"""Оповещения о новых постах и комментариях (см. core.events).
+
+Новый пост публикуется в каналы всей ленты, своей группы и своего
+автора. Поток ленты подписок слушает каналы авторов и групп, на
+которые подписан читатель. Новый комментарий публикуется в канал
+своего поста; страница поста по событию догружает только комментарии
+после последнего показанного.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.events import publish
+
+from .caches import followees, subscribed_groups
+from .models import Comment, Post
+
+ALL_POSTS = 'posts'
+
+
+def group_channel(group_id):
+    return f'posts:group:{group_id}'
+
+
+def author_channel(author_id):
+    return f'posts:author:{author_id}'
+
+
+def comments_channel(post_id):
+    return f'posts:comments:{post_id}'
+
+
+def follow_channels(user):
+    return (
+        [author_channel(pk) for pk in followees.targets(user.pk)]
+        + [group_channel(pk) for pk in subscribed_groups.targets(user.pk)])
+
+
+def count_posts(events):
+    # Клиент складывает count сам: после переподключения с
+    # Last-Event-ID посты не посчитаются дважды.
+    return {'count': len(events)}
+
+
+def last_comment(events):
+    return {'last': events[-1].data['comment']}
+
+
+@receiver(post_save, sender=Post, dispatch_uid='live_post_created')
+def post_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    channels = [ALL_POSTS, author_channel(instance.author_id)]
+    if instance.group_id is not None:
+        channels.append(group_channel(instance.group_id))
+    publish(channels, {'post': instance.pk})
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='live_comment_created')
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        publish(
+            [comments_channel(instance.post_id)], {'comment': instance.pk})
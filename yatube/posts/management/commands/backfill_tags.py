@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from posts.hashtags import Source, add_links
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ('Разбирает хештеги и упоминания в уже существующих постах и '
+            'комментариях. Повторный запуск ничего не задваивает.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--start-after', type=int, default=0,
+            help='Продолжить с постов, pk которых больше указанного.')
+        parser.add_argument(
+            '--skip-comments', action='store_true',
+            help='Не разбирать комментарии.')
+
+    def handle(self, *args, **options):
+        self.backfill(
+            'постов',
+            Post.objects.only('pk', 'author_id', 'pub_date', 'text'),
+            Source.of_post, options['batch_size'], options['start_after'])
+        if not options['skip_comments']:
+            self.backfill(
+                'комментариев',
+                Comment.objects.only(
+                    'pk', 'post_id', 'author_id', 'created', 'text'),
+                Source.of_comment, options['batch_size'], 0)
+
+    def backfill(self, name, queryset, make_source, batch_size, last_pk):
+        queryset = queryset.order_by('pk')
+        done = tags = mentions = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            added_tags, added_mentions = add_links(
+                make_source(obj) for obj in batch)
+            done += len(batch)
+            tags += added_tags
+            mentions += added_mentions
+            self.stdout.write(
+                f'Обработано {name} до pk={last_pk}: {done}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {name} {done}, хештегов {tags}, упоминаний {mentions}'))
@@ -0,0 +1,158 @@
+import itertools
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from core.minhash import MinHashIndex, fingerprint
+from posts.duplicates import index_text, match_text
+from posts.models import Fingerprint, User
+
+LETTERS = 'абвгдежзийклмнопрстуфхцчшщэюя'
+
+
+class Corpus:
+    """Случайные тексты и рассылки — копии шаблонов с правками."""
+
+    def __init__(self, seed, templates):
+        self.rng = random.Random(seed)
+        self.words = [
+            ''.join(self.rng.choices(LETTERS, k=self.rng.randint(2, 10)))
+            for _ in range(20000)]
+        self.templates = [self.text() for _ in range(templates)]
+
+    def text(self):
+        length = self.rng.randint(15, 60)
+        return ' '.join(self.rng.choices(self.words, k=length))
+
+    def copy(self, edits=0.05):
+        """Копия случайного шаблона с заменой ``edits`` доли слов."""
+        words = self.rng.choice(self.templates).split()
+        for _ in range(max(1, int(len(words) * edits))):
+            words[self.rng.randrange(len(words))] = self.rng.choice(self.words)
+        return ' '.join(words)
+
+
+def percentile(timings, share):
+    return timings[min(int(len(timings) * share), len(timings) - 1)] * 1000
+
+
+class Command(BaseCommand):
+    help = ('Замеряет поиск почти одинаковых текстов (MinHash LSH) на '
+            'синтетическом корпусе: индекс в памяти и запись отпечатков в '
+            'базу, как при сохранении поста. Записанное в базу '
+            'откатывается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument(
+            '--spam-share', type=float, default=0.05,
+            help='Доля копий рассылок в корпусе.')
+        parser.add_argument('--templates', type=int, default=1000)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument(
+            '--db-rows', type=int, default=20000,
+            help='Сколько отпечатков записать в базу перед замером; '
+                 '0 — не замерять базу.')
+        parser.add_argument('--db-queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        corpus = Corpus(options['seed'], options['templates'])
+        self.benchmark_index(corpus, options)
+        if options['db_rows']:
+            with transaction.atomic():
+                self.benchmark_database(corpus, options)
+                transaction.set_rollback(True)
+
+    def benchmark_index(self, corpus, options):
+        index = MinHashIndex()
+        started = time.perf_counter()
+        chunk = 100000
+        for start in range(0, options['rows'], chunk):
+            count = min(chunk, options['rows'] - start)
+            index.extend(
+                fingerprint(
+                    corpus.copy() if corpus.rng.random()
+                    < options['spam_share'] else corpus.text())
+                for _ in range(count))
+            self.stdout.write(f'Проиндексировано {len(index)} текстов')
+        built = time.perf_counter() - started
+        self.stdout.write(
+            f'Индекс: {len(index)} текстов за {built:.1f} с')
+
+        hashing = []
+        lookups = []
+        found = {True: 0, False: 0}
+        for number in range(options['queries']):
+            spam = number % 2 == 0
+            text = corpus.copy() if spam else corpus.text()
+            started = time.perf_counter()
+            fp = fingerprint(text)
+            hashed = time.perf_counter()
+            match = index.nearest(
+                fp, settings.SPAM_SIMILARITY, settings.SPAM_MAX_CANDIDATES)
+            hashing.append(hashed - started)
+            lookups.append(time.perf_counter() - hashed)
+            found[spam] += match is not None
+        hashing.sort()
+        lookups.sort()
+        half = options['queries'] / 2
+        self.stdout.write(
+            f'Отпечаток: p50 {percentile(hashing, 0.5):.3f} мс, '
+            f'p99 {percentile(hashing, 0.99):.3f} мс')
+        self.stdout.write(
+            f'Поиск по индексу: p50 {percentile(lookups, 0.5):.3f} мс, '
+            f'p99 {percentile(lookups, 0.99):.3f} мс')
+        self.stdout.write(
+            f'Найдено копий рассылок: {found[True] / half:.1%}, '
+            f'ложных срабатываний: {found[False] / half:.1%}')
+
+    def benchmark_database(self, corpus, options):
+        """Поиск и запись через ``FingerprintBand``, как в форме и сигнале."""
+        author = User.objects.create(username='benchmark-duplicates')
+        # Синтетические «комментарии» не пересекаются с настоящими.
+        last_id = Fingerprint.objects.filter(
+            kind=Fingerprint.COMMENT).aggregate(
+            last=Max('object_id'))['last'] or 0
+        object_ids = itertools.count(last_id + 1)
+        started = time.perf_counter()
+        for _ in range(options['db_rows']):
+            text = (corpus.copy() if corpus.rng.random()
+                    < options['spam_share'] else corpus.text())
+            index_text(
+                Fingerprint.COMMENT, next(object_ids), author.pk, text)
+        built = time.perf_counter() - started
+        self.stdout.write(
+            f'База: {options["db_rows"]} отпечатков за {built:.1f} с')
+
+        lookups = []
+        writes = []
+        found = {True: 0, False: 0}
+        for number in range(options['db_queries']):
+            spam = number % 2 == 0
+            text = corpus.copy() if spam else corpus.text()
+            started = time.perf_counter()
+            match = match_text(text)
+            matched = time.perf_counter()
+            index_text(
+                Fingerprint.COMMENT, next(object_ids), author.pk, text,
+                match)
+            lookups.append(matched - started)
+            writes.append(time.perf_counter() - matched)
+            found[spam] += match.match is not None
+        lookups.sort()
+        writes.sort()
+        half = options['db_queries'] / 2
+        self.stdout.write(
+            f'Отпечаток и поиск в базе: p50 {percentile(lookups, 0.5):.3f} '
+            f'мс, p99 {percentile(lookups, 0.99):.3f} мс')
+        self.stdout.write(
+            f'Запись отпечатка: p50 {percentile(writes, 0.5):.3f} мс, '
+            f'p99 {percentile(writes, 0.99):.3f} мс')
+        self.stdout.write(
+            f'Найдено копий рассылок в базе: {found[True] / half:.1%}, '
+            f'ложных срабатываний: {found[False] / half:.1%}')
@@ -0,0 +1,66 @@
+import itertools
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import FollowGraph
+
+
+def synthetic_edges(users, edges, seed):
+    """Подписки со степенным распределением популярности авторов."""
+    rng = random.Random(seed)
+    cum_weights = list(itertools.accumulate(
+        rng.paretovariate(1.2) for _ in range(users)))
+    authors = range(users)
+    per_user = max(edges // users, 1)
+    produced = 0
+    for user_id in range(users):
+        count = min(per_user, edges - produced)
+        if count <= 0:
+            break
+        for author_id in rng.choices(
+                authors, cum_weights=cum_weights, k=count):
+            if author_id != user_id:
+                yield user_id, author_id
+        produced += count
+
+
+class Command(BaseCommand):
+    help = ('Замеряет рекомендации на синтетическом графе подписок '
+            'в памяти, без базы данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edges', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument(
+            '--sample', type=int, default=1000,
+            help='Для скольких пользователей считать рекомендации.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        graph = FollowGraph(synthetic_edges(
+            options['users'], options['edges'], options['seed']))
+        built = time.perf_counter() - started
+        self.stdout.write(
+            f'Граф: {len(graph)} подписок, {len(graph.following)} '
+            f'читателей, построен за {built:.2f} с')
+
+        users = random.Random(options['seed']).sample(
+            sorted(graph.following),
+            min(options['sample'], len(graph.following)))
+        timings = []
+        for user_id in users:
+            started = time.perf_counter()
+            graph.recommend(user_id)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        total = sum(timings)
+        self.stdout.write(
+            f'На пользователя: среднее {total / len(timings) * 1000:.2f} мс, '
+            f'p50 {timings[len(timings) // 2] * 1000:.2f} мс, '
+            f'p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} мс')
+        self.stdout.write(
+            f'Полный пересчёт всех читателей займёт около '
+            f'{total / len(timings) * len(graph.following):.0f} с')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from posts.caches import post_cache
+from posts.markup import current_version
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Перерисовывает HTML и выдержки постов, отрендеренные другой '
+            'версией рендерера Markdown.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перерисовать все посты, а не только устаревшие.')
+
+    def handle(self, *args, **options):
+        version = current_version()
+        posts = Post.objects.order_by('pk').only('pk', 'text')
+        if not options['all']:
+            posts = posts.exclude(markup_version=version)
+        last_pk = 0
+        rendered = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for post in batch:
+                post.render_text()
+            Post.objects.bulk_update(
+                batch, ['text_html', 'excerpt', 'markup_version'])
+            # bulk_update() сигналов не шлёт.
+            for post in batch:
+                post_cache.invalidate(Post, post)
+            rendered += len(batch)
+            self.stdout.write(
+                f'Обработаны посты до pk={last_pk}: перерисовано {rendered}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: перерисовано {rendered}, версия {version}'))
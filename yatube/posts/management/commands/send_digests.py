@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.jobs import schedule_periodic
+from posts.digests import send_digests
+from posts.tasks import send_follow_digests
+
+
+class Command(BaseCommand):
+    help = ('Пишет в outbox письма подписчикам с новыми постами авторов '
+            'за последний завершившийся период.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period', choices=sorted(settings.DIGEST_PERIODS),
+            default='daily')
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Не рассылать сейчас, а поставить периодическую рассылку '
+                 'в очередь фоновых задач.')
+
+    def handle(self, *args, **options):
+        period = options['period']
+        if options['schedule']:
+            job = schedule_periodic(
+                send_follow_digests, settings.DIGEST_PERIODS[period],
+                args=(period,))
+            self.stdout.write(self.style.SUCCESS(
+                f'Рассылка поставлена в очередь: {job}'))
+            return
+        written, rendered = send_digests(period)
+        self.stdout.write(self.style.SUCCESS(
+            f'Писем в outbox: {written}, разных текстов: {rendered}'))
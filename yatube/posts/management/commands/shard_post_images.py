@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts.caches import post_cache
+from posts.models import Post
+from posts.storage import is_sharded
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в раскладку posts/ab/cd/<sha256>.<ext> '
+            'и обновляет Post.image пачками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько файлов копировать параллельно.')
+        parser.add_argument(
+            '--start-after', type=int, default=0,
+            help='Продолжить с постов, pk которых больше указанного.')
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help='Удалять файлы из старой раскладки. Страницы в кеше '
+                 'фрагментов могут ссылаться на них до истечения срока.')
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        last_pk = options['start_after']
+        moved = missing = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                batch = list(
+                    Post.objects.exclude(image='')
+                    .filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .only('pk', 'image')[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                pending = [
+                    post for post in batch if not is_sharded(post.image.name)]
+                old_names = [post.image.name for post in pending]
+                new_names = executor.map(self.move, old_names)
+                changed = []
+                for post, new_name in zip(pending, new_names):
+                    if new_name is None:
+                        missing += 1
+                        continue
+                    post.image.name = new_name
+                    changed.append(post)
+                Post.objects.bulk_update(changed, ['image'])
+                # bulk_update не шлёт post_save: в кеше остались бы
+                # старые имена файлов, которые сейчас будут удалены.
+                post_cache.invalidate_pks([post.pk for post in changed])
+                moved += len(changed)
+                if options['delete_originals']:
+                    self.delete_unused(old_names)
+                self.stdout.write(
+                    f'Обработаны посты до pk={last_pk}: перенесено {moved}, '
+                    f'файлов не найдено {missing}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: перенесено {moved}, файлов не найдено {missing}'))
+
+    def move(self, name):
+        if not self.storage.exists(name):
+            return None
+        with self.storage.open(name) as content:
+            return self.storage.save(name, content)
+
+    def delete_unused(self, names):
+        still_used = set(
+            Post.objects.filter(image__in=names)
+            .values_list('image', flat=True))
+        for name in set(names) - still_used:
+            if self.storage.exists(name):
+                self.storage.delete(name)
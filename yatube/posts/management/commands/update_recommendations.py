@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.jobs import schedule_periodic
+from posts.recommendations import refresh_all
+from posts.tasks import update_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «кого почитать» по всему графу.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Не считать сейчас, а поставить периодический пересчёт '
+                 'в очередь фоновых задач (раз в '
+                 'RECOMMENDATIONS_INTERVAL).')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            job = schedule_periodic(
+                update_recommendations, settings.RECOMMENDATIONS_INTERVAL)
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересчёт поставлен в очередь: {job}'))
+            return
+        users = refresh_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендации пересчитаны для {users} пользователей'))
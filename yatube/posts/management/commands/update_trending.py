@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.jobs import schedule_periodic
+from posts.tasks import update_trending_scores
+from posts.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = ('Добавляет к рейтингам «Популярного» события с прошлого '
+            'пересчёта.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Не считать сейчас, а поставить периодический пересчёт '
+                 'в очередь фоновых задач (раз в TRENDING_INTERVAL).')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            job = schedule_periodic(
+                update_trending_scores, settings.TRENDING_INTERVAL)
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересчёт поставлен в очередь: {job}'))
+            return
+        stats = update_trending()
+        self.stdout.write(self.style.SUCCESS(
+            'Обновлено постов: {posts}, групп: {groups}, '
+            'удалено строк: {pruned}'.format(**stats)))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts.warmup import POPULAR, RECENT, warm_caches
+
+
+class Command(BaseCommand):
+    help = ('Рендерит главную, самые активные группы и профили через '
+            'настоящие view, чтобы заполнить кеши и миниатюры.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index-pages', type=int, default=5,
+            help='Сколько первых страниц главной прогреть.')
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--profiles', type=int, default=20)
+        parser.add_argument(
+            '--order', choices=(RECENT, POPULAR), default=RECENT,
+            help='recent — по свежести постов, popular — по сумме '
+                 'просмотров постов группы или автора.')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько страниц рендерить параллельно.')
+        parser.add_argument(
+            '--host', help='Значение Host для запросов; по умолчанию '
+                           'первый из ALLOWED_HOSTS.')
+
+    def handle(self, *args, **options):
+        report = warm_caches(
+            index_pages=options['index_pages'],
+            groups=options['groups'],
+            profiles=options['profiles'],
+            order=options['order'],
+            workers=options['workers'],
+            host=options['host'])
+        for path, error in report.failed:
+            self.stderr.write(f'{path}: {error}')
+        style = self.style.WARNING if report.failed else self.style.SUCCESS
+        self.stdout.write(style(f'Прогрето: {report.summary()}'))
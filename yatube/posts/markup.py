@@ -0,0 +1,272 @@
+"""Markdown в текстах постов.
+
+Текст рендерится один раз при сохранении поста: ``Post.save()`` кладёт
+в модель очищенный HTML (``text_html``), короткую выдержку для лент
+(``excerpt``) и версию рендерера (``markup_version``). Шаблоны выводят
+готовый HTML и в запросе ничего не разбирают.
+
+Если установлен пакет ``markdown``, рендерит он, иначе — встроенный
+рендерер основной разметки: абзацы, заголовки, списки, цитаты, код,
+**жирный**, *курсив* и [ссылки](https://…). #Хештеги и @упоминания
+вне ссылок и кода становятся ссылками на ленту хештега и профиль.
+Результат любого рендерера
+проходит через ``clean_html``: остаются только теги и атрибуты из
+списков ниже, ссылки — только http(s), mailto и пути сайта. Версия
+включает имя рендерера, поэтому после установки ``markdown`` или смены
+``MARKUP_VERSION`` посты со старой версией перерисует
+``manage.py rerender_posts``.
+"""
+import re
+from html import escape
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.text import Truncator
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+# Увеличивается при любом изменении рендеринга или очистки.
+MARKUP_VERSION = 3
+
+ALLOWED_TAGS = frozenset((
+    'a', 'b', 'blockquote', 'br', 'code', 'em', 'h3', 'h4', 'h5', 'h6',
+    'hr', 'i', 'li', 'ol', 'p', 'pre', 'strong', 'ul'))
+EMPTY_TAGS = frozenset(('br', 'hr'))
+# Содержимое этих тегов выбрасывается целиком, а не показывается текстом.
+DROPPED_TAGS = frozenset(('script', 'style', 'iframe', 'object', 'template'))
+# Заголовки поста не должны спорить с заголовками страницы.
+HEADING_LEVELS = {'h1': 'h3', 'h2': 'h4', 'h3': 'h5', 'h4': 'h6'}
+SAFE_URL = re.compile(r'^(https?://|mailto:|/(?!/))', re.IGNORECASE)
+# Внутри этих тегов хештеги и упоминания остаются текстом.
+NO_LINKS_TAGS = frozenset(('a', 'code', 'pre'))
+
+TAG_PATTERN = re.compile(r'(?<![\w#&])#(\w{1,100})(?!\w)')
+# Имена пользователей Django могут содержать . + - и @, но точку в
+# конце считаем концом предложения, а «a@b» — адресом почты.
+MENTION_PATTERN = re.compile(r'(?<![\w@])@([\w.+-]{0,149}\w)(?![\w@])')
+LINK_PATTERN = re.compile(
+    f'{TAG_PATTERN.pattern}|{MENTION_PATTERN.pattern}')
+
+
+def renderer_name():
+    return 'markdown' if markdown is not None else 'basic'
+
+
+def current_version():
+    return f'{renderer_name()}:{MARKUP_VERSION}'
+
+
+class Cleaner(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.text = []
+        self.open = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropping += 1
+            return
+        tag = HEADING_LEVELS.get(tag, tag)
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        if tag == 'a':
+            href = dict(attrs).get('href') or ''
+            if not SAFE_URL.match(href.strip()):
+                return
+            self.parts.append(
+                f'<a href="{escape(href.strip())}" rel="nofollow noopener">')
+        else:
+            self.parts.append(f'<{tag}>')
+        if tag not in EMPTY_TAGS:
+            self.open.append(tag)
+        elif tag == 'br':
+            self.text.append(' ')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in DROPPED_TAGS:
+            self.handle_starttag(tag, attrs)
+            if tag in self.open[-1:]:
+                self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        tag = HEADING_LEVELS.get(tag, tag)
+        if self.dropping or tag not in self.open:
+            return
+        # Незакрытые внутри теги закрываются вместе с ним.
+        while self.open:
+            current = self.open.pop()
+            self.parts.append(f'</{current}>')
+            if current == tag:
+                break
+        self.text.append(' ')
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        if NO_LINKS_TAGS.isdisjoint(self.open):
+            self.parts.append(linkify(data))
+        else:
+            self.parts.append(escape(data, quote=False))
+        self.text.append(data)
+
+    def result(self):
+        self.close()
+        self.parts.extend(f'</{tag}>' for tag in reversed(self.open))
+        self.open = []
+        return ''.join(self.parts)
+
+
+def linkify(text):
+    """Экранированный текст со ссылками на хештеги и упоминания."""
+    parts = []
+    position = 0
+    for match in LINK_PATTERN.finditer(text):
+        tag, username = match.groups()
+        if tag:
+            url = reverse('posts:tag_feed', args=(tag.lower(),))
+        else:
+            url = reverse('posts:profile', args=(username,))
+        parts.append(escape(text[position:match.start()], quote=False))
+        parts.append(
+            f'<a href="{escape(url)}">{escape(match.group(0), quote=False)}'
+            '</a>')
+        position = match.end()
+    parts.append(escape(text[position:], quote=False))
+    return ''.join(parts)
+
+
+def clean_html(html):
+    """HTML только из разрешённых тегов и ссылок; и его чистый текст."""
+    cleaner = Cleaner()
+    cleaner.feed(html)
+    cleaned = cleaner.result()
+    return cleaned, ' '.join(''.join(cleaner.text).split())
+
+
+INLINE_RULES = (
+    (re.compile(r'\*\*(.+?)\*\*'), r'<strong>\1</strong>'),
+    (re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])'), r'<em>\1</em>'),
+    (re.compile(r'(?<!\w)_(?!\s)(.+?)(?<!\s)_(?!\w)'), r'<em>\1</em>'),
+    (re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)'), r'<a href="\2">\1</a>'),
+)
+CODE_SPAN = re.compile(r'`([^`]+)`')
+LIST_ITEM = re.compile(r'^\s*(?:([-*+])|\d+[.)])\s+(.*)$')
+HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*$')
+# «#» в начале строки (и в цитате или пункте списка) без пробела
+# после: для Python-Markdown это заголовок, для нас — хештег.
+HASHTAG_HEADING = re.compile(
+    r'^( {0,3}(?:(?:>|[-*+]|\d+[.)])\s*)*)(#{1,6})(?=[^\s#])')
+
+
+def render_inline(text):
+    # Код размечается первым, и внутри него ничего не разбирается.
+    pieces = CODE_SPAN.split(text)
+    for index, piece in enumerate(pieces):
+        piece = escape(piece)
+        if index % 2:
+            pieces[index] = f'<code>{piece}</code>'
+            continue
+        for pattern, replacement in INLINE_RULES:
+            piece = pattern.sub(replacement, piece)
+        pieces[index] = piece
+    return ''.join(pieces)
+
+
+def render_list(lines):
+    tag = 'ul' if LIST_ITEM.match(lines[0]).group(1) else 'ol'
+    items = ''.join(
+        f'<li>{render_inline(LIST_ITEM.match(line).group(2))}</li>'
+        for line in lines)
+    return f'<{tag}>{items}</{tag}>'
+
+
+def render_block(lines):
+    heading = HEADING.match(lines[0])
+    if len(lines) == 1 and heading:
+        level = len(heading.group(1))
+        return f'<h{level}>{render_inline(heading.group(2))}</h{level}>'
+    if all(LIST_ITEM.match(line) for line in lines):
+        return render_list(lines)
+    if all(line.startswith('>') for line in lines):
+        inner = render_blocks([line[1:].lstrip() for line in lines])
+        return f'<blockquote>{inner}</blockquote>'
+    if len(lines) == 1 and lines[0].strip() in ('---', '***'):
+        return '<hr>'
+    return '<p>{}</p>'.format(
+        '<br>'.join(render_inline(line.strip()) for line in lines))
+
+
+def render_blocks(lines):
+    html = []
+    block = []
+    code = None
+    for line in lines:
+        if code is not None:
+            if line.strip().startswith('```'):
+                html.append('<pre><code>{}</code></pre>'.format(
+                    escape('\n'.join(code), quote=False)))
+                code = None
+            else:
+                code.append(line)
+        elif line.strip().startswith('```'):
+            code = []
+        elif line.strip():
+            block.append(line)
+            continue
+        if block:
+            html.append(render_block(block))
+            block = []
+    if code is not None:
+        block = ['```'] + code
+    if block:
+        html.append(render_block(block))
+    return ''.join(html)
+
+
+def render_basic(text):
+    return render_blocks(text.replace('\r\n', '\n').split('\n'))
+
+
+def escape_hashtag_headings(text):
+    """Экранирует ``#`` в начале строк, где за ним нет пробела.
+
+    Python-Markdown делает заголовком и ``#тег``, а встроенный
+    рендерер — только ``# Заголовок``; так оба оставляют хештег
+    хештегом. Строки внутри ```-блоков кода не трогаются.
+    """
+    lines = text.replace('\r\n', '\n').split('\n')
+    code = False
+    for index, line in enumerate(lines):
+        if line.strip().startswith('```'):
+            code = not code
+        elif not code:
+            lines[index] = HASHTAG_HEADING.sub(
+                lambda match: match.group(1) + '\\#' * len(match.group(2)),
+                line)
+    return '\n'.join(lines)
+
+
+def render_markdown(text):
+    if markdown is None:
+        return render_basic(text)
+    md = markdown.Markdown(extensions=['fenced_code', 'nl2br'])
+    # HTML в тексте остаётся текстом, как во встроенном рендерере.
+    md.preprocessors.deregister('html_block')
+    md.inlinePatterns.deregister('html')
+    return md.convert(escape_hashtag_headings(text))
+
+
+def render(text):
+    """Очищенный HTML и выдержка для текста поста."""
+    html, plain = clean_html(render_markdown(text))
+    excerpt = Truncator(plain).chars(settings.POST_EXCERPT_LENGTH)
+    return html, excerpt
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:18
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backdate_follows(apps, schema_editor):
+    # Время старых подписок неизвестно; с временем миграции все они
+    # попали бы в «Популярное» как новые подписчики.
+    Follow = apps.get_model('posts', 'Follow')
+    Follow.objects.update(created=datetime.datetime(
+        2020, 1, 1, tzinfo=datetime.timezone.utc))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupTrend',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='posts.Group')),
+                ('score', models.FloatField(db_index=True)),
+                ('updated', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostTrend',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='posts.Post')),
+                ('score', models.FloatField(db_index=True)),
+                ('views_seen', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Подписка оформлена'),
+        ),
+        migrations.RunPython(backdate_follows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:26
+
+from django.db import migrations, models
+from django.db.models import F, Min
+import django.db.models.expressions
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    # Без ограничения могли появиться повторы и подписки на себя.
+    Follow = apps.get_model('posts', 'Follow')
+    Follow.objects.filter(user=F('author')).delete()
+    keep = Follow.objects.values('user', 'author').annotate(
+        first=Min('pk')).values('first')
+    Follow.objects.exclude(pk__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_recommendation'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'created'], name='posts_follow_followers_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['user', 'created'], name='posts_follow_following_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='posts_follow_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='posts_follow_not_self'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0015_tags_mentions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий')], max_length=10, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id')),
+                ('excerpt', models.CharField(max_length=200, verbose_name='Начало текста')),
+                ('sketch', models.BinaryField(verbose_name='Подпись')),
+                ('similarity', models.FloatField(blank=True, null=True, verbose_name='Сходство')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создан')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('cluster', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='members', to='posts.Fingerprint', verbose_name='Кластер')),
+            ],
+            options={
+                'verbose_name': 'Отпечаток текста',
+                'verbose_name_plural': 'Отпечатки текстов',
+            },
+        ),
+        migrations.CreateModel(
+            name='FingerprintBand',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='posts.Fingerprint')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DuplicateCluster',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Кластер дублей',
+                'verbose_name_plural': 'Кластеры дублей',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('posts.fingerprint',),
+        ),
+        migrations.AddConstraint(
+            model_name='fingerprint',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='posts_fingerprint_unique'),
+        ),
+    ]
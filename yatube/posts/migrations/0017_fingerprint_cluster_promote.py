@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:22
+
+from django.db import migrations, models
+import posts.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fingerprint',
+            name='cluster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=posts.models.promote_cluster_member, related_name='members', to='posts.Fingerprint', verbose_name='Кластер'),
+        ),
+    ]
@@ -1,9 +1,16 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from core.loaders import BatchedQuerySet, batched_relations
+
+from .markup import current_version, render
+from .storage import post_image_storage
 
 User = get_user_model()
 
 
+@batched_relations('author', 'group')
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -20,16 +27,48 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True)
+    # Пишется пачками из core.counters, см. posts.caches.post_views.
+    views = models.PositiveIntegerField(
+        'Просмотры', default=0, editable=False)
+    # Готовый HTML текста и выдержка для лент, см. posts.markup.
+    text_html = models.TextField(editable=False, blank=True)
+    excerpt = models.CharField(max_length=300, editable=False, blank=True)
+    markup_version = models.CharField(
+        max_length=30, editable=False, blank=True, db_index=True)
+
+    objects = BatchedQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            # Ленты автора и группы читаются по (источник, pub_date):
+            # каждая ветка ленты подписок — отрезок одного индекса.
+            models.Index(
+                fields=['author', '-pub_date'], name='posts_post_author_idx'),
+            models.Index(
+                fields=['group', '-pub_date'], name='posts_post_group_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def render_text(self):
+        self.text_html, self.excerpt = render(self.text)
+        self.markup_version = current_version()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'text_html', 'excerpt', 'markup_version'}
+        super().save(*args, **kwargs)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -40,6 +79,7 @@ class Group(models.Model):
         return self.title
 
 
+@batched_relations('post', 'author')
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
@@ -52,10 +92,13 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = BatchedQuerySet.as_manager()
+
     def __str__(self):
         return self.text[:15]
 
 
+@batched_relations('user', 'author')
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -65,3 +108,263 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='following')
+    created = models.DateTimeField(
+        'Подписка оформлена', default=timezone.now, db_index=True)
+
+    objects = BatchedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Поля по отдельности не уникальны, уникальна только пара:
+            # повторная подписка — ошибка базы, а не второй ряд.
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='posts_follow_unique'),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='posts_follow_not_self'),
+        ]
+        indexes = [
+            # Списки подписчиков и подписок листаются по (created, id).
+            models.Index(
+                fields=['author', 'created'],
+                name='posts_follow_followers_idx'),
+            models.Index(
+                fields=['user', 'created'],
+                name='posts_follow_following_idx'),
+        ]
+
+
+@batched_relations('user', 'group')
+class GroupSubscription(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='group_subscriptions')
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='subscribers')
+    created = models.DateTimeField(
+        'Подписка оформлена', default=timezone.now)
+
+    objects = BatchedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'group'],
+                name='posts_group_subscription_unique'),
+        ]
+
+
+class PostTrend(models.Model):
+    """Рейтинг поста в «Популярном», см. posts.trending."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend')
+    # Логарифм затухающей суммы событий, приведённой к posts.trending.EPOCH:
+    # порядок по нему не меняется со временем, пересчитывать нетронутые
+    # строки не нужно.
+    score = models.FloatField(db_index=True)
+    views_seen = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(db_index=True)
+
+
+class GroupTrend(models.Model):
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend')
+    score = models.FloatField(db_index=True)
+    updated = models.DateTimeField(db_index=True)
+
+
+@batched_relations('user', 'author')
+class Recommendation(models.Model):
+    """Авторы, которых стоит почитать пользователю (posts.recommendations)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+')
+    score = models.FloatField()
+    updated = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = BatchedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['user', '-score']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='posts_recommendation_unique'),
+        ]
+
+
+class Tag(models.Model):
+    name = models.CharField('Хештег', max_length=100, unique=True)
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class TagLink(models.Model):
+    """Хештег в тексте поста или, если задан ``comment``, комментария."""
+
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='links')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tag_links')
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='tag_links',
+        blank=True,
+        null=True)
+    # Копия времени поста или комментария: лента хештега — отрезок
+    # индекса (tag, pub_date) без соединения с постами.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'post'], condition=models.Q(comment=None),
+                name='posts_taglink_post_unique'),
+            models.UniqueConstraint(
+                fields=['tag', 'comment'],
+                condition=models.Q(comment__isnull=False),
+                name='posts_taglink_comment_unique'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['tag', '-pub_date'], name='posts_taglink_feed_idx'),
+        ]
+
+
+@batched_relations('user', 'post', 'comment')
+class Mention(models.Model):
+    """Упоминание пользователя в посте или комментарии."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions')
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        blank=True,
+        null=True)
+    created = models.DateTimeField()
+
+    objects = BatchedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], condition=models.Q(comment=None),
+                name='posts_mention_post_unique'),
+            models.UniqueConstraint(
+                fields=['user', 'comment'],
+                condition=models.Q(comment__isnull=False),
+                name='posts_mention_comment_unique'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created'], name='posts_mention_inbox_idx'),
+        ]
+
+
+def promote_cluster_member(collector, field, sub_objs, using):
+    """``on_delete`` кластера: корнем становится самый старый оставшийся.
+
+    С ``SET_NULL`` удаление первого текста рассыпало бы кластер на
+    одиночки, и счётчик копий рассылки начинался бы заново.
+    """
+    doomed = collector.data.get(field.model, set())
+    clusters = {}
+    for member in sorted(sub_objs, key=lambda member: member.pk):
+        if member not in doomed:
+            clusters.setdefault(member.cluster_id, []).append(member)
+    for root, *members in clusters.values():
+        collector.add_field_update(field, None, [root])
+        collector.add_field_update(
+            field.model._meta.get_field('similarity'), None, [root])
+        collector.add_field_update(field, root, members)
+
+
+class Fingerprint(models.Model):
+    """Отпечаток MinHash текста поста или комментария (posts.duplicates).
+    """
+
+    POST = 'post'
+    COMMENT = 'comment'
+    KINDS = (
+        (POST, 'Пост'),
+        (COMMENT, 'Комментарий'),
+    )
+
+    kind = models.CharField('Тип', max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField('id')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+    excerpt = models.CharField('Начало текста', max_length=200)
+    sketch = models.BinaryField('Подпись')
+    # Первый текст кластера почти одинаковых; у него самого пусто.
+    cluster = models.ForeignKey(
+        'self',
+        on_delete=promote_cluster_member,
+        related_name='members',
+        blank=True,
+        null=True,
+        verbose_name='Кластер')
+    similarity = models.FloatField('Сходство', blank=True, null=True)
+    created = models.DateTimeField('Создан', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Отпечаток текста'
+        verbose_name_plural = 'Отпечатки текстов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='posts_fingerprint_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id}'
+
+
+class FingerprintBand(models.Model):
+    """Ключ одной полосы LSH: тексты с общим ключом — кандидаты в дубли."""
+
+    fingerprint = models.ForeignKey(
+        Fingerprint,
+        on_delete=models.CASCADE,
+        related_name='bands')
+    key = models.BigIntegerField(db_index=True)
+
+
+class DuplicateCluster(Fingerprint):
+    class Meta:
+        proxy = True
+        verbose_name = 'Кластер дублей'
+        verbose_name_plural = 'Кластеры дублей'
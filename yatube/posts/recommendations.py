@@ -0,0 +1,183 @@
+"""Рекомендации «кого почитать» по графу подписок.
+
+Граф хранится как разреженная матрица смежности ``A`` в двух словарях
+множеств: строки (``following``) и столбцы (``followers``). Оценка
+автора для пользователя ``u`` складывается из двух произведений:
+
+* друзья друзей — строка ``u`` матрицы ``A·A``: на кого подписаны те,
+  на кого подписан ``u``;
+* похожие читатели — ``RECOMMENDATIONS_NEIGHBOURS`` пользователей с
+  наибольшим косинусным сходством подписок (строка ``A·Aᵀ``), их
+  подписки с весом сходства. Авторы, у которых больше
+  ``RECOMMENDATIONS_MAX_FANOUT`` подписчиков, в сходство не входят:
+  на них подписаны почти все, а считать их дорого.
+
+Умножение проходит только по ненулевым элементам, поэтому стоимость
+зависит от числа рёбер рядом с ``u``, а не от размера всего графа.
+Верхние ``RECOMMENDATIONS_SIZE`` авторов хранятся в ``Recommendation``;
+страницы читают только их. Подписка или отписка ставит пересчёт
+одного пользователя в очередь задач, весь граф пересчитывается
+периодически (``manage.py update_recommendations``).
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caches import followees
+from .models import Follow, Recommendation
+
+CHUNK_SIZE = 10000
+
+
+class FollowGraph:
+    def __init__(self, edges=()):
+        self.following = defaultdict(set)
+        self.followers = defaultdict(set)
+        # Авторы, чьи подписчики загружены не все (см. around).
+        self.popular = set()
+        self.extend(edges)
+
+    def extend(self, edges):
+        for user_id, author_id in edges:
+            self.following[user_id].add(author_id)
+            self.followers[author_id].add(user_id)
+
+    def __len__(self):
+        return sum(len(authors) for authors in self.following.values())
+
+    @classmethod
+    def load(cls):
+        """Весь граф подписок, построчно без загрузки моделей."""
+        return cls(Follow.objects.values_list(
+            'user_id', 'author_id').iterator(chunk_size=CHUNK_SIZE))
+
+    @classmethod
+    def around(cls, user_id):
+        """Только рёбра, нужные для рекомендаций одному пользователю."""
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        graph = cls(follows.filter(user_id=user_id))
+        followed = list(graph.following[user_id])
+        graph.extend(follows.filter(user_id__in=followed))
+        small_authors = set(Follow.objects.filter(
+            author_id__in=followed,
+        ).values('author_id').annotate(readers=Count('pk')).filter(
+            readers__lte=settings.RECOMMENDATIONS_MAX_FANOUT,
+        ).values_list('author_id', flat=True))
+        graph.popular = set(followed) - small_authors
+        graph.extend(follows.filter(author_id__in=small_authors))
+        neighbours = [user for user, _ in graph.similar_users(user_id)]
+        graph.extend(follows.filter(user_id__in=neighbours))
+        return graph
+
+    def similar_users(self, user_id, limit=None):
+        """Пользователи с самыми похожими подписками и их сходство."""
+        followed = self.following.get(user_id, ())
+        overlap = Counter()
+        for author_id in followed:
+            readers = self.followers[author_id]
+            if (
+                author_id not in self.popular
+                and len(readers) <= settings.RECOMMENDATIONS_MAX_FANOUT
+            ):
+                overlap.update(readers)
+        overlap.pop(user_id, None)
+        similarity = (
+            (other, common / math.sqrt(
+                len(followed) * len(self.following[other])))
+            for other, common in overlap.items())
+        return heapq.nlargest(
+            limit or settings.RECOMMENDATIONS_NEIGHBOURS, similarity,
+            key=itemgetter(1))
+
+    def recommend(self, user_id, limit=None):
+        """Верхние авторы для ``user_id``: список (автор, оценка)."""
+        weights = settings.RECOMMENDATIONS_WEIGHTS
+        followed = self.following.get(user_id, set())
+        scores = Counter()
+        for friend_id in followed:
+            for author_id in self.following.get(friend_id, ()):
+                scores[author_id] += weights['friend_of_friend']
+        for other, similarity in self.similar_users(user_id):
+            for author_id in self.following[other]:
+                scores[author_id] += weights['co_follow'] * similarity
+        for author_id in followed | {user_id}:
+            scores.pop(author_id, None)
+        return heapq.nlargest(
+            limit or settings.RECOMMENDATIONS_SIZE, scores.items(),
+            # При равной оценке — более ранние авторы, чтобы порядок
+            # не зависел от обхода множеств.
+            key=lambda item: (item[1], -item[0]))
+
+
+def store(recommendations, now=None):
+    """Заменяет рекомендации пользователей: ``{user_id: [(автор, оценка)]}``.
+    """
+    now = now or timezone.now()
+    rows = [
+        Recommendation(
+            user_id=user_id, author_id=author_id, score=score, updated=now)
+        for user_id, top in recommendations.items()
+        for author_id, score in top]
+    with transaction.atomic():
+        Recommendation.objects.filter(
+            user_id__in=list(recommendations)).delete()
+        Recommendation.objects.bulk_create(rows, batch_size=500)
+
+
+def refresh_user(user_id):
+    graph = FollowGraph.around(user_id)
+    store({user_id: graph.recommend(user_id)})
+
+
+def refresh_all(batch_size=500):
+    """Пересчитывает рекомендации всех, у кого есть подписки."""
+    started = timezone.now()
+    graph = FollowGraph.load()
+    users = sorted(graph.following)
+    for start in range(0, len(users), batch_size):
+        store({
+            user_id: graph.recommend(user_id)
+            for user_id in users[start:start + batch_size]}, started)
+    # Кто отписался от всех, остался со старыми строками.
+    Recommendation.objects.filter(updated__lt=started).delete()
+    return len(users)
+
+
+def recommended_authors(user, limit=None):
+    if not user.is_authenticated:
+        return []
+    recommendations = list(Recommendation.objects.filter(
+        user=user).select_related('author')[
+            :limit or settings.RECOMMENDATIONS_SIZE])
+    # Пока пересчёт в очереди, тех, на кого уже подписались, не показываем.
+    followed = followees.which(
+        user.pk, [recommendation.author_id
+                  for recommendation in recommendations])
+    return [
+        recommendation.author for recommendation in recommendations
+        if recommendation.author_id not in followed]
+
+
+@receiver(post_save, sender=Follow, dispatch_uid='recommendations_follow')
+@receiver(post_delete, sender=Follow, dispatch_uid='recommendations_unfollow')
+def follow_changed(sender, instance, **kwargs):
+    schedule_refresh(instance.user_id)
+
+
+def schedule_refresh(user_id):
+    """Ставит пересчёт рекомендаций пользователя после commit."""
+    from .tasks import refresh_recommendations
+
+    # Подписки часто идут сериями: задержка и ключ собирают серию
+    # в один пересчёт.
+    transaction.on_commit(lambda: refresh_recommendations.enqueue(
+        args=(user_id,), dedup_key=f'recommendations:{user_id}',
+        delay=settings.RECOMMENDATIONS_REFRESH_DELAY))
@@ -0,0 +1,133 @@
+import base64
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, get_storage_class
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.deconstruct import deconstructible
+
+from core.storage import S3Storage
+
+SHARDED_NAME_RE = re.compile(
+    r'^(?P<prefix>.*/)?[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+IMAGE_EXTENSIONS = ('.gif', '.jpeg', '.jpg', '.png', '.webp')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def sharded_name(name, digest):
+    """``posts/cat.JPG`` + хеш -> ``posts/ab/cd/abcd….jpg``."""
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    return os.path.join(
+        directory, digest[:2], digest[2:4], digest + extension)
+
+
+def is_sharded(name):
+    return bool(SHARDED_NAME_RE.match(name))
+
+
+class ContentHashShardingMixin:
+    """Раскладывает файлы по каталогам из первых символов хеша содержимого.
+
+    Имя файла вычисляется из sha256 содержимого, поэтому одинаковые
+    картинки хранятся в одном экземпляре, а в каждом каталоге
+    оказывается не больше нескольких сотен файлов.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = sharded_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+class ShardedFileSystemStorage(ContentHashShardingMixin, FileSystemStorage):
+    pass
+
+
+class ShardedS3Storage(ContentHashShardingMixin, S3Storage):
+    pass
+
+
+def supports_direct_upload(storage):
+    return hasattr(storage, 'presigned_upload')
+
+
+def direct_upload_ticket(storage, filename, sha256):
+    """Ключ объекта и подписанный запрос для загрузки из браузера.
+
+    Ключ строится из хеша так же, как при обычной загрузке, поэтому
+    уже загруженный файл повторно не передаётся: ``upload`` будет None.
+    Возвращает None, если имя файла или хеш недопустимы.
+    """
+    sha256 = sha256.lower()
+    extension = os.path.splitext(filename)[1].lower()
+    if not SHA256_RE.match(sha256) or extension not in IMAGE_EXTENSIONS:
+        return None
+    key = sharded_name('posts/' + os.path.basename(filename), sha256)
+    if storage.exists(key):
+        return {'key': key, 'upload': None}
+    checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+    return {
+        'key': key,
+        'upload': storage.presigned_upload(key, checksum=checksum),
+    }
+
+
+def is_uploaded_image_key(storage, key):
+    return (
+        key.startswith('posts/')
+        and os.path.splitext(key)[1] in IMAGE_EXTENSIONS
+        and is_sharded(key)
+        and storage.exists(key))
+
+
+@deconstructible
+class PostImageStorage:
+    """Хранилище картинок постов, заданное ``POST_IMAGE_STORAGE``.
+
+    Бэкенд выбирается при первом обращении, а в миграции попадает
+    только этот класс: смена настройки не требует новой миграции.
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = get_storage_class(settings.POST_IMAGE_STORAGE)()
+        return self._backend
+
+    def reset(self):
+        self._backend = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+
+post_image_storage = PostImageStorage()
+
+
+@receiver(setting_changed)
+def reset_post_image_storage(setting, **kwargs):
+    if setting == 'POST_IMAGE_STORAGE':
+        post_image_storage.reset()
@@ -0,0 +1,45 @@
+from django.conf import settings
+
+from core.jobs import schedule_periodic, task
+
+from .digests import send_digests
+from .models import Post
+from .recommendations import refresh_all, refresh_user
+from .thumbnails import post_thumbnail
+from .trending import update_trending
+
+
+@task(queue='media', priority=3)
+def generate_post_thumbnail(post_id):
+    """Готовит миниатюру заранее, чтобы её не делал первый читатель."""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is not None and post.image:
+        post_thumbnail(post.image)
+
+
+@task(priority=4, max_attempts=1)
+def update_trending_scores():
+    """Пересчитывает «Популярное» и ставит следующий пересчёт."""
+    schedule_periodic(update_trending_scores, settings.TRENDING_INTERVAL)
+    return update_trending()
+
+
+@task(priority=6)
+def refresh_recommendations(user_id):
+    refresh_user(user_id)
+
+
+@task(priority=7, max_attempts=1)
+def update_recommendations():
+    """Пересчитывает рекомендации по всему графу подписок."""
+    schedule_periodic(
+        update_recommendations, settings.RECOMMENDATIONS_INTERVAL)
+    return refresh_all()
+
+
+@task(queue='mail', priority=6, max_attempts=3)
+def send_follow_digests(period):
+    """Пишет в outbox рассылку за ``period`` и ставит следующую."""
+    schedule_periodic(
+        send_follow_digests, settings.DIGEST_PERIODS[period], args=(period,))
+    return send_digests(period)
@@ -0,0 +1,89 @@
+import warnings
+
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..caches import group_cache, post_cache, user_cache
+from ..models import Group, Post, User
+
+
+class ObjectCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='group-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        for object_cache in (group_cache, post_cache, user_cache):
+            object_cache.local.clear()
+
+    def test_repeated_lookups_hit_cache(self):
+        lookups = (
+            (post_cache, {'pk': self.post.pk}),
+            (user_cache, {'username': 'auth'}),
+            (group_cache, {'slug': 'group-slug'}),
+        )
+        for object_cache, lookup in lookups:
+            with self.subTest(lookup=lookup):
+                first = object_cache.get(**lookup)
+                with self.assertNumQueries(0):
+                    self.assertEqual(object_cache.get(**lookup), first)
+                    object_cache.local.clear()
+                    self.assertEqual(object_cache.get(**lookup), first)
+
+    def test_keys_are_safe_for_memcached(self):
+        group = Group.objects.create(
+            title='Кириллица', slug='Тестовый слаг', description='')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            self.assertEqual(group_cache.get(slug='Тестовый слаг'), group)
+
+    def test_save_and_delete_invalidate(self):
+        post_cache.get(pk=self.post.pk)
+        Post.objects.filter(pk=self.post.pk).update(text='Мимо сигналов')
+        self.assertEqual(post_cache.get(pk=self.post.pk).text, 'Тестовый пост')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(post_cache.get(pk=self.post.pk).text, 'Новый текст')
+        post.delete()
+        with self.assertRaises(Post.DoesNotExist):
+            post_cache.get(pk=self.post.pk)
+
+    def test_missing_objects_are_cached_until_created(self):
+        with self.assertRaises(User.DoesNotExist):
+            user_cache.get(username='newbie')
+        with self.assertNumQueries(0):
+            with self.assertRaises(User.DoesNotExist):
+                user_cache.get(username='newbie')
+        newbie = User.objects.create_user(username='newbie')
+        self.assertEqual(user_cache.get(username='newbie'), newbie)
+
+    def test_renamed_user_is_not_found_by_old_name(self):
+        user = User.objects.create_user(username='old_name')
+        user_cache.get(username='old_name')
+        user.username = 'new_name'
+        user.save()
+        with self.assertRaises(User.DoesNotExist):
+            user_cache.get(username='old_name')
+
+    def test_unknown_profile_and_group_return_404(self):
+        client = Client()
+        for url in (reverse('posts:profile', args=('nobody',)),
+                    reverse('posts:group_list', args=('no-group',)),
+                    reverse('posts:post_detail', args=(self.post.pk + 1,))):
+            with self.subTest(url=url):
+                self.assertEqual(client.get(url).status_code, 404)
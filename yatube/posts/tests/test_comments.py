@@ -0,0 +1,81 @@
+import threading
+import time
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.events import broadcast, reset_events
+
+from ..live import comments_channel
+from ..models import Comment, Post, User
+
+
+@override_settings(
+    COMMENTS_ON_PAGE=3, COMMENTS_BATCH=2,
+    EVENTS_BROADCAST='core.events.LocalBroadcast')
+class CommentDeltaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}')
+            for number in range(5)]
+
+    def setUp(self):
+        reset_events()
+        self.addCleanup(reset_events)
+        self.url = reverse('posts:comment_list', args=[self.post.pk])
+
+    def ids(self, response):
+        return [comment['id'] for comment in response.json()['comments']]
+
+    def test_page_shows_latest_comments_only(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(response.context['comments'], self.comments[2:])
+        self.assertTrue(response.context['has_earlier_comments'])
+
+    def test_comments_after_and_before(self):
+        response = self.client.get(
+            self.url, {'after': self.comments[1].pk})
+        self.assertEqual(
+            self.ids(response), [self.comments[2].pk, self.comments[3].pk])
+        self.assertIn('Комментарий 2', response.json()['comments'][0]['html'])
+        response = self.client.get(
+            self.url, {'before': self.comments[2].pk})
+        self.assertEqual(
+            self.ids(response), [self.comments[0].pk, self.comments[1].pk])
+        self.assertEqual(
+            self.client.get(self.url, {'after': 'x'}).status_code, 400)
+
+    @override_settings(COMMENTS_LONG_POLL_TIMEOUT=5)
+    def test_long_poll_wakes_on_event(self):
+        timer = threading.Timer(0.05, broadcast().send, args=(
+            [comments_channel(self.post.pk)], {'comment': 0}))
+        timer.start()
+        started = time.monotonic()
+        response = self.client.get(
+            self.url, {'after': self.comments[-1].pk, 'wait': 1})
+        timer.join()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(self.ids(response), [])
+
+    def test_add_comment_returns_rendered_comment(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Живой'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 201)
+        comment = Comment.objects.get(text='Живой')
+        self.assertEqual(response.json()['id'], comment.pk)
+        self.assertIn(f'comment-{comment.pk}', response.json()['html'])
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': ''}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+        page = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertContains(page, 'id="comment-errors"')
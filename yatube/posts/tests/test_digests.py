@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import OutgoingEmail
+from core.outbox import load_message
+
+from ..digests import digest_window, send_digests
+from ..models import Follow, Post, User
+
+NOW = datetime(2021, 3, 2, 10, 30, tzinfo=timezone.utc)
+
+
+@override_settings(
+    EMAIL_BACKEND='core.outbox.OutboxEmailBackend',
+    DIGEST_PERIODS={'daily': 24 * 60 * 60})
+class DigestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.readers = [
+            User.objects.create_user(
+                username=f'reader{number}', email=f'r{number}@example.com')
+            for number in range(3)]
+        silent = User.objects.create_user(username='silent')
+        for reader in cls.readers[:2] + [silent]:
+            Follow.objects.create(user=reader, author=cls.author)
+        Follow.objects.create(user=cls.readers[2], author=cls.other)
+        yesterday = datetime(2021, 3, 1, 12, tzinfo=timezone.utc)
+        for author, text in ((cls.author, 'Новость'), (cls.other, 'Другое')):
+            post = Post.objects.create(author=author, text=text)
+            Post.objects.filter(pk=post.pk).update(pub_date=yesterday)
+        old = Post.objects.create(author=cls.author, text='Старое')
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=yesterday - timedelta(days=1))
+
+    def test_window_is_aligned_to_period(self):
+        self.assertEqual(digest_window('daily', NOW), (
+            datetime(2021, 3, 1, tzinfo=timezone.utc),
+            datetime(2021, 3, 2, tzinfo=timezone.utc)))
+
+    def test_one_email_per_reader_rendered_once_per_author_set(self):
+        written, rendered = send_digests('daily', NOW, chunk_size=2)
+        # У silent нет адреса, ему не пишем.
+        self.assertEqual(written, 3)
+        self.assertEqual(rendered, 2)
+        emails = {
+            email.recipients: email
+            for email in OutgoingEmail.objects.all()}
+        self.assertEqual(set(emails), {
+            'r0@example.com', 'r1@example.com', 'r2@example.com'})
+        message = load_message(emails['r0@example.com'].message)
+        self.assertIn('Новость', message.body)
+        self.assertNotIn('Старое', message.body)
+        self.assertNotIn('Другое', message.body)
+        self.assertEqual(message.alternatives[0][1], 'text/html')
+
+    def test_repeat_run_does_not_duplicate(self):
+        send_digests('daily', NOW)
+        written, _ = send_digests('daily', NOW + timedelta(hours=1))
+        self.assertEqual(written, 0)
+        self.assertEqual(OutgoingEmail.objects.count(), 3)
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.contrib.auth.models import User as AuthUser
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import duplicates
+from ..models import DuplicateCluster, Fingerprint, Post, User
+
+SPAM = ('Только сегодня скидка {} процентов на все товары нашего магазина, '
+        'переходите по ссылке и забирайте подарок')
+
+
+class DuplicateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.spammer = User.objects.create_user(username='spammer')
+
+    def test_copies_join_cluster_of_first_text(self):
+        first = Post.objects.create(author=self.spammer, text=SPAM.format(90))
+        copy = Post.objects.create(author=self.spammer, text=SPAM.format(50))
+        other = Post.objects.create(
+            author=self.spammer,
+            text='Сегодня гулял в парке, видел белку, уток и лебедей')
+        Post.objects.create(author=self.spammer, text='Коротко')
+        root = Fingerprint.objects.get(object_id=first.pk)
+        self.assertIsNone(root.cluster)
+        self.assertEqual(
+            Fingerprint.objects.get(object_id=copy.pk).cluster, root)
+        self.assertIsNone(Fingerprint.objects.get(object_id=other.pk).cluster)
+        self.assertEqual(Fingerprint.objects.count(), 3)
+        first.delete()
+        self.assertFalse(
+            Fingerprint.objects.filter(object_id=first.pk).exists())
+
+    def test_deleting_root_promotes_oldest_member(self):
+        posts = [
+            Post.objects.create(author=self.spammer, text=SPAM.format(number))
+            for number in range(4)]
+        root, oldest, *rest = [
+            Fingerprint.objects.get(object_id=post.pk) for post in posts]
+        posts[0].delete()
+        oldest.refresh_from_db()
+        self.assertIsNone(oldest.cluster)
+        self.assertIsNone(oldest.similarity)
+        self.assertEqual(set(oldest.members.all()), set(rest))
+        self.assertEqual(duplicates.cluster_size(oldest.pk), 3)
+
+    def test_form_matches_text_once(self):
+        Post.objects.create(author=self.spammer, text=SPAM.format(1))
+        self.client.force_login(self.spammer)
+        with mock.patch.object(
+                duplicates, 'nearest', wraps=duplicates.nearest) as nearest:
+            self.client.post(
+                reverse('posts:post_create'), {'text': SPAM.format(2)})
+        self.assertEqual(nearest.call_count, 1)
+        copy = Fingerprint.objects.latest('pk')
+        self.assertEqual(copy.object_id, Post.objects.latest('pk').pk)
+        self.assertIsNotNone(copy.cluster)
+
+    @override_settings(SPAM_REJECT_CLUSTER_SIZE=3)
+    def test_burst_rejected_by_forms(self):
+        self.client.force_login(self.spammer)
+        for number in range(3):
+            self.client.post(
+                reverse('posts:post_create'), {'text': SPAM.format(number)})
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': SPAM.format(99)})
+        self.assertFormError(
+            response, 'form', 'text',
+            'Такой текст уже опубликован много раз')
+        self.assertEqual(Post.objects.count(), 3)
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Сегодня гулял в парке, видел белку, уток и лебедей'})
+        self.assertEqual(Post.objects.count(), 4)
+
+    def test_cluster_admin(self):
+        for number in range(3):
+            Post.objects.create(author=self.spammer, text=SPAM.format(number))
+        admin = AuthUser.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_duplicatecluster_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.client.post(
+            reverse('admin:posts_duplicatecluster_changelist'),
+            {'action': 'delete_texts',
+             '_selected_action': DuplicateCluster.objects.filter(
+                 cluster=None).values_list('pk', flat=True)})
+        self.assertFalse(Post.objects.exists())
@@ -0,0 +1,170 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.urls import reverse
+
+from ..caches import followees, subscribed_groups
+from ..follows import follow_authors
+from ..models import Follow, Group, GroupSubscription, Post, User
+
+
+class BulkFollowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)]
+
+    def setUp(self):
+        cache.clear()
+        followees.local.clear()
+        self.client.force_login(self.reader)
+
+    def post(self, action, usernames):
+        return self.client.post(
+            reverse('posts:bulk_follow'),
+            {'action': action, 'author': usernames})
+
+    def test_follow_many_authors_at_once(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        usernames = [author.username for author in self.authors]
+        response = self.post('follow', usernames + ['ghost', 'reader'])
+        self.assertEqual(response.json(), {
+            'action': 'follow', 'changed': 4, 'unknown': ['ghost']})
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(
+            followees.targets(self.reader.pk),
+            {author.pk for author in self.authors})
+
+        response = self.post('unfollow', usernames[:3])
+        self.assertEqual(response.json()['changed'], 3)
+        self.assertFalse(
+            followees.contains(self.reader.pk, self.authors[0].pk))
+
+    def test_follow_counts_new_rows_in_one_insert(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        with self.assertNumQueries(1):
+            created = follow_authors(
+                self.reader, [author.pk for author in self.authors[:3]])
+        self.assertEqual(created, 2)
+
+    def test_stale_cache_does_not_skip_follow(self):
+        author = self.authors[0]
+        stale = mock.patch.multiple(
+            followees, which=mock.Mock(return_value={author.pk}),
+            contains=mock.Mock(return_value=True))
+        with stale:
+            response = self.client.get(
+                reverse('posts:profile_follow', args=(author.username,)))
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=author).exists())
+        self.assertEqual(follow_authors(self.reader, [author.pk]), 0)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.post('follow', []).status_code, 400)
+        self.assertEqual(
+            self.post('block', [self.authors[0].username]).status_code, 400)
+
+    def test_database_forbids_duplicates_and_self_follow(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        for author in (self.authors[0], self.reader):
+            with self.subTest(author=author), self.assertRaises(
+                    IntegrityError), transaction.atomic():
+                Follow.objects.create(user=self.reader, author=author)
+
+
+class FollowListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(60)]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=cls.author) for reader in cls.readers)
+        Follow.objects.create(user=cls.readers[0], author=cls.readers[1])
+
+    def test_followers_by_cursor(self):
+        self.client.force_login(self.readers[0])
+        url = reverse('posts:followers', args=[self.author.username])
+        response = self.client.get(url)
+        first = [user for user, _ in response.context['users']]
+        self.assertEqual(len(first), 50)
+        self.assertEqual(first[0], self.readers[-1])
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(url, {'after': cursor})
+        rest = [user for user, _ in response.context['users']]
+        self.assertEqual(len(rest), 10)
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertIn((self.readers[1], True), response.context['users'])
+        self.assertEqual(set(first + rest), set(self.readers))
+
+    def test_following_page(self):
+        response = self.client.get(
+            reverse('posts:following', args=[self.readers[0].username]))
+        self.assertEqual(
+            [user for user, _ in response.context['users']],
+            [self.readers[1], self.author])
+
+
+class SubscriptionFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(8):
+            # Пост автора в группе подходит под обе подписки.
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Оба {number}')
+            Post.objects.create(author=cls.author, text=f'Автор {number}')
+            Post.objects.create(
+                author=cls.stranger, group=cls.group,
+                text=f'Группа {number}')
+            Post.objects.create(author=cls.stranger, text=f'Чужой {number}')
+
+    def setUp(self):
+        cache.clear()
+        subscribed_groups.local.clear()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        posts, cursor = [], None
+        while True:
+            response = self.client.get(
+                reverse('posts:follow_index'),
+                {'after': cursor} if cursor else {})
+            page_obj = response.context['page_obj']
+            self.assertIs(type(page_obj), Page)
+            posts.extend(page_obj)
+            cursor = page_obj.next_cursor
+            if cursor is None:
+                return posts
+
+    def test_group_subscription_merges_into_feed(self):
+        self.assertEqual(len(self.feed()), 16)
+        response = self.client.get(
+            reverse('posts:group_subscribe', args=[self.group.slug]))
+        self.assertRedirects(
+            response, reverse('posts:group_list', args=[self.group.slug]))
+        self.assertTrue(
+            self.client.get(response.url).context['subscribed'])
+        posts = self.feed()
+        self.assertEqual(len(posts), 24)
+        self.assertEqual(len(set(posts)), 24)
+        self.assertEqual(posts, sorted(
+            posts, key=lambda post: (post.pub_date, post.pk), reverse=True))
+
+        self.client.get(
+            reverse('posts:group_unsubscribe', args=[self.group.slug]))
+        self.assertEqual(len(self.feed()), 16)
+        self.assertFalse(GroupSubscription.objects.exists())
@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..hashtags import extract_mentions, extract_tags
+from ..markup import render
+from ..models import Comment, Mention, Post, TagLink, User
+
+
+def tags_of(post):
+    return set(TagLink.objects.filter(
+        post=post, comment=None).values_list('tag__name', flat=True))
+
+
+class ExtractTests(TestCase):
+    def test_tags_and_mentions(self):
+        text = ('#Django и #джанго, не тег: a#b, @ivan.petrov пишет '
+                '@anna. почта: me@example.com')
+        self.assertEqual(extract_tags(text), {'django', 'джанго'})
+        self.assertEqual(extract_mentions(text), {'ivan.petrov', 'anna'})
+
+    def test_rendered_as_links_outside_code(self):
+        html, _ = render('#tag @anna `#code`')
+        self.assertIn(
+            f'<a href="{reverse("posts:tag_feed", args=("tag",))}">#tag</a>',
+            html)
+        self.assertIn(
+            f'<a href="{reverse("posts:profile", args=("anna",))}">@anna</a>',
+            html)
+        self.assertIn('<code>#code</code>', html)
+
+
+class LinkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.anna = User.objects.create_user(username='anna')
+        cls.boris = User.objects.create_user(username='boris')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def test_links_created_on_save(self):
+        post = Post.objects.create(
+            author=self.author, text='#Один #два @anna @nobody @author')
+        self.assertEqual(tags_of(post), {'один', 'два'})
+        self.assertEqual(
+            list(Mention.objects.values_list('user__username', flat=True)),
+            ['anna'])
+        comment = Comment.objects.create(
+            post=post, author=self.anna, text='#три @boris')
+        self.assertEqual(tags_of(post), {'один', 'два'})
+        self.assertTrue(TagLink.objects.filter(
+            comment=comment, tag__name='три').exists())
+        self.assertTrue(Mention.objects.filter(
+            user=self.boris, comment=comment).exists())
+
+    def test_post_edit_updates_only_changes(self):
+        post = Post.objects.create(author=self.author, text='#a #b @anna')
+        kept = TagLink.objects.get(post=post, tag__name='a')
+        self.client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            {'text': '#a #c @boris'})
+        self.assertEqual(tags_of(post), {'a', 'c'})
+        self.assertTrue(TagLink.objects.filter(pk=kept.pk).exists())
+        self.assertEqual(
+            list(Mention.objects.values_list('user__username', flat=True)),
+            ['boris'])
+
+    def test_tag_feed_and_mentions_inbox(self):
+        posts = [
+            Post.objects.create(author=self.author, text=f'#Лента {number}')
+            for number in range(12)]
+        Post.objects.create(author=self.author, text='без тега @anna')
+        response = self.client.get(reverse('posts:tag_feed', args=('лента',)))
+        self.assertEqual(response.context['posts'], posts[:-11:-1])
+        response = self.client.get(
+            reverse('posts:tag_feed', args=('лента',)),
+            {'after': response.context['page_obj'].next_cursor})
+        self.assertEqual(response.context['posts'], posts[1::-1])
+        self.client.force_login(self.anna)
+        response = self.client.get(reverse('posts:mentions'))
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+    def test_backfill(self):
+        post = Post.objects.create(author=self.author, text='#старый @anna')
+        TagLink.objects.all().delete()
+        Mention.objects.all().delete()
+        call_command('backfill_tags', batch_size=1, stdout=StringIO())
+        call_command('backfill_tags', stdout=StringIO())
+        self.assertEqual(tags_of(post), {'старый'})
+        self.assertEqual(Mention.objects.count(), 1)
@@ -0,0 +1,63 @@
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.events import hub, reset_events
+
+from ..live import ALL_POSTS, author_channel, group_channel
+from ..models import Comment, Follow, Group, Post, User
+
+
+@override_settings(
+    EVENTS_BROADCAST='core.events.LocalBroadcast',
+    EVENTS_HEARTBEAT=0.01, EVENTS_STREAM_TIMEOUT=0.05)
+class NewPostEventsTests(TransactionTestCase):
+    def setUp(self):
+        reset_events()
+        self.addCleanup(reset_events)
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+
+    def test_new_post_is_published_after_commit(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Новый')
+        event, = hub().since(0, {ALL_POSTS})
+        self.assertEqual(event.data, {'post': post.pk})
+        self.assertEqual(event.channels, {
+            ALL_POSTS, author_channel(self.author.pk),
+            group_channel(self.group.pk)})
+
+    def stream(self, **params):
+        response = self.client.get(
+            reverse('posts:new_post_events'), params,
+            HTTP_LAST_EVENT_ID='0')
+        body = b''.join(response.streaming_content).decode()
+        response.close()
+        return body
+
+    def test_follow_scope_counts_followed_posts_only(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Свой')
+        Post.objects.create(author=self.reader, text='Чужой')
+        self.client.force_login(self.reader)
+        self.assertIn('data: {"count": 1}', self.stream(scope='follow'))
+        self.assertIn('data: {"count": 2}', self.stream(scope='all'))
+        self.assertNotIn('data:', self.stream(
+            scope='group', group=self.group.slug))
+
+    def test_follow_scope_needs_login(self):
+        response = self.client.get(
+            reverse('posts:new_post_events'), {'scope': 'follow'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_comment_stream_reports_last_comment(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        response = self.client.get(
+            reverse('posts:comment_events', args=[post.pk]),
+            HTTP_LAST_EVENT_ID='0')
+        body = b''.join(response.streaming_content).decode()
+        response.close()
+        self.assertIn(f'data: {{"last": {comment.pk}}}', body)
@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.loaders import batch_loading
+
+from ..models import Comment, Group, Post, User
+
+
+class BatchLoaderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(5)]
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-')
+            for i in range(3)]
+        cls.posts = [
+            Post.objects.create(
+                author=cls.authors[i % 5], group=cls.groups[i % 3],
+                text=f'Пост {i}')
+            for i in range(10)]
+        for i in range(8):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.authors[i % 5],
+                text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_foreign_keys_resolved_in_one_query_per_model(self):
+        with batch_loading():
+            with self.assertNumQueries(3):
+                for post in Post.objects.all():
+                    post.author.username
+                    post.group.title
+            # Авторы уже загружены выше, догружаются только посты.
+            with self.assertNumQueries(2):
+                for comment in Comment.objects.all():
+                    comment.author.username
+                    comment.post.text
+
+    def test_without_loader_access_stays_lazy(self):
+        with self.assertNumQueries(11):
+            for post in Post.objects.all():
+                post.author.username
+
+    def test_post_detail_query_count_does_not_grow_with_comments(self):
+        client = Client()
+        url = reverse('posts:post_detail', args=(self.posts[0].pk,))
+        client.get(url)
+        with CaptureQueriesContext(connection) as before:
+            client.get(url)
+        for i in range(8):
+            Comment.objects.create(
+                post=self.posts[0], author=self.authors[i % 5],
+                text=f'Ещё комментарий {i}')
+        with CaptureQueriesContext(connection) as after:
+            response = client.get(url)
+        self.assertEqual(len(response.context['comments']), 16)
+        self.assertEqual(len(after), len(before))
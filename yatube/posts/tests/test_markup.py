@@ -0,0 +1,86 @@
+from io import StringIO
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..markup import (clean_html, current_version, escape_hashtag_headings,
+                      markdown, render, render_basic, render_markdown)
+from ..models import Post, User
+
+
+class RenderTests(TestCase):
+    def test_basic_markup(self):
+        html = render_basic(
+            '# Заголовок\n\n**жирный** и *курсив*, `a*b*`\n'
+            'вторая строка\n\n- раз\n- два\n\n> цитата\n\n'
+            '```\n<b>код</b>\n```')
+        self.assertEqual(html, (
+            '<h1>Заголовок</h1>'
+            '<p><strong>жирный</strong> и <em>курсив</em>, '
+            '<code>a*b*</code><br>вторая строка</p>'
+            '<ul><li>раз</li><li>два</li></ul>'
+            '<blockquote><p>цитата</p></blockquote>'
+            '<pre><code>&lt;b&gt;код&lt;/b&gt;</code></pre>'))
+
+    def test_hashtag_at_line_start_is_not_heading(self):
+        self.assertEqual(
+            escape_hashtag_headings(
+                '#tag\n> ##два\n- #три\n# Заголовок\n```\n#код\n```'),
+            '\\#tag\n> \\#\\#два\n- \\#три\n# Заголовок\n```\n#код\n```')
+
+    @skipIf(markdown is None, 'пакет markdown не установлен')
+    def test_renderers_agree_on_hashtags_and_headings(self):
+        texts = (
+            '#tag в начале', '# Заголовок', '> #цитата', '<b>не тег</b>')
+        for text in texts:
+            with self.subTest(text=text):
+                # Python-Markdown разделяет блоки переводами строк.
+                html, _ = clean_html(render_markdown(text).replace('\n', ''))
+                self.assertEqual(html, clean_html(render_basic(text))[0])
+
+    def test_clean_html_keeps_only_safe_markup(self):
+        html, text = clean_html(
+            '<h1 onclick="x()">Т</h1><script>alert(1)</script>'
+            '<a href="javascript:alert(1)">плохая</a> '
+            '<a href="https://example.com" style="x">хорошая</a>'
+            '<img src="x" onerror="y"><p>не закрыт')
+        self.assertEqual(html, (
+            '<h3>Т</h3>плохая '
+            '<a href="https://example.com" rel="nofollow noopener">'
+            'хорошая</a><p>не закрыт</p>'))
+        self.assertEqual(text, 'Т плохая хорошая не закрыт')
+
+    def test_raw_html_in_text_is_escaped(self):
+        html, excerpt = render('<script>alert(1)</script> [ссылка](/about/)')
+        self.assertNotIn('<script>', html)
+        self.assertIn('<a href="/about/" rel="nofollow noopener">', html)
+        self.assertEqual(excerpt, '<script>alert(1)</script> ссылка')
+
+
+class PostMarkupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+
+    def test_rendered_on_save_and_shown_on_post_page(self):
+        post = Post.objects.create(author=self.user, text='Очень **важно**')
+        self.assertEqual(post.text_html, '<p>Очень <strong>важно</strong></p>')
+        self.assertEqual(post.excerpt, 'Очень важно')
+        self.assertEqual(post.markup_version, current_version())
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)))
+        self.assertContains(response, '<strong>важно</strong>')
+
+    def test_rerender_updates_stale_posts_only(self):
+        stale = Post.objects.create(author=self.user, text='*старый*')
+        fresh = Post.objects.create(author=self.user, text='новый')
+        Post.objects.filter(pk=stale.pk).update(
+            text_html='', excerpt='', markup_version='')
+        call_command('rerender_posts', stdout=StringIO())
+        stale.refresh_from_db()
+        self.assertEqual(stale.text_html, '<p><em>старый</em></p>')
+        self.assertEqual(stale.markup_version, current_version())
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.text_html, '<p>новый</p>')
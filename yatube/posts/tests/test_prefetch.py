@@ -0,0 +1,117 @@
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.admission import reset_admission_controller
+from core.prefetch import PREFETCH_ENVIRON, Prefetcher
+
+from ..models import Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class RecordingPrefetcher:
+    def __init__(self):
+        self.paths = []
+
+    def submit(self, func, host, path):
+        self.paths.append(path)
+        return True
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class NextPagePrefetchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='group-slug',
+            description='Тестовое описание',
+        )
+        post = Post(author=cls.user, group=cls.group, text='С картинкой')
+        post.image.save('small.gif', ContentFile(SMALL_GIF))
+        for number in range(10):
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {number}')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        reset_admission_controller()
+        self.prefetcher = RecordingPrefetcher()
+        patches = (
+            mock.patch('core.prefetch.prefetch_enabled', return_value=True),
+            mock.patch(
+                'core.prefetch.prefetcher', return_value=self.prefetcher),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_next_page_scheduled_once(self):
+        self.client.get('/')
+        self.client.get('/group/group-slug/')
+        self.client.get('/')
+        self.client.get('/?page=2')
+        self.assertEqual(
+            self.prefetcher.paths, ['/?page=2', '/group/group-slug/?page=2'])
+
+    def test_prefetch_request_does_not_chain(self):
+        self.client.get('/', **{PREFETCH_ENVIRON: True})
+        self.client.get('/', HTTP_SEC_PURPOSE='prefetch')
+        self.assertEqual(self.prefetcher.paths, [])
+
+    def test_client_cannot_claim_server_prefetch(self):
+        self.client.get('/', HTTP_X_PREFETCH='1', HTTP_YATUBE_PREFETCH='1')
+        self.assertEqual(self.prefetcher.paths, ['/?page=2'])
+
+    def test_prefetched_fragment_keeps_switcher_for_users(self):
+        self.client.get('/', **{PREFETCH_ENVIRON: True})
+        client = Client()
+        client.force_login(self.user)
+        self.assertContains(client.get('/'), reverse('posts:follow_index'))
+
+    def test_hints_include_prefetched_thumbnails(self):
+        self.client.get('/?page=2', **{PREFETCH_ENVIRON: True})
+        response = self.client.get('/')
+        self.assertContains(
+            response, '<link rel="prefetch" href="/?page=2" as="document">')
+        self.assertContains(response, 'as="image"', count=1)
+
+
+class PrefetcherBudgetTests(TestCase):
+    def test_rejects_work_over_budget(self):
+        prefetcher = Prefetcher(workers=1, max_pending=1)
+        started, release = threading.Event(), threading.Event()
+
+        def task():
+            started.set()
+            release.wait(5)
+
+        self.assertTrue(prefetcher.submit(task))
+        started.wait(5)
+        self.assertFalse(prefetcher.submit(task))
+        release.set()
+        prefetcher.executor.shutdown(wait=True)
+        self.assertEqual(prefetcher.pending, 0)
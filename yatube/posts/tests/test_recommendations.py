@@ -0,0 +1,98 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.models import Job
+
+from ..models import Follow, Recommendation, User
+from ..recommendations import FollowGraph, refresh_all, refresh_user
+
+EDGES = [
+    (1, 2), (1, 3),
+    (2, 4), (3, 4), (3, 5),
+    # 6 читает то же, что 1, и ещё 7.
+    (6, 2), (6, 3), (6, 7),
+    (8, 1),
+]
+
+
+@override_settings(
+    RECOMMENDATIONS_WEIGHTS={'friend_of_friend': 1.0, 'co_follow': 1.0})
+class FollowGraphTests(TestCase):
+    def test_friends_of_friends_and_similar_readers(self):
+        graph = FollowGraph(EDGES)
+        self.assertEqual(graph.similar_users(1), [(6, 2 / 6 ** 0.5)])
+        recommended = dict(graph.recommend(1))
+        self.assertEqual(recommended[4], 2)
+        self.assertEqual(recommended[5], 1)
+        self.assertAlmostEqual(recommended[7], 2 / 6 ** 0.5)
+        self.assertEqual([author for author, _ in graph.recommend(1)],
+                         [4, 5, 7])
+
+    def test_skips_followed_authors_and_self(self):
+        graph = FollowGraph(EDGES + [(1, 4), (4, 1)])
+        self.assertNotIn(4, dict(graph.recommend(1)))
+        self.assertNotIn(1, dict(graph.recommend(1)))
+
+    @override_settings(RECOMMENDATIONS_MAX_FANOUT=2)
+    def test_popular_authors_are_left_out_of_similarity(self):
+        graph = FollowGraph(EDGES + [(9, 2), (9, 3)])
+        self.assertEqual(graph.similar_users(1), [])
+
+
+class RecommendationStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            number: User.objects.create_user(username=f'user{number}')
+            for number in range(1, 9)}
+        for user, author in EDGES:
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author])
+
+    def pk_edges(self):
+        return [
+            (self.users[user].pk, self.users[author].pk)
+            for user, author in EDGES]
+
+    def test_neighbourhood_matches_whole_graph(self):
+        user = self.users[1]
+        expected = FollowGraph(self.pk_edges()).recommend(user.pk)
+        self.assertEqual(FollowGraph.around(user.pk).recommend(user.pk),
+                         expected)
+        refresh_user(user.pk)
+        self.assertEqual(
+            list(Recommendation.objects.filter(user=user).values_list(
+                'author_id', 'score')),
+            expected)
+
+    def test_refresh_all_replaces_rows(self):
+        stale = Recommendation.objects.create(
+            user=self.users[7], author=self.users[1], score=1)
+        refresh_all()
+        self.assertFalse(Recommendation.objects.filter(pk=stale.pk).exists())
+        self.assertTrue(
+            Recommendation.objects.filter(user=self.users[1]).exists())
+
+    def test_pages_show_recommendations(self):
+        refresh_all()
+        self.client.force_login(self.users[1])
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', args=[self.users[2].username]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    response.context['recommendations'][0], self.users[4])
+
+
+class FollowSignalTests(TransactionTestCase):
+    def test_follow_queues_one_refresh(self):
+        reader = User.objects.create_user(username='reader')
+        for number in range(3):
+            Follow.objects.create(
+                user=reader,
+                author=User.objects.create_user(username=f'a{number}'))
+        jobs = Job.objects.filter(
+            dedup_key=f'recommendations:{reader.pk}')
+        self.assertEqual(jobs.count(), 1)
@@ -0,0 +1,159 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.tests.s3_stub import S3StubServer
+
+from ..caches import post_cache
+from ..models import Post, User
+from ..storage import ShardedS3Storage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ShardedImageStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.digest = hashlib.sha256(SMALL_GIF).hexdigest()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_upload_goes_to_hash_sharded_path(self):
+        post = Post(author=self.user, text='Тестовый пост')
+        post.image.save('Small.GIF', ContentFile(SMALL_GIF))
+        expected = (
+            f'posts/{self.digest[:2]}/{self.digest[2:4]}/{self.digest}.gif')
+        self.assertEqual(post.image.name, expected)
+        duplicate = Post(author=self.user, text='Тот же файл')
+        duplicate.image.save('copy.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(duplicate.image.name, expected)
+
+    def test_command_migrates_flat_layout(self):
+        legacy = FileSystemStorage().save(
+            'posts/legacy.gif', ContentFile(SMALL_GIF))
+        post = Post.objects.create(
+            author=self.user, text='Старый пост', image=legacy)
+        missing = Post.objects.create(
+            author=self.user, text='Без файла', image='posts/missing.gif')
+        post_cache.get(pk=post.pk)
+        call_command(
+            'shard_post_images', batch_size=1, delete_originals=True,
+            stdout=io.StringIO())
+        self.assertEqual(
+            post_cache.get(pk=post.pk).image.name,
+            Post.objects.get(pk=post.pk).image.name)
+        post.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertTrue(post.image.name.endswith(f'/{self.digest}.gif'))
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertFalse(os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, legacy)))
+        self.assertEqual(missing.image.name, 'posts/missing.gif')
+
+    @override_settings(POST_IMAGE_STORAGE='posts.storage.ShardedS3Storage')
+    def test_backend_switch_needs_no_migration(self):
+        storage = Post._meta.get_field('image').storage
+        self.assertIsInstance(storage.backend, ShardedS3Storage)
+        call_command(
+            'makemigrations', 'posts', check=True, dry_run=True,
+            stdout=io.StringIO())
+
+
+class DirectUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.stub = S3StubServer().__enter__()
+        cls.settings_override = override_settings(
+            POST_IMAGE_STORAGE='posts.storage.ShardedS3Storage',
+            **cls.stub.settings())
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.stub.__exit__(None, None, None)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_browser_uploads_to_storage_and_form_submits_key(self):
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        ticket = self.authorized_client.post(
+            reverse('posts:image_upload'),
+            {'name': 'small.gif', 'sha256': digest}).json()
+        upload = ticket['upload']
+        response = requests.request(
+            upload['method'], upload['url'], data=SMALL_GIF,
+            headers=upload['headers'])
+        self.assertEqual(response.status_code, 200)
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост с картинкой', 'image_key': ticket['key']})
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(post.image.name, ticket['key'])
+        repeated = self.authorized_client.post(
+            reverse('posts:image_upload'),
+            {'name': 'again.gif', 'sha256': digest}).json()
+        self.assertIsNone(repeated['upload'])
+
+    def test_unknown_key_is_rejected(self):
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Чужой ключ', 'image_key': 'posts/' + '0' * 64})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Post.objects.filter(text='Чужой ключ').exists())
+
+    def upload(self, name, data):
+        ticket = self.authorized_client.post(
+            reverse('posts:image_upload'),
+            {'name': name, 'sha256': hashlib.sha256(data).hexdigest()}).json()
+        upload = ticket['upload']
+        if upload is not None:
+            requests.request(
+                upload['method'], upload['url'], data=data,
+                headers=upload['headers'])
+        return ticket['key']
+
+    def test_uploaded_object_must_be_an_image(self):
+        key = self.upload('fake.gif', b'<script>alert(1)</script>')
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост с подделкой', 'image_key': key})
+        self.assertIn('image_key', response.context['form'].errors)
+        self.assertFalse(Post.objects.filter(text='Пост с подделкой').exists())
+
+    @override_settings(POST_IMAGE_MAX_SIZE=10)
+    def test_uploaded_image_size_is_limited(self):
+        key = self.upload('big.gif', SMALL_GIF)
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Большая картинка', 'image_key': key})
+        self.assertIn('image_key', response.context['form'].errors)
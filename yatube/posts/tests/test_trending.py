@@ -0,0 +1,129 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.jobs import schedule_periodic
+from core.models import Job
+
+from ..models import Comment, Follow, Group, GroupTrend, Post, PostTrend, User
+from ..tasks import update_trending_scores
+from ..trending import current_score, trending_posts, update_trending
+
+
+@override_settings(
+    TRENDING_WEIGHTS={'comment': 3, 'follow': 5, 'view': 1},
+    TRENDING_HALF_LIFE=60 * 60,
+    TRENDING_MIN_SCORE=0.01)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='group-slug', description='-')
+        cls.quiet = Post.objects.create(author=cls.reader, text='Тихий')
+        cls.hot = Post.objects.create(
+            author=cls.author, group=cls.group, text='Горячий')
+
+    def comment(self, post, at):
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        Comment.objects.filter(pk=comment.pk).update(created=at)
+
+    def test_ranks_by_decayed_events(self):
+        now = timezone.now()
+        self.comment(self.hot, now - timedelta(minutes=5))
+        self.comment(self.hot, now - timedelta(hours=2))
+        self.comment(self.quiet, now - timedelta(minutes=1))
+        update_trending(now)
+        hot = PostTrend.objects.get(post=self.hot)
+        self.assertAlmostEqual(
+            current_score(hot.score, now),
+            3 * 0.5 ** (5 / 60) + 3 * 0.5 ** 2)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.hot, self.quiet])
+
+    def test_incremental_update_matches_full_recompute(self):
+        start = timezone.now() - timedelta(hours=1)
+        self.comment(self.hot, start - timedelta(minutes=10))
+        update_trending(start)
+        self.comment(self.hot, start + timedelta(minutes=20))
+        Follow.objects.create(
+            user=self.reader, author=self.author,
+            created=start + timedelta(minutes=30))
+        now = start + timedelta(hours=1)
+        update_trending(now)
+        update_trending(now)
+        incremental = PostTrend.objects.get(post=self.hot).score
+
+        PostTrend.objects.all().delete()
+        GroupTrend.objects.all().delete()
+        update_trending(now)
+        self.assertAlmostEqual(
+            PostTrend.objects.get(post=self.hot).score, incremental)
+        self.assertAlmostEqual(
+            GroupTrend.objects.get(group=self.group).score, incremental)
+
+    def test_first_update_does_not_credit_old_views(self):
+        now = timezone.now()
+        Post.objects.filter(pk=self.hot.pk).update(views=1000)
+        update_trending(now)
+        trend = PostTrend.objects.get(post=self.hot)
+        self.assertEqual(trend.views_seen, 1000)
+        self.assertFalse(trending_posts().exists())
+        Post.objects.filter(pk=self.hot.pk).update(views=1004)
+        later = now + timedelta(minutes=5)
+        update_trending(later)
+        trend.refresh_from_db()
+        self.assertEqual(trend.views_seen, 1004)
+        self.assertAlmostEqual(
+            current_score(trend.score, later), 4, delta=0.01)
+
+    def test_prunes_faded_and_old_posts(self):
+        now = timezone.now()
+        self.comment(self.hot, now - timedelta(minutes=1))
+        self.comment(self.quiet, now - timedelta(minutes=1))
+        Post.objects.filter(pk=self.quiet.pk).update(
+            pub_date=now - timedelta(days=30))
+        update_trending(now)
+        self.assertFalse(PostTrend.objects.filter(post=self.quiet).exists())
+        # Через сутки три балла затухают ниже порога: группа удаляется,
+        # а пост в окне лишь пропадает из «Популярного».
+        later = now + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            stats = update_trending(later)
+            self.assertEqual(stats['pruned'], 1)
+            self.assertFalse(trending_posts().exists())
+        self.assertTrue(PostTrend.objects.filter(post=self.hot).exists())
+        stats = update_trending(now + timedelta(days=8))
+        self.assertEqual(stats['pruned'], 1)
+        self.assertFalse(PostTrend.objects.exists())
+
+    def test_faded_post_keeps_seen_views(self):
+        now = timezone.now()
+        Post.objects.filter(pk=self.hot.pk).update(views=1000)
+        update_trending(now)
+        later = now + timedelta(days=3)
+        update_trending(later)
+        trend = PostTrend.objects.get(post=self.hot)
+        self.assertEqual(trend.views_seen, 1000)
+        self.assertLess(
+            current_score(trend.score, later), settings.TRENDING_MIN_SCORE)
+
+    def test_popular_groups_page(self):
+        self.comment(self.hot, timezone.now())
+        update_trending()
+        response = self.client.get(reverse('posts:popular_groups'))
+        self.assertEqual(list(response.context['groups']), [self.group])
+
+    def test_periodic_task_is_scheduled_once_per_slot(self):
+        first = schedule_periodic(update_trending_scores, 300)
+        second = schedule_periodic(update_trending_scores, 300)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(first.run_at.timestamp() % 300, 0)
+        self.assertEqual(Job.objects.count(), 1)
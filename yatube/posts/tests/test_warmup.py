@@ -0,0 +1,83 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.degradation import load_snapshot, snapshot_key
+
+from ..models import Follow, Group, Post, User
+from ..warmup import POPULAR, top_authors, top_groups, warm_caches
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class WarmCachesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='group-slug',
+            description='Тестовое описание',
+        )
+        for number in range(12):
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {number}')
+        post = Post(author=cls.reader, text='Пост с картинкой')
+        post.image.save('small.gif', ContentFile(SMALL_GIF))
+        Follow.objects.create(user=cls.user, author=cls.reader)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_renders_pages_through_views(self):
+        report = warm_caches(workers=1)
+        self.assertEqual(report.failed, [])
+        # Две страницы главной, одна группа, два профиля.
+        self.assertEqual(report.pages, 5)
+        self.assertEqual(len(report.posts), 13)
+        self.assertEqual(report.coverage(), 1.0)
+        self.assertEqual(len(report.thumbnails), 1)
+        factory = RequestFactory()
+        for path in ('/?page=1', '/group/group-slug/', '/profile/reader/'):
+            with self.subTest(path=path):
+                key = snapshot_key(factory.get(path))
+                self.assertIsNotNone(load_snapshot(key))
+
+    def test_popular_pages_ranked_by_views(self):
+        Post.objects.filter(author=self.reader).update(views=100)
+        Post.objects.filter(author=self.user).update(views=5)
+        self.assertEqual(
+            [author.username for author in top_authors(2, POPULAR)],
+            ['reader', 'auth'])
+        Group.objects.create(title='Пустая', slug='empty')
+        self.assertEqual(top_groups(2, POPULAR), [self.group])
+
+    def test_command_reports_coverage(self):
+        out = io.StringIO()
+        call_command(
+            'warm_caches', '--index-pages=1', '--groups=0', '--profiles=0',
+            '--workers=1', stdout=out)
+        self.assertIn('страниц 1 из 1', out.getvalue())
+        self.assertIn('постов на них 10 (77% от всех)', out.getvalue())
@@ -0,0 +1,10 @@
+from sorl.thumbnail import get_thumbnail
+
+# Те же параметры, что у {% thumbnail %} в шаблонах ленты.
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def post_thumbnail(image):
+    return get_thumbnail(
+        image, POST_THUMBNAIL_GEOMETRY, **POST_THUMBNAIL_OPTIONS)
@@ -0,0 +1,190 @@
+"""Рейтинг «Популярного»: посты и группы по затухающей сумме событий.
+
+Вклад события — вес (``TRENDING_WEIGHTS``), который убывает вдвое за
+``TRENDING_HALF_LIFE`` секунд. Хранится логарифм суммы вкладов,
+приведённых к фиксированной эпохе: затухание со временем одинаково для
+всех строк, поэтому порядок по ``score`` верен без пересчёта, а новые
+события просто прибавляются. Периодическая задача берёт только события
+с прошлого пересчёта:
+
+* комментарии к посту;
+* новые подписчики автора — всем его постам за ``TRENDING_WINDOW``;
+* прирост просмотров с прошлого пересчёта.
+
+Рейтинг группы — сумма вкладов её постов.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, GroupTrend, Post, PostTrend
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def decay_rate():
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def log_weight(weight, at):
+    """Логарифм вклада события веса ``weight``, случившегося в ``at``."""
+    return math.log(weight) + decay_rate() * (at - EPOCH).total_seconds()
+
+
+def log_sum(values):
+    """``log(sum(exp(v)))`` без переполнения."""
+    values = list(values)
+    top = max(values)
+    return top + math.log(sum(math.exp(value - top) for value in values))
+
+
+def current_score(score, now=None):
+    """Значение рейтинга на момент ``now`` из хранимого логарифма."""
+    now = now or timezone.now()
+    return math.exp(score - decay_rate() * (now - EPOCH).total_seconds())
+
+
+def post_contributions(since, now):
+    """Вклады новых событий по постам: ``{pk: [логарифмы вкладов]}``."""
+    weights = settings.TRENDING_WEIGHTS
+    recent = now - timedelta(seconds=settings.TRENDING_WINDOW)
+    contributions = defaultdict(list)
+    comments = Comment.objects.filter(
+        created__gt=since, created__lte=now, post__pub_date__gte=recent,
+    ).values_list('post_id', 'created')
+    for post_id, created in comments:
+        contributions[post_id].append(log_weight(weights['comment'], created))
+
+    follows = defaultdict(list)
+    for author_id, created in Follow.objects.filter(
+            created__gt=since, created__lte=now,
+    ).values_list('author_id', 'created'):
+        follows[author_id].append(created)
+    if follows:
+        posts = Post.objects.filter(
+            author_id__in=follows, pub_date__gte=recent,
+        ).values_list('pk', 'author_id')
+        for post_id, author_id in posts:
+            contributions[post_id].extend(
+                log_weight(weights['follow'], created)
+                for created in follows[author_id])
+
+    views = {}
+    viewed = Post.objects.filter(pub_date__gte=recent).filter(
+        Q(trend__isnull=True, views__gt=0)
+        | Q(views__gt=F('trend__views_seen')),
+    ).values_list('pk', 'views', 'trend__views_seen')
+    for post_id, total, seen in viewed:
+        contributions[post_id].append(
+            log_weight(weights['view'] * (total - (seen or 0)), now))
+        views[post_id] = total
+    return contributions, views
+
+
+def last_update():
+    dates = [
+        model.objects.aggregate(last=Max('updated'))['last']
+        for model in (PostTrend, GroupTrend)]
+    dates = [date for date in dates if date is not None]
+    return max(dates) if dates else None
+
+
+def seed_views(window_start):
+    """Первый пересчёт: просмотры постов из окна считаются уже учтёнными.
+
+    Иначе все накопленные за жизнь поста просмотры пришли бы в рейтинг
+    одним всплеском. Строки получают рейтинг ниже порога.
+    """
+    score = log_weight(settings.TRENDING_MIN_SCORE, window_start)
+    PostTrend.objects.bulk_create([
+        PostTrend(post_id=post_id, score=score, views_seen=views,
+                  updated=window_start)
+        for post_id, views in Post.objects.filter(
+            pub_date__gte=window_start, views__gt=0,
+        ).values_list('pk', 'views')], batch_size=500)
+
+
+def update_trending(now=None):
+    """Добавляет к рейтингам события с прошлого пересчёта."""
+    now = now or timezone.now()
+    window_start = now - timedelta(seconds=settings.TRENDING_WINDOW)
+    last = last_update()
+    if last is None:
+        seed_views(window_start)
+    since = max(last or window_start, window_start)
+    contributions, views = post_contributions(since, now)
+
+    post_trends = PostTrend.objects.in_bulk(list(contributions))
+    post_groups = dict(
+        Post.objects.filter(pk__in=list(contributions), group__isnull=False)
+        .values_list('pk', 'group_id'))
+    created, changed = [], []
+    group_contributions = defaultdict(list)
+    for post_id, parts in contributions.items():
+        added = log_sum(parts)
+        trend = post_trends.get(post_id)
+        if trend is None:
+            trend = PostTrend(post_id=post_id, score=added)
+            created.append(trend)
+        else:
+            trend.score = log_sum((trend.score, added))
+            changed.append(trend)
+        trend.updated = now
+        trend.views_seen = views.get(post_id, trend.views_seen)
+        if post_id in post_groups:
+            group_contributions[post_groups[post_id]].append(added)
+
+    group_trends = GroupTrend.objects.in_bulk(list(group_contributions))
+    new_groups, changed_groups = [], []
+    for group_id, parts in group_contributions.items():
+        added = log_sum(parts)
+        trend = group_trends.get(group_id)
+        if trend is None:
+            new_groups.append(
+                GroupTrend(group_id=group_id, score=added, updated=now))
+        else:
+            trend.score = log_sum((trend.score, added))
+            trend.updated = now
+            changed_groups.append(trend)
+
+    # Посты старше окна и группы, чей рейтинг затух ниже
+    # TRENDING_MIN_SCORE, из таблиц убираются, чтобы они оставались
+    # компактными. Затухший пост в окне остаётся: без views_seen его
+    # просмотры посчитались бы заново как всплеск.
+    threshold = min_score(now)
+    with transaction.atomic():
+        PostTrend.objects.bulk_create(created)
+        PostTrend.objects.bulk_update(
+            changed, ['score', 'views_seen', 'updated'], batch_size=500)
+        GroupTrend.objects.bulk_create(new_groups)
+        GroupTrend.objects.bulk_update(
+            changed_groups, ['score', 'updated'], batch_size=500)
+        pruned, _ = PostTrend.objects.filter(
+            post__pub_date__lt=window_start).delete()
+        pruned_groups, _ = GroupTrend.objects.filter(
+            score__lt=threshold).delete()
+    return {
+        'posts': len(contributions),
+        'groups': len(group_contributions),
+        'pruned': pruned + pruned_groups,
+    }
+
+
+def min_score(now=None):
+    """Хранимый рейтинг, ниже которого пост или группа не популярны."""
+    return log_weight(settings.TRENDING_MIN_SCORE, now or timezone.now())
+
+
+def trending_posts(limit=None):
+    return Post.objects.filter(trend__score__gte=min_score()).order_by(
+        '-trend__score')[:limit or settings.TRENDING_SIZE]
+
+
+def trending_groups(limit=None):
+    return Group.objects.filter(trend__isnull=False).order_by(
+        '-trend__score')[:limit or settings.POPULAR_GROUPS_SIZE]
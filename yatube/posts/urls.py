@@ -7,12 +7,23 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_list, name='group_list'),
+    path('group/<slug:slug>/subscribe/',
+         views.group_subscribe, name='group_subscribe'),
+    path('group/<slug:slug>/unsubscribe/',
+         views.group_unsubscribe, name='group_unsubscribe'),
+    path('trending/', views.trending, name='trending'),
+    path('groups/popular/', views.popular_groups, name='popular_groups'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('create/image/', views.image_upload, name='image_upload'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.comment_list, name='comment_list'),
+    path('posts/<int:post_id>/comments/events/',
+         views.comment_events, name='comment_events'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -24,5 +35,19 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/followers/',
+        views.followers,
+        name='followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.following,
+        name='following'
+    ),
+    path('follow/bulk/', views.bulk_follow, name='bulk_follow'),
+    path('tag/<str:tag>/', views.tag_feed, name='tag_feed'),
+    path('mentions/', views.mentions, name='mentions'),
+    path('events/posts/', views.new_post_events, name='new_post_events'),
 
 ]
@@ -1,40 +1,95 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
 
+from core.events import broadcast, hub, sse_response
+from core.object_cache import get_cached_object_or_404
+from core.paginator import (KeysetPaginator, TableRowEstimate,
+                            WindowedPaginator)
+from core.prefetch import is_prefetch_request, save_hints, schedule_prefetch
+
+from .caches import (followees, group_cache, group_post_counts, post_cache,
+                     post_views, subscribed_groups, user_cache)
+from .comments import (comments_after, comments_before, latest_comments,
+                       render_comments)
+from .follows import (follow_authors, resolve_authors, subscribe_group,
+                      subscription_feed, unfollow_authors, unsubscribe_group)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .hashtags import update_post_links
+from .live import (ALL_POSTS, comments_channel, count_posts,
+                   follow_channels, group_channel, last_comment)
+from .models import Follow, Mention, Post, TagLink
+from .recommendations import recommended_authors
+from .storage import direct_upload_ticket, supports_direct_upload
+from .tasks import generate_post_thumbnail
+from .thumbnails import post_thumbnail
+from .trending import trending_groups, trending_posts
 
 posts_in_page = 10
+users_in_page = 50
+
+
+def prefetch_next_page(request, page_obj):
+    """Готовит в фоне следующую страницу ленты."""
+    if is_prefetch_request(request):
+        # Миниатюры упреждённой страницы попадут в подсказки rel=prefetch.
+        save_hints(request, [
+            post_thumbnail(post.image).url
+            for post in page_obj if post.image])
+    if page_obj.has_next():
+        schedule_prefetch(
+            request, f'{request.path}?page={page_obj.next_page_number()}')
 
 
 def index(request):
     template = 'posts/index.html'
     posts = Post.objects.all()
-    paginator = Paginator(posts, posts_in_page)
+    paginator = WindowedPaginator(
+        posts, posts_in_page, counter=TableRowEstimate(Post))
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    prefetch_next_page(request, page_obj)
     context = {'page_obj': page_obj}
     return render(request, template, context)
 
 
 def group_list(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = get_cached_object_or_404(group_cache, slug=slug)
     posts = group.posts.all()
-    paginator = Paginator(posts, posts_in_page)
+    paginator = WindowedPaginator(
+        posts, posts_in_page, counter=group_post_counts.of(group.pk))
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    prefetch_next_page(request, page_obj)
     template = 'posts/group_list.html'
-    context = {'group': group, 'page_obj': page_obj
-               }
+    context = {'group': group, 'page_obj': page_obj,
+               'subscribed': subscribed_groups.contains(
+                   request.user.pk, group.pk)}
     return render(request, template, context)
 
 
+def trending(request):
+    # Рейтинг уже посчитан update_trending: это одно чтение первых
+    # TRENDING_SIZE строк по индексу score.
+    paginator = Paginator(trending_posts(), posts_in_page)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    context = {'page_obj': page_obj}
+    return render(request, 'posts/trending.html', context)
+
+
+def popular_groups(request):
+    context = {'groups': trending_groups()}
+    return render(request, 'posts/popular_groups.html', context)
+
+
 def profile(request, username):
-    author = User.objects.get(username=username)
+    author = get_cached_object_or_404(user_cache, username=username)
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
+        following = followees.contains(request.user.pk, author.pk)
     else:
         following = None
     posts_from_author = author.posts.all()
@@ -43,35 +98,56 @@ def profile(request, username):
     page_obj = paginator.get_page(page_number)
     context = {'posts': posts_from_author, 'author': author,
                'count': author.posts.all().count(), 'page_obj': page_obj,
-               'following': following}
+               'following': following,
+               'recommendations': recommended_authors(request.user)}
     return render(request, 'posts/profile.html', context)
 
 
 @login_required
 def add_comment(request, post_id):
-    post = Post.objects.get(pk=post_id)
+    post = get_cached_object_or_404(post_cache, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
         comment.save()
+        if wants_json(request):
+            comment_data, = render_comments([comment])
+            return JsonResponse(comment_data, status=201)
+    elif wants_json(request):
+        return JsonResponse({'errors': form.errors}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def wants_json(request):
+    return 'application/json' in request.META.get('HTTP_ACCEPT', '')
+
+
 def post_detail(request, post_id):
     form = CommentForm()
-    post = Post.objects.get(pk=post_id)
-    author = User.objects.get(pk=post.author_id)
-    comments = post.comments.all()
+    post = get_cached_object_or_404(post_cache, pk=post_id)
+    author = user_cache.get(pk=post.author_id)
+    post.author = author
+    if not is_prefetch_request(request):
+        post_views.increment(post.pk)
+    comments, has_earlier = latest_comments(post.pk)
     context = {
         'post': post,
+        'views': post.views + post_views.pending(post.pk),
         'count': author.posts.all().count(),
         'form': form,
-        'comments': comments}
+        'comments': comments,
+        'has_earlier_comments': has_earlier}
     return render(request, 'posts/post_detail.html', context)
 
 
+def queue_thumbnail(post):
+    if post.image:
+        generate_post_thumbnail.enqueue(
+            args=(post.pk,), dedup_key=f'thumbnail:{post.pk}')
+
+
 @login_required()
 def post_create(request):
     if request.method == 'POST':
@@ -84,6 +160,7 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             form.save()
+            queue_thumbnail(post)
             return redirect('posts:profile', post.author.username)
     else:
         form = PostForm(initial={'author': request.user})
@@ -93,19 +170,26 @@ def post_create(request):
 
 @login_required()
 def post_edit(request, post_id):
-    post = Post.objects.get(pk=post_id)
+    post = get_cached_object_or_404(post_cache, pk=post_id)
     is_edit = True
     if post.author != request.user:
         return redirect('users:login')
     else:
         if request.method == 'POST':
+            # Форма меняет пост уже при проверке.
+            old_text = post.text
             form = PostForm(
                 request.POST or None,
                 files=request.FILES or None,
                 instance=post
             )
             if form.is_valid():
-                form.save()
+                post = form.save(commit=False)
+                # Просмотры в кешированной копии устарели: их пишет
+                # post_views, а форма их не меняет.
+                post.save(update_fields=PostForm.Meta.fields)
+                update_post_links(post, old_text)
+                queue_thumbnail(post)
                 return redirect('posts:post_detail', post.pk)
         else:
             form = PostForm(instance=post)
@@ -113,31 +197,36 @@ def post_edit(request, post_id):
         return render(request, 'posts/create.html', context)
 
 
+@login_required
+@require_POST
+def image_upload(request):
+    storage = Post._meta.get_field('image').storage
+    if not supports_direct_upload(storage):
+        raise Http404
+    ticket = direct_upload_ticket(
+        storage, request.POST.get('name', ''), request.POST.get('sha256', ''))
+    if ticket is None:
+        return JsonResponse(
+            {'error': 'Недопустимое имя файла или хеш'}, status=400)
+    return JsonResponse(ticket)
+
+
 @login_required
 def follow_index(request):
-    posts = (
-        Post.objects.filter(
-            author__following__user=request.user
-        )
-    )
-    paginator = Paginator(posts, posts_in_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'page_obj': page_obj}
+    posts = subscription_feed(request.user)
+    paginator = KeysetPaginator(
+        posts, posts_in_page, ordering=('-pub_date', '-pk'))
+    page_obj = paginator.get_page(request.GET.get('after'))
+    context = {'page_obj': page_obj,
+               'recommendations': recommended_authors(request.user)}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    user = get_object_or_404(User,
-                             username=username)
-    if request.user == user or Follow.objects.filter(
-            author=user).exists():
+    user = get_cached_object_or_404(user_cache, username=username)
+    if request.user == user or not follow_authors(request.user, [user.pk]):
         return redirect('posts:index')
-    else:
-        Follow.objects.create(
-            user=request.user,
-            author=user)
     return redirect('posts:follow_index')
 
 
@@ -145,6 +234,151 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     Follow.objects.filter(
         user=request.user,
-        author=get_object_or_404(User,
-                                 username=username)).delete()
+        author=get_cached_object_or_404(
+            user_cache, username=username)).delete()
     return redirect('posts:index')
+
+
+def tag_feed(request, tag):
+    links = TagLink.objects.filter(
+        tag__name=tag.lower(), comment=None,
+    ).select_related('post__author', 'post__group')
+    paginator = KeysetPaginator(
+        links, posts_in_page, ordering=('-pub_date', '-pk'))
+    page_obj = paginator.get_page(request.GET.get('after'))
+    context = {
+        'tag': tag.lower(),
+        'page_obj': page_obj,
+        'posts': [link.post for link in page_obj]}
+    return render(request, 'posts/tag_feed.html', context)
+
+
+@login_required
+def mentions(request):
+    paginator = KeysetPaginator(
+        Mention.objects.filter(user=request.user).select_related(
+            'post__author', 'comment__author'),
+        posts_in_page, ordering=('-created', '-pk'))
+    page_obj = paginator.get_page(request.GET.get('after'))
+    return render(request, 'posts/mentions.html', {'page_obj': page_obj})
+
+
+def follow_list(request, author, follows, side, title):
+    paginator = KeysetPaginator(
+        follows.select_related(side), users_in_page,
+        ordering=('-created', '-pk'))
+    page_obj = paginator.get_page(request.GET.get('after'))
+    users = [getattr(follow, side) for follow in page_obj]
+    followed = followees.which(request.user.pk, [user.pk for user in users])
+    context = {
+        'author': author,
+        'title': title,
+        'page_obj': page_obj,
+        'users': [(user, user.pk in followed) for user in users]}
+    return render(request, 'posts/follow_list.html', context)
+
+
+def followers(request, username):
+    author = get_cached_object_or_404(user_cache, username=username)
+    return follow_list(
+        request, author, Follow.objects.filter(author=author), 'user',
+        'Подписчики')
+
+
+def following(request, username):
+    author = get_cached_object_or_404(user_cache, username=username)
+    return follow_list(
+        request, author, Follow.objects.filter(user=author), 'author',
+        'Подписки')
+
+
+@login_required
+@require_POST
+def bulk_follow(request):
+    usernames = request.POST.getlist('author')
+    action = request.POST.get('action', 'follow')
+    if (
+        action not in ('follow', 'unfollow')
+        or not 0 < len(usernames) <= settings.FOLLOW_BULK_LIMIT
+    ):
+        return JsonResponse(
+            {'error': 'Нужно действие follow или unfollow и от 1 до '
+                      f'{settings.FOLLOW_BULK_LIMIT} авторов'},
+            status=400)
+    authors = resolve_authors(usernames)
+    if action == 'follow':
+        changed = follow_authors(request.user, authors.values())
+    else:
+        changed = unfollow_authors(request.user, authors.values())
+    return JsonResponse({
+        'action': action,
+        'changed': changed,
+        'unknown': sorted(set(usernames) - set(authors))})
+
+
+@login_required
+def group_subscribe(request, slug):
+    group = get_cached_object_or_404(group_cache, slug=slug)
+    subscribe_group(request.user, group)
+    return redirect('posts:group_list', slug)
+
+
+@login_required
+def group_unsubscribe(request, slug):
+    group = get_cached_object_or_404(group_cache, slug=slug)
+    unsubscribe_group(request.user, group)
+    return redirect('posts:group_list', slug)
+
+
+def new_post_events(request):
+    """Поток SSE «появились новые посты» для ленты ``scope``."""
+    scope = request.GET.get('scope', 'all')
+    if scope == 'group':
+        group = get_cached_object_or_404(
+            group_cache, slug=request.GET.get('group', ''))
+        channels = [group_channel(group.pk)]
+    elif scope == 'follow' and request.user.is_authenticated:
+        channels = follow_channels(request.user)
+    elif scope == 'all':
+        channels = [ALL_POSTS]
+    else:
+        raise Http404
+    return sse_response(request, channels, 'new-posts', count_posts)
+
+
+def comment_list(request, post_id):
+    """Комментарии после ``after`` или до ``before`` в JSON.
+
+    С ``wait=1`` и без новых комментариев ответ ждёт их до
+    ``COMMENTS_LONG_POLL_TIMEOUT`` секунд — для браузеров без SSE.
+    """
+    post = get_cached_object_or_404(post_cache, pk=post_id)
+    try:
+        after = int(request.GET.get('after', 0))
+        before = request.GET.get('before')
+        before = None if before is None else int(before)
+    except ValueError:
+        return JsonResponse({'error': 'after и before — id'}, status=400)
+    if before is not None:
+        return JsonResponse(
+            {'comments': render_comments(comments_before(post.pk, before))})
+    events = hub()
+    broadcast().start()
+    seen = events.last_id
+    comments = comments_after(post.pk, after)
+    if not comments and request.GET.get('wait') and events.acquire():
+        # Ожидание занимает место потока событий, как SSE.
+        try:
+            if events.wait(
+                    seen, {comments_channel(post.pk)},
+                    settings.COMMENTS_LONG_POLL_TIMEOUT):
+                comments = comments_after(post.pk, after)
+        finally:
+            events.release()
+    return JsonResponse({'comments': render_comments(comments)})
+
+
+def comment_events(request, post_id):
+    post = get_cached_object_or_404(post_cache, pk=post_id)
+    return sse_response(
+        request, [comments_channel(post.pk)], 'comments', last_comment)
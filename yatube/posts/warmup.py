@@ -0,0 +1,166 @@
+"""Прогрев кешей после выката.
+
+Страницы рендерятся через настоящие view со всеми middleware, поэтому
+заполняются те же кеши, что и при обычных запросах: фрагменты ленты,
+кеш объектов, снимки для деградации и хранилище миниатюр sorl.
+``LocMemCache`` свой у каждого процесса, так что при нём прогревать
+нужно внутри процесса сервера (``WARM_CACHES_ON_START``), а команда
+``warm_caches`` полезна с общим кешем (memcached, redis) и для файлов
+миниатюр.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max, Sum
+from django.urls import reverse
+
+from core.prefetch import LocalClient
+
+from .models import Group, Post, User
+from .thumbnails import post_thumbnail
+from .views import posts_in_page
+
+logger = logging.getLogger(__name__)
+
+RECENT = 'recent'
+POPULAR = 'popular'
+
+
+class WarmupReport:
+    def __init__(self):
+        self.pages = 0
+        self.failed = []
+        self.posts = set()
+        self.thumbnails = set()
+        self.duration = 0.0
+
+    def coverage(self):
+        """Доля постов, попавших на прогретые страницы."""
+        total = Post.objects.count()
+        return len(self.posts) / total if total else 1.0
+
+    def summary(self):
+        return (
+            f'страниц {self.pages - len(self.failed)} из {self.pages}, '
+            f'постов на них {len(self.posts)} '
+            f'({self.coverage():.0%} от всех), '
+            f'миниатюр {len(self.thumbnails)}, '
+            f'время {self.duration:.2f} с')
+
+
+def traffic_rank(order):
+    """Популярность — сумма просмотров постов, свежесть — последний пост."""
+    if order == POPULAR:
+        return Sum('posts__views')
+    return Max('posts__pub_date')
+
+
+def top_groups(limit, order=RECENT):
+    # Без постов rank пуст: такие группы прогревать незачем.
+    return list(
+        Group.objects.annotate(rank=traffic_rank(order))
+        .filter(rank__isnull=False)
+        .order_by('-rank', 'pk')[:limit])
+
+
+def top_authors(limit, order=RECENT):
+    rank = traffic_rank(order)
+    authors = User.objects.filter(
+        pk__in=Post.objects.values('author_id'))
+    return list(authors.annotate(rank=rank).order_by('-rank', 'pk')[:limit])
+
+
+def warmup_targets(index_pages, groups, profiles, order=RECENT):
+    """Пары (адрес страницы, посты на ней) для прогрева."""
+    targets = []
+    # Несуществующие страницы отдали бы ту же последнюю.
+    index_pages = min(index_pages, -(-Post.objects.count() // posts_in_page))
+    for page in range(1, max(index_pages, 1) + 1):
+        start = (page - 1) * posts_in_page
+        posts = Post.objects.all()[start:start + posts_in_page]
+        targets.append((f"{reverse('posts:index')}?page={page}", posts))
+    for group in top_groups(groups, order):
+        targets.append((
+            reverse('posts:group_list', args=[group.slug]),
+            group.posts.all()[:posts_in_page]))
+    for author in top_authors(profiles, order):
+        targets.append((
+            reverse('posts:profile', args=[author.username]),
+            author.posts.all()[:posts_in_page]))
+    return targets
+
+
+class Warmer:
+    def __init__(self, host=None):
+        self.client = LocalClient(host)
+
+    def render(self, path):
+        response = self.client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f'ответ {response.status_code}')
+
+    def warm(self, path, posts):
+        """Рендерит страницу и делает миниатюры её постов."""
+        self.render(path)
+        posts = list(posts)
+        with_images = [post for post in posts if post.image]
+        for post in with_images:
+            post_thumbnail(post.image)
+        return [post.pk for post in posts], [post.pk for post in with_images]
+
+
+def warm_caches(index_pages=5, groups=10, profiles=20, order=RECENT,
+                workers=4, host=None):
+    started = time.monotonic()
+    report = WarmupReport()
+    warmer = Warmer(host)
+    targets = warmup_targets(index_pages, groups, profiles, order)
+    report.pages = len(targets)
+    main_thread = threading.current_thread()
+
+    def warm_target(target):
+        path, posts = target
+        try:
+            return path, warmer.warm(path, posts), None
+        except Exception as error:
+            return path, None, error
+        finally:
+            if threading.current_thread() is not main_thread:
+                connection.close()
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(warm_target, targets))
+    else:
+        results = [warm_target(target) for target in targets]
+    for path, result, error in results:
+        if error is not None:
+            report.failed.append((path, error))
+            continue
+        pks, with_images = result
+        report.posts.update(pks)
+        report.thumbnails.update(with_images)
+    report.duration = time.monotonic() - started
+    return report
+
+
+def start_background_warmup():
+    """Прогревает кеши текущего процесса в фоне, не задерживая старт."""
+    def run():
+        try:
+            report = warm_caches(**settings.WARM_CACHES_OPTIONS)
+            logger.info('Кеши прогреты: %s', report.summary())
+            for path, error in report.failed:
+                logger.warning('Не прогрета %s: %s', path, error)
+        except Exception:
+            logger.exception('Прогрев кешей не удался')
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name='warm-caches', daemon=True)
+    thread.start()
+    return thread
@@ -37,8 +37,13 @@ ALLOWED_HOSTS = [
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Все письма сначала пишутся в outbox (core.outbox), а отправляет их
+# задача deliver_outbox бэкендом EMAIL_OUTBOX_BACKEND.
+EMAIL_BACKEND = 'core.outbox.OutboxEmailBackend'
+EMAIL_OUTBOX_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+# Адрес сайта для ссылок в письмах.
+SITE_URL = os.environ.get('SITE_URL', 'http://127.0.0.1:8000')
 # Application definition
 
 INSTALLED_APPS = [
@@ -59,10 +64,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrecompressedStaticMiddleware',
+    'core.middleware.AdmissionControlMiddleware',
+    'core.middleware.FragmentGZipMiddleware',
+    'core.middleware.DegradationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.BatchLoaderMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -139,10 +149,191 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+if not DEBUG:
+    # Отпечатки в именах файлов и .gz/.br копии пишутся при collectstatic.
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+STATIC_MAX_AGE = 60 * 60
+STATIC_FAR_FUTURE_MAX_AGE = 60 * 60 * 24 * 365
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Картинки постов раскладываются по каталогам posts/ab/cd/<sha256>.<ext>.
+POST_IMAGE_STORAGE = 'posts.storage.ShardedFileSystemStorage'
+# Предел для картинок, загруженных из браузера прямо в хранилище.
+POST_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+# S3-совместимое хранилище (AWS S3, MinIO). Чтобы картинки загружались
+# в него напрямую из браузера, укажите
+# POST_IMAGE_STORAGE = 'posts.storage.ShardedS3Storage'.
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', 'http://localhost:9000')
+S3_BUCKET = os.environ.get('S3_BUCKET', 'yatube')
+S3_ACCESS_KEY = os.environ.get('S3_ACCESS_KEY', '')
+S3_SECRET_KEY = os.environ.get('S3_SECRET_KEY', '')
+S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+# Адрес CDN или публичного бакета; если пуст, ссылки подписываются.
+S3_PUBLIC_URL = os.environ.get('S3_PUBLIC_URL', '')
+S3_PRESIGNED_EXPIRES = 15 * 60
+S3_MULTIPART_THRESHOLD = 16 * 1024 * 1024
+S3_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+S3_MULTIPART_WORKERS = 4
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# Кеш отдельных постов, групп и пользователей (core.object_cache).
+OBJECT_CACHE_TIMEOUT = 5 * 60
+OBJECT_CACHE_NEGATIVE_TIMEOUT = 30
+OBJECT_CACHE_LOCAL_SIZE = 1000
+OBJECT_CACHE_LOCAL_TTL = 5
+# Индекс подписок пользователей (core.adjacency); сбрасывается сигналами.
+ADJACENCY_CACHE_TIMEOUT = 60 * 60
+ADJACENCY_CACHE_LOCAL_SIZE = 1000
+ADJACENCY_CACHE_LOCAL_TTL = 5
+# Защита от набега на кеш (core.stampede).
+STAMPEDE_STALE_TIMEOUT = 60
+STAMPEDE_LOCK_TIMEOUT = 10
+STAMPEDE_BETA = 1.0
+STAMPEDE_POLL_INTERVAL = 0.05
+# Выдача сохранённых страниц при сбоях базы (core.degradation).
+DEGRADATION_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+)
+DEGRADATION_FAILURE_THRESHOLD = 5
+DEGRADATION_WINDOW = 30
+DEGRADATION_OPEN_TIMEOUT = 15
+# Суммарное время запросов к базе, после которого ответ считается сбоем.
+DEGRADATION_SLOW_DB_TIME = 2.0
+DEGRADATION_SNAPSHOT_TIMEOUT = 24 * 60 * 60
+DEGRADATION_SNAPSHOT_INTERVAL = 30
+# Параметры запроса, которые различают снимки; прочие отбрасываются.
+DEGRADATION_SNAPSHOT_PARAMS = ('page',)
+# Контроль допуска под нагрузкой (core.admission). priority 0 — самые
+# важные запросы, они не отклоняются из-за роста задержки.
+ADMISSION_LIMITS = {
+    'cached_read': {'max_in_flight': 64, 'priority': 0},
+    'default': {'max_in_flight': 32, 'priority': 1},
+    'write': {'max_in_flight': 16, 'priority': 1},
+    'expensive': {'max_in_flight': 8, 'priority': 2},
+    'upload': {'max_in_flight': 4, 'priority': 2},
+}
+ADMISSION_VIEW_CLASSES = {
+    'posts:add_comment': 'write',
+    'posts:profile_follow': 'write',
+    'posts:profile_unfollow': 'write',
+    'posts:follow_index': 'expensive',
+    'posts:post_create': 'upload',
+    'posts:post_edit': 'upload',
+    'posts:image_upload': 'upload',
+}
+# Анонимные GET-запросы к этим страницам относятся к cached_read.
+ADMISSION_CACHED_READ_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+)
+# Долгие опросы и потоки событий обходят контроль допуска.
+ADMISSION_EXEMPT_VIEWS = (
+    'posts:comment_list',
+    'posts:comment_events',
+    'posts:new_post_events',
+)
+# Классы, чья задержка по X-Request-Start включает загрузку тела.
+ADMISSION_UNMEASURED_CLASSES = ('upload',)
+ADMISSION_TARGET_LATENCY = 0.5
+ADMISSION_LATENCY_SMOOTHING = 0.1
+ADMISSION_RETRY_AFTER = 5
+# Адреса фронтендов, которым верим в заголовке X-Request-Start.
+ADMISSION_TRUSTED_PROXIES = ('127.0.0.1',)
+# Упреждающий рендер следующей страницы ленты (core.prefetch).
+# PREFETCH_WORKERS = 0 отключает упреждение.
+PREFETCH_WORKERS = 2
+PREFETCH_MAX_PENDING = 8
+PREFETCH_DEDUP_TIMEOUT = 20
+PREFETCH_HINTS_TIMEOUT = 5 * 60
+# Пагинация: при оценке меньше этого числа строки считаются точно.
+PAGINATOR_EXACT_COUNT_LIMIT = 10000
+PAGINATOR_COUNTER_TIMEOUT = 60 * 60
+# Фоновые задачи (core.jobs, manage.py run_jobs).
+# JOBS_EAGER = True — выполнять задачи сразу при постановке.
+JOBS_EAGER = False
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_BACKOFF_MAX = 60 * 60
+# Через столько секунд задача пропавшего обработчика снова в очереди.
+JOBS_LOCK_TIMEOUT = 15 * 60
+# Счётчики просмотров (core.counters): как часто писать их в базу
+# и после скольких накопленных просмотров писать не дожидаясь срока.
+COUNTER_FLUSH_INTERVAL = 10
+COUNTER_FLUSH_THRESHOLD = 1000
+# Тесты забывают просмотры вместе с тестовой базой (core.test_runner).
+TEST_RUNNER = 'core.test_runner.TestRunner'
+# «Популярное» (posts.trending): веса событий, период полураспада
+# их вклада и окно, за которое посты попадают в рейтинг, в секундах.
+TRENDING_WEIGHTS = {'comment': 3, 'follow': 5, 'view': 0.1}
+TRENDING_HALF_LIFE = 12 * 60 * 60
+TRENDING_WINDOW = 7 * 24 * 60 * 60
+TRENDING_INTERVAL = 5 * 60
+# Строки, чей рейтинг затух ниже этого, удаляются из таблиц.
+TRENDING_MIN_SCORE = 0.05
+TRENDING_SIZE = 100
+POPULAR_GROUPS_SIZE = 20
+# Рекомендации «кого почитать» (posts.recommendations).
+RECOMMENDATIONS_SIZE = 10
+RECOMMENDATIONS_WEIGHTS = {'friend_of_friend': 1.0, 'co_follow': 2.0}
+RECOMMENDATIONS_NEIGHBOURS = 50
+# Авторы с большим числом подписчиков не участвуют в сходстве читателей.
+RECOMMENDATIONS_MAX_FANOUT = 1000
+# Пересчёт после подписки ждёт, пока закончится серия подписок.
+RECOMMENDATIONS_REFRESH_DELAY = 60
+RECOMMENDATIONS_INTERVAL = 24 * 60 * 60
+# Сколько авторов можно подписать или отписать одним запросом.
+FOLLOW_BULK_LIMIT = 100
+# События в реальном времени (core.events). При нескольких процессах
+# и общем кеше — 'core.events.CacheBroadcast'.
+EVENTS_BROADCAST = 'core.events.LocalBroadcast'
+EVENTS_BACKLOG = 1000
+EVENTS_MAX_CONNECTIONS = 100
+EVENTS_HEARTBEAT = 15
+EVENTS_STREAM_TIMEOUT = 5 * 60
+# Через сколько секунд браузер переподключается к потоку.
+EVENTS_RETRY = 5
+EVENTS_POLL_INTERVAL = 1
+EVENTS_CACHE_TIMEOUT = 5 * 60
+# Комментарии на странице поста и порция догрузки (posts.comments).
+COMMENTS_ON_PAGE = 50
+COMMENTS_BATCH = 50
+COMMENTS_LONG_POLL_TIMEOUT = 25
+# Длина выдержки из текста поста для лент (posts.markup).
+POST_EXCERPT_LENGTH = 200
+# Поиск почти одинаковых постов и комментариев (posts.duplicates):
+# с какого сходства тексты — дубли, сколько кандидатов проверять и
+# начиная с какого размера кластера отклонять новые копии (None — только
+# помечать). Тексты короче SPAM_MIN_SHINGLES шинглов не проверяются.
+SPAM_SIMILARITY = 0.7
+SPAM_MAX_CANDIDATES = 20
+SPAM_REJECT_CLUSTER_SIZE = 50
+SPAM_MIN_SHINGLES = 20
+# Отправка писем из outbox: сколько соединений с почтовым сервером
+# открывать одновременно, сколько писем брать за раз и сколько раз
+# пробовать отправить письмо.
+EMAIL_OUTBOX_CONCURRENCY = 4
+EMAIL_OUTBOX_BATCH_SIZE = 200
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_INTERVAL = 60
+EMAIL_OUTBOX_LOCK_TIMEOUT = 15 * 60
+# Рассылки новых постов подписчикам (posts.digests): период — в секундах.
+DIGEST_PERIODS = {'hourly': 60 * 60, 'daily': 24 * 60 * 60}
+# Сколько подписок читать из базы за раз и писем писать в outbox.
+DIGEST_CHUNK_SIZE = 2000
+DIGEST_MAX_POSTS = 20
+# Прогрев кешей в каждом процессе сервера сразу после старта (wsgi.py).
+WARM_CACHES_ON_START = os.environ.get('WARM_CACHES_ON_START') == '1'
+WARM_CACHES_OPTIONS = {
+    'index_pages': 5,
+    'groups': 10,
+    'profiles': 20,
+    'workers': 2,
+}
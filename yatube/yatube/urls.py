@@ -44,6 +44,11 @@ urlpatterns = [
         include(
             'about.urls',
             namespace='about')),
+    path(
+        'core/',
+        include(
+            'core.urls',
+            namespace='core')),
 
 ]
 